@@ -0,0 +1,167 @@
+"""
+bench_block_scanner.py
+
+Compares the CommonMark block scanner of parse_markdown_headers with the
+original scanner (which toggled a code block on any line containing "```"),
+for both engines, on two synthetic documents: "prose" (the corpus of
+bench_scanner) and "mixed", which adds lists, block quotes, indented code,
+HTML blocks, tilde fences and setext headings. The legacy scanners find more
+"headings" than the block scanner, since they miss most of those blocks.
+
+Usage:
+    python -m benchmarks.bench_block_scanner [--size-mb N] [--repeat N]
+"""
+
+import argparse
+import io
+import re
+import time
+
+from benchmarks.bench_scanner import SECTION
+from src.heading import Heading
+from src.parse_markdown_headers import (
+    count_newlines,
+    scan_markdown_buffer,
+    scan_markdown_lines,
+)
+
+LEGACY_HEADER_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
+
+# Block constructs the original scanner did not know about
+BLOCKS = (
+    "Setext Title {n}\n"
+    "================\n"
+    "\n"
+    "- first item\n"
+    "- second item with `code`\n"
+    "  continued\n"
+    "\n"
+    "> quoted text\n"
+    "> more quoted text\n"
+    "\n"
+    "    # indented code\n"
+    "    more code\n"
+    "\n"
+    "<div>\n"
+    "# html, not a heading\n"
+    "</div>\n"
+    "\n"
+    "~~~\n"
+    "# tilde fence\n"
+    "~~~\n"
+    "\n"
+)
+
+
+def legacy_scan_lines(lines):
+    """
+    The "lines" engine before the block scanner.
+    """
+    in_code_block = False
+    for line_num, line in enumerate(lines, start=1):
+        if "```" in line:
+            in_code_block = not in_code_block
+        header = None
+        if not in_code_block:
+            match = LEGACY_HEADER_PATTERN.match(line)
+            if match:
+                header = Heading(line_num, len(match.group(1)), match.group(2).strip())
+        yield line, header
+
+
+def _legacy_line_start(buffer, marker, pos):
+    if pos == 0 and buffer[: len(marker)] == marker:
+        return 0
+    found = buffer.find(b"\n" + marker, max(pos - 1, 0))
+    return -1 if found == -1 else found + 1
+
+
+def legacy_scan_buffer(buffer):
+    """
+    The "mmap" engine before the block scanner.
+    """
+    in_code_block = False
+    line_num = 1
+    counted = 0
+    size = len(buffer)
+    next_heading = _legacy_line_start(buffer, b"#", 0)
+    next_fence = buffer.find(b"```")
+    while next_heading != -1 or next_fence != -1:
+        if next_fence == -1 or (next_heading != -1 and next_heading < next_fence):
+            start = next_heading
+        else:
+            start = buffer.rfind(b"\n", 0, next_fence) + 1
+        end = buffer.find(b"\n", start)
+        end = size if end == -1 else end + 1
+        line_num += count_newlines(buffer, counted, start)
+        counted = start
+        line = buffer[start:end].decode("utf-8")
+        if "```" in line:
+            in_code_block = not in_code_block
+        if not in_code_block:
+            match = LEGACY_HEADER_PATTERN.match(line)
+            if match:
+                yield Heading(line_num, len(match.group(1)), match.group(2).strip())
+        if next_heading != -1 and next_heading < end:
+            next_heading = _legacy_line_start(buffer, b"#", end)
+        if next_fence != -1 and next_fence < end:
+            next_fence = buffer.find(b"```", end)
+
+
+def make_document(size_mb, mixed=True):
+    """
+    Returns a synthetic document of about size_mb megabytes: sections of prose
+    and fenced code (the corpus of bench_scanner), followed by the BLOCKS
+    constructs if mixed.
+    """
+    parts = ["# Synthetic Document\n\n"]
+    size = 0
+    n = 0
+    while size < size_mb * 1024 * 1024:
+        n += 1
+        part = SECTION.format(n=n) + (BLOCKS.format(n=n) if mixed else "")
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def best_time(scan, repeat):
+    """
+    Returns the best time of repeat runs of scan(), and the headings found.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for item in scan() if item[1] is not None)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for corpus, mixed in (("prose", False), ("mixed", True)):
+        text = make_document(args.size_mb, mixed)
+        data = text.encode("utf-8")
+        size = len(data) / 2**20
+
+        runs = [
+            ("lines legacy", lambda: legacy_scan_lines(io.StringIO(text))),
+            ("lines", lambda: scan_markdown_lines(io.StringIO(text))),
+            ("mmap legacy", lambda: ((None, h) for h in legacy_scan_buffer(data))),
+            ("mmap", lambda: ((None, h) for h in scan_markdown_buffer(data))),
+        ]
+        for name, scan in runs:
+            elapsed, count = best_time(scan, args.repeat)
+            print(
+                f"{corpus:6} {name:14} {elapsed:7.2f} s  {size / elapsed:8.1f} MB/s  "
+                f"{count:,} headings"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+bench_heading_memory.py
+
+Compares the memory used by old-style heading dicts with Heading objects
+after numbering and rewriting, the state in which create_index receives them.
+
+Usage:
+    python -m benchmarks.bench_heading_memory [--count N]
+"""
+
+import argparse
+import tracemalloc
+
+from src.heading import Heading
+
+
+def build_dicts(count):
+    """
+    Builds headings the way the original parse_markdown_headers,
+    header_numarator and new_headers did: a dict per heading, extended with
+    "header_number" and "new_text".
+    """
+    headers = []
+    temp = {"line": 0, "header_level": 0, "header_text": ""}
+    for i in range(count):
+        temp["line"] = i + 1
+        temp["header_level"] = 2
+        temp["header_text"] = "Heading"
+        header = temp.copy()
+        header["header_number"] = "1."
+        header["new_text"] = "## 1. Heading"
+        headers.append(header)
+    return headers
+
+
+def build_headings(count):
+    """
+    Builds the same headings as Heading objects.
+    """
+    headers = []
+    for i in range(count):
+        header = Heading(i + 1, 2, "Heading")
+        header.header_number = "1."
+        header.new_text = "## 1. Heading"
+        headers.append(header)
+    return headers
+
+
+def measure(builder, count):
+    """
+    Returns the number of bytes allocated by builder(count) that are still alive.
+    """
+    tracemalloc.start()
+    headers = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del headers
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    dict_bytes = measure(build_dicts, args.count)
+    heading_bytes = measure(build_headings, args.count)
+
+    print(f"{args.count:,} headings")
+    print(f"  dict     {dict_bytes / 2**20:8.1f} MiB")
+    print(f"  Heading  {heading_bytes / 2**20:8.1f} MiB")
+    print(f"  saved    {1 - heading_bytes / dict_bytes:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
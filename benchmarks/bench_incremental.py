@@ -0,0 +1,96 @@
+"""
+bench_incremental.py
+
+Times the re-indexing of a large document (200,000 lines by default, made of
+bench_scanner sections) after a small edit, with index_file_in_place and with
+index_file_incremental, and checks that both write the same file. Three edits
+are timed: a paragraph line, a new heading near the start (which renumbers
+every heading after it) and a new heading near the end.
+
+Usage:
+    python -m benchmarks.bench_incremental [--lines N] [--repeat N]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_scanner import SECTION
+from src.incremental_index import index_file_incremental
+from src.index_markdown import index_file_in_place
+
+EDITS = (
+    ("paragraph", 0.5, "Plain prose line", "Edited prose line"),
+    ("heading early", 0.05, "```python", "## Inserted\n\n```python"),
+    ("heading late", 0.95, "```python", "## Inserted\n\n```python"),
+)
+
+
+def make_document(lines):
+    """
+    Returns a document of about the given number of lines.
+    """
+    parts = ["# Handbook\n\n"]
+    n = 0
+    while n * SECTION.count("\n") < lines:
+        n += 1
+        parts.append(SECTION.format(n=n))
+    return "".join(parts)
+
+
+def apply_edit(path, position, old, new):
+    """
+    Replaces the first occurrence of old after position (a fraction of the
+    file) with new.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    start = text.index(old, int(len(text) * position))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text[:start] + new + text[start + len(old) :])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full = os.path.join(tmp, "full.md")
+        incremental = os.path.join(tmp, "incremental.md")
+        with open(full, "w", encoding="utf-8") as f:
+            f.write(make_document(args.lines))
+        index_file_in_place(full)
+        shutil.copy(full, incremental)
+        index_file_incremental(incremental)
+
+        runs = ((full, index_file_in_place), (incremental, index_file_incremental))
+        for name, position, old, new in EDITS:
+            best = {}
+            for _ in range(args.repeat):
+                for path, index in runs:
+                    shutil.copy(path, path + ".orig")
+                    apply_edit(path, position, old, new)
+                    start = time.perf_counter()
+                    index(path)
+                    elapsed = time.perf_counter() - start
+                    best[path] = min(best.get(path, elapsed), elapsed)
+                with open(full, "rb") as a, open(incremental, "rb") as b:
+                    if a.read() != b.read():
+                        raise SystemExit(f"{name}: the outputs differ")
+                # Back to the indexed document (and its sidecar)
+                for path, index in runs:
+                    shutil.move(path + ".orig", path)
+                    index(path)
+            print(
+                f"{name:14} full {best[full] * 1000:7.1f} ms  "
+                f"incremental {best[incremental] * 1000:7.1f} ms  "
+                f"x{best[full] / best[incremental]:.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
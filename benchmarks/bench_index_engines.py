@@ -0,0 +1,61 @@
+"""
+bench_index_engines.py
+
+Compares the "lines" and "mmap" engines of index_file end to end on a
+synthetic Markdown file: wall time and peak RSS of a process indexing it.
+
+Usage:
+    python -m benchmarks.bench_index_engines [--size-mb N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_scanner import write_corpus
+from src.index_markdown import ENGINES
+
+# Runs one engine in a fresh interpreter so that peak RSS is measured per engine
+CHILD = """
+import json, resource, sys, time
+from src.index_markdown import index_file
+start = time.perf_counter()
+index_file(sys.argv[1], sys.argv[2], engine=sys.argv[3])
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size-mb", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.md")
+        write_corpus(path, args.size_mb)
+        size_mb = os.path.getsize(path) / 2**20
+
+        for engine in ENGINES:
+            output = os.path.join(tmp, f"{engine}-indexed.md")
+            result = subprocess.run(
+                [sys.executable, "-c", CHILD, path, output, engine],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            stats = json.loads(result.stdout)
+            print(
+                f"{engine:6} {stats['seconds']:8.2f} s  "
+                f"{size_mb / stats['seconds']:8.1f} MB/s  "
+                f"peak RSS {stats['rss_mb']:8.1f} MB"
+            )
+            os.remove(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+bench_parallel_scan.py
+
+Compares the "mmap" scanner with the "parallel" engine (src.parallel_scan) on
+a single synthetic Markdown file (1 GB by default), for several numbers of
+worker processes, and checks that they find the same headings.
+
+Besides the measured wall time, the time each chunk takes to scan is measured
+in this process, and the time of an ideal run on that many cores is worked out
+from it (the chunks handed out to the workers in order, plus the
+reconciliation pass). On a machine with fewer cores than workers, the measured
+time cannot scale, while the projected time shows what the chunking allows.
+
+Usage:
+    python -m benchmarks.bench_parallel_scan [--size-mb N] [--workers 1,2,4,8]
+                                             [--keep PATH]
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import tempfile
+import time
+
+from benchmarks.bench_scanner import write_corpus
+from src import parallel_scan
+from src.parse_markdown_headers import front_matter_end, scan_markdown_buffer
+
+
+def projected_seconds(chunk_times, workers, overhead):
+    """
+    Returns the time an ideal run on workers cores would take: each chunk goes,
+    in order, to the first idle worker, and overhead is added at the end.
+    """
+    idle = [0.0] * workers
+    for seconds in chunk_times:
+        heapq.heappush(idle, heapq.heappop(idle) + seconds)
+    return max(idle) + overhead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--keep", help="Write the corpus to this path and keep it.")
+    args = parser.parse_args()
+    worker_counts = [int(count) for count in args.workers.split(",")]
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "corpus.md")
+    write_corpus(path, args.size_mb)
+    print(f"{os.path.getsize(path) / 2**20:.0f} MB, {os.cpu_count()} CPUs")
+
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with buffer:
+            start = time.perf_counter()
+            expected = list(scan_markdown_buffer(buffer))
+            sequential = time.perf_counter() - start
+            print(f"{'mmap':12} {sequential:7.2f} s  {len(expected):,} headings")
+
+            for workers in worker_counts:
+                start = time.perf_counter()
+                headings = parallel_scan.scan_buffer_parallel(path, buffer, workers)
+                elapsed = time.perf_counter() - start
+                assert headings == expected, "the engines disagree"
+
+                # The same chunks, scanned one after the other in this process
+                chunk_size = max(
+                    parallel_scan.MIN_CHUNK_SIZE,
+                    -(-len(buffer) // (workers * parallel_scan.CHUNKS_PER_WORKER)),
+                )
+                chunks = parallel_scan.split_chunks(
+                    buffer, front_matter_end(buffer), chunk_size
+                )
+                chunk_times = []
+                results = []
+                for chunk_start, chunk_stop in chunks:
+                    start = time.perf_counter()
+                    results.append(
+                        parallel_scan.scan_chunk(path, chunk_start, chunk_stop)
+                    )
+                    chunk_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                reconciled = parallel_scan.reconcile(buffer, chunks, results)
+                overhead = time.perf_counter() - start
+                assert reconciled == expected
+                projected = projected_seconds(chunk_times, workers, overhead)
+                print(
+                    f"{'parallel -j' + str(workers):12} {elapsed:7.2f} s  "
+                    f"x{sequential / elapsed:4.1f}  "
+                    f"projected {projected:6.2f} s  x{sequential / projected:4.1f}  "
+                    f"({len(chunks)} chunks, reconciled in {overhead * 1000:.1f} ms)"
+                )
+    finally:
+        if not args.keep:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
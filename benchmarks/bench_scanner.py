@@ -0,0 +1,81 @@
+"""
+bench_scanner.py
+
+Compares the "lines" and "mmap" engines of parse_markdown_headers on a
+synthetic Markdown file (500 MB by default), and checks that both engines
+find the same headings.
+
+Usage:
+    python -m benchmarks.bench_scanner [--size-mb N] [--keep PATH]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from src.parse_markdown_headers import ENGINES, parse_markdown_headers
+
+# One section of the synthetic document: a few headings, prose and a code block
+SECTION = (
+    "## Section {n}\n"
+    "\n"
+    + "Plain prose line with some `inline code` and a [link](#section).\n" * 40
+    + "\n"
+    "### Details {n}\n"
+    "\n"
+    "```python\n"
+    "# not a heading\n"
+    "print('hello')\n"
+    "```\n"
+    "\n"
+    + "More prose after the code block, still without any heading markers.\n" * 40
+    + "\n"
+)
+
+
+def write_corpus(path, size_mb):
+    """
+    Writes a synthetic Markdown file of about size_mb megabytes.
+    """
+    target = size_mb * 1024 * 1024
+    written = 0
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Synthetic Document\n\n")
+        while written < target:
+            n += 1
+            written += f.write(SECTION.format(n=n))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size-mb", type=int, default=500)
+    parser.add_argument("--keep", help="Write the corpus to this path and keep it.")
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "corpus.md")
+    write_corpus(path, args.size_mb)
+    size = os.path.getsize(path)
+
+    try:
+        results = {}
+        for engine in ENGINES:
+            start = time.perf_counter()
+            headers = parse_markdown_headers(path, engine=engine)
+            elapsed = time.perf_counter() - start
+            results[engine] = headers
+            print(
+                f"{engine:6} {elapsed:8.2f} s  {size / 2**20 / elapsed:8.1f} MB/s  "
+                f"{len(headers):,} headings"
+            )
+
+        assert results["lines"] == results["mmap"], "engines disagree"
+    finally:
+        if not args.keep:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main()
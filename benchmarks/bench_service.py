@@ -0,0 +1,120 @@
+"""
+bench_service.py
+
+Measures the latency of small documents sent to the indexing service
+(src/service.py) while large documents are being indexed too, with large
+documents sent to the worker processes (the default) and with every document
+indexed on the event loop (--large-size set above the largest document).
+
+The service runs as `markdown-indexer.py serve` over stdin/stdout. Requests are
+sent at a steady rate (--interval) and the latency of a small document is the
+time between its scheduled send time and the arrival of its response, as a
+client would see it.
+
+Usage:
+    python -m benchmarks.bench_service [--small N] [--large N] [--large-kb N]
+                                       [--interval MS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.bench_scanner import SECTION
+from src.service import percentiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "markdown-indexer.py")
+
+
+def make_requests(small, large, large_kb):
+    """
+    Returns (id, JSON request line) pairs: small documents, with a large one
+    every small // large requests.
+    """
+    small_text = "# Title\n" + SECTION
+    large_text = "# Title\n" + SECTION * (large_kb * 1024 // len(SECTION) + 1)
+    every = max(1, small // max(1, large))
+    lines = []
+    for i in range(small):
+        if large and i % every == 0 and i // every < large:
+            request_id = f"large-{i}"
+            request = {"id": request_id, "text": large_text}
+            lines.append((request_id, json.dumps(request)))
+        request_id = f"small-{i}"
+        request = {"id": request_id, "text": small_text}
+        lines.append((request_id, json.dumps(request)))
+    return lines
+
+
+def run(requests, large_size, workers, interval):
+    """
+    Sends requests to the service, one every interval seconds, and returns the
+    small documents' latencies in ms.
+    """
+    cmd = [sys.executable, SCRIPT, "serve", "--large-size", str(large_size)]
+    if workers:
+        cmd += ["-j", str(workers)]
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    # Wait until the service is up, so start-up time is not counted
+    process.stdin.write(json.dumps({"id": "ready", "op": "stats"}) + "\n")
+    process.stdin.flush()
+    process.stdout.readline()
+    sent = {}
+
+    def send():
+        start = time.perf_counter()
+        for i, (request_id, line) in enumerate(requests):
+            due = start + i * interval
+            time.sleep(max(0.0, due - time.perf_counter()))
+            sent[request_id] = due
+            process.stdin.write(line + "\n")
+            process.stdin.flush()
+        process.stdin.close()
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    latencies = []
+    for line in process.stdout:
+        arrived = time.perf_counter()
+        # Responses start with their id: no need to decode megabytes of JSON
+        request_id = line[len('{"id": "') : line.index('"', 8)]
+        if request_id.startswith("small-"):
+            latencies.append((arrived - sent[request_id]) * 1000)
+    sender.join()
+    process.wait()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--small", type=int, default=2000)
+    parser.add_argument("--large", type=int, default=20)
+    parser.add_argument("--large-kb", type=int, default=2048)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("-j", "--workers", type=int)
+    args = parser.parse_args()
+
+    requests = make_requests(args.small, args.large, args.large_kb)
+    interval = args.interval / 1000
+    modes = [
+        ("large documents in workers", 256 * 1024),
+        ("everything on the event loop", 2**62),
+    ]
+    for name, large_size in modes:
+        stats = percentiles(run(requests, large_size, args.workers, interval))
+        print(
+            f"{name:30} small documents: p50 {stats['p50']:8.2f} ms, "
+            f"p90 {stats['p90']:8.2f} ms, p99 {stats['p99']:8.2f} ms, "
+            f"max {stats['max']:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
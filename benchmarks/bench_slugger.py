@@ -0,0 +1,74 @@
+"""
+bench_slugger.py
+
+Compares anchor slug generation by the original create_index code (two re.sub
+calls plus lower/strip/replace per heading) with src.slugger, over 1M headings
+whose texts repeat the way they do in generated API documentation.
+
+Usage:
+    python -m benchmarks.bench_slugger [--count N] [--distinct N]
+"""
+
+import argparse
+import re
+import time
+
+from src.slugger import SLUG_STYLES, Slugger, slugify
+
+
+def legacy_slug(link_text):
+    """
+    The slug code of create_index before src.slugger existed.
+    """
+    anchor_text = link_text.lower()
+    anchor_text = re.sub(r"[^\w\s-]", "", anchor_text)
+    anchor_text = anchor_text.strip().replace(" ", "-")
+    anchor_text = re.sub(r"-+", "-", anchor_text)
+    if not anchor_text:
+        anchor_text = "header"
+    return anchor_text
+
+
+def make_texts(count, distinct):
+    """
+    Returns count heading texts cycling through distinct API-style names.
+    """
+    names = [f"Method get_item_{i}(key, default=None) -> Item" for i in range(distinct)]
+    return [names[i % distinct] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = make_texts(args.count, args.distinct)
+
+    start = time.perf_counter()
+    for text in texts:
+        legacy_slug(text)
+    legacy = time.perf_counter() - start
+    print(f"{'legacy':20} {legacy:6.2f} s")
+
+    for style in SLUG_STYLES:
+        slugify.cache_clear()
+        slugger = Slugger(style)
+        start = time.perf_counter()
+        for text in texts:
+            slugger.slug(text)
+        elapsed = time.perf_counter() - start
+        print(f"{style:20} {elapsed:6.2f} s  ({legacy / elapsed:4.1f}x)")
+
+    slugify.cache_clear()
+    start = time.perf_counter()
+    for text in texts:
+        slugify(text)
+    elapsed = time.perf_counter() - start
+    print(f"{'default, no dedup':20} {elapsed:6.2f} s  ({legacy / elapsed:4.1f}x)")
+
+    assert all(slugify(text) == legacy_slug(text) for text in texts[: args.distinct])
+
+
+if __name__ == "__main__":
+    main()
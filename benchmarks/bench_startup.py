@@ -0,0 +1,147 @@
+"""
+bench_startup.py
+
+Measures the cold-start latency of indexing a README-sized document in place,
+the way an editor integration does on every save: the bare interpreter, the
+command line tool (on its argparse-free fast path, and with an option that
+needs argparse), and the client handing the file to a warm `serve --socket`
+process. Each run is a new process; the median over --repeat runs is shown.
+
+The round trip of a request to the warm service is timed from this process
+too, along with the time the service reports for it. Finally the command line
+and client runs are repeated under `python -X importtime` and the slowest
+imports (by their own time) are listed.
+
+The package is byte-compiled first, as it is once installed, so that the
+timings do not include compiling modules.
+
+Usage:
+    python -m benchmarks.bench_startup [--kb N] [--repeat N] [--top N]
+"""
+
+import argparse
+import compileall
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_scanner import SECTION
+from src.client import send_requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "markdown-indexer.py")
+CLIENT = "import sys; from src.client import main; main(sys.argv[1:])"
+
+
+def median_ms(cmd, repeat):
+    """
+    Runs cmd repeat times and returns the median wall time in ms.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def import_times(args):
+    """
+    Runs the interpreter with args under -X importtime.
+
+    Returns:
+        list of tuple: (module, self_us, cumulative_us) per imported module.
+    """
+    cmd = [sys.executable, "-X", "importtime", *args]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def start_server(socket_path):
+    """
+    Starts `markdown-indexer.py serve` on socket_path and waits until it
+    listens.
+    """
+    cmd = [sys.executable, SCRIPT, "serve", "--socket", socket_path, "-j", "1"]
+    server = subprocess.Popen(cmd, cwd=ROOT, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline or server.poll() is not None:
+            server.kill()
+            raise SystemExit("the service did not start")
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--kb", type=int, default=8, help="Document size in KB.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, "src"), quiet=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = os.path.join(tmp, "README.md")
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("# Project\n\n" + SECTION * (args.kb * 1024 // len(SECTION) + 1))
+        subprocess.run([sys.executable, SCRIPT, "-i", doc], check=True, cwd=ROOT)
+
+        python = [sys.executable]
+        runs = [
+            ("python -c pass", python + ["-c", "pass"]),
+            ("cli -i (fast path)", python + [SCRIPT, "-i", doc]),
+            ("cli -i (argparse)", python + [SCRIPT, "-i", doc, "--workers", "1"]),
+        ]
+        for name, cmd in runs:
+            print(f"{name:24} {median_ms(cmd, args.repeat):7.1f} ms")
+
+        socket_path = os.path.join(tmp, "indexer.sock")
+        server = start_server(socket_path)
+        try:
+            client = python + ["-c", CLIENT, "--socket", socket_path, "-i", doc]
+            print(f"{'client -> serve':24} {median_ms(client, args.repeat):7.1f} ms")
+
+            request = {"id": 0, "path": doc, "in_place": True}
+            round_trips = []
+            served = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                (response,) = send_requests(socket_path, [request])
+                round_trips.append(time.perf_counter() - start)
+                served.append(response["ms"])
+            print(
+                f"{'request round trip':24} "
+                f"{statistics.median(round_trips) * 1000:7.1f} ms "
+                f"(indexed in {statistics.median(served):.1f} ms)"
+            )
+            imports = {
+                "cli -i": import_times([SCRIPT, "-i", doc]),
+                "client": import_times(client[1:]),
+            }
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+        for name, rows in imports.items():
+            total = sum(row[1] for row in rows) / 1000
+            print(f"\n{name}: {len(rows)} modules imported in {total:.1f} ms")
+            for module, self_us, cumulative_us in sorted(
+                rows, key=lambda row: row[1], reverse=True
+            )[: args.top]:
+                cumulative_ms = cumulative_us / 1000
+                print(f"{self_us / 1000:7.2f} ms  {module} ({cumulative_ms:.2f})")
+
+
+if __name__ == "__main__":
+    main()
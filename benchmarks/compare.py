@@ -0,0 +1,90 @@
+"""
+compare.py
+
+Compares two result files written by benchmarks/run.py and fails (exit status 1)
+when a stage got slower than the baseline by more than the threshold.
+
+Usage:
+    python -m benchmarks.compare BASELINE CURRENT [--threshold 0.10]
+                                 [--min-seconds 0.01]
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold, min_seconds=0.0):
+    """
+    Compares the "seconds" of every result present in both reports.
+
+    Args:
+        baseline (dict): Report loaded from the baseline JSON file.
+        current (dict): Report loaded from the current JSON file.
+        threshold (float): Allowed slowdown, e.g. 0.10 for 10%.
+        min_seconds (float): Results faster than this in the baseline are too
+            noisy to judge and never count as regressions, nor do results
+            recorded at 0 seconds in the baseline.
+
+    Returns:
+        list of tuple: (key, baseline_seconds, current_seconds, change, regressed)
+                       for each result, where change is the relative slowdown
+                       (0 when the baseline is 0 seconds).
+    """
+    rows = []
+    for key, result in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+        before = baseline["results"][key]["seconds"]
+        after = result["seconds"]
+        if before <= 0:
+            # Nothing to compare with: noise, as below min_seconds
+            rows.append((key, before, after, 0.0, False))
+            continue
+        change = after / before - 1
+        regressed = change > threshold and before >= min_seconds
+        rows.append((key, before, after, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Allowed slowdown per stage, as a fraction (default: 0.10).",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.01,
+        help="Ignore stages faster than this in the baseline (default: 0.01).",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.min_seconds)
+    for key, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{key:18} {before:8.3f} s -> {after:8.3f} s  {change:+7.1%}  {flag}")
+
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(
+            f"{len(regressions)} stage(s) slower than baseline by more than "
+            f"{args.threshold:.0%}.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
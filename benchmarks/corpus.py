@@ -0,0 +1,128 @@
+"""
+corpus.py
+
+Deterministic synthetic Markdown corpora for the benchmark suite.
+
+Each shape stresses a different part of the indexer:
+    - "deep": deeply nested headings (H1 to H6), little prose.
+    - "fences": many fenced code blocks, with '#' lines inside them.
+    - "huge": a single large file of mostly prose.
+    - "tiny": many small files.
+
+The same shape, size and seed always produce byte-identical files.
+
+Usage:
+    python -m benchmarks.corpus SHAPE DIRECTORY [--size-mb N] [--seed N]
+"""
+
+import argparse
+import os
+import random
+
+SHAPES = ("deep", "fences", "huge", "tiny")
+
+WORDS = (
+    "index markdown heading section table content anchor number level parse "
+    "stream buffer document chapter reference install usage option example "
+    "value result return error config module function class method"
+).split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + ".\n"
+
+
+def _title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+
+def _deep_block(rng):
+    lines = []
+    for level in range(2, 7):
+        lines.append("#" * level + " " + _title(rng) + "\n")
+        lines.append(_sentence(rng))
+        lines.append("\n")
+    return "".join(lines)
+
+
+def _fences_block(rng):
+    lines = ["## " + _title(rng) + "\n", "\n"]
+    for _ in range(rng.randint(2, 4)):
+        lines.append("```python\n")
+        lines.append("# " + _title(rng) + " (a comment, not a heading)\n")
+        for _ in range(rng.randint(3, 8)):
+            lines.append(f"value = {rng.randint(0, 1000)}\n")
+        lines.append("```\n")
+        lines.append(_sentence(rng))
+    lines.append("\n")
+    return "".join(lines)
+
+
+def _prose_block(rng):
+    lines = ["## " + _title(rng) + "\n", "\n"]
+    for _ in range(rng.randint(20, 60)):
+        lines.append(_sentence(rng))
+    lines.append("\n### " + _title(rng) + "\n\n")
+    for _ in range(rng.randint(20, 60)):
+        lines.append(_sentence(rng))
+    lines.append("\n")
+    return "".join(lines)
+
+
+def _write_file(path, rng, size, block):
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        written += f.write("# " + _title(rng) + "\n\n")
+        while written < size:
+            written += f.write(block(rng))
+
+
+def generate_corpus(shape, directory, size_mb=10, seed=0):
+    """
+    Writes a synthetic corpus of about size_mb megabytes into directory.
+
+    Args:
+        shape (str): One of SHAPES.
+        directory (str): Output directory (created if needed).
+        size_mb (float): Approximate total size of the corpus.
+        seed (int): Random seed; the same arguments give the same files.
+
+    Returns:
+        list of str: Paths of the generated files, sorted.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}', expected one of {SHAPES}.")
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(f"{shape}-{seed}")
+    size = int(size_mb * 1024 * 1024)
+
+    if shape == "tiny":
+        # ~2 KB files
+        paths = []
+        for i in range(max(1, size // 2048)):
+            path = os.path.join(directory, f"doc-{i:06d}.md")
+            _write_file(path, rng, 2048, _deep_block)
+            paths.append(path)
+        return paths
+
+    blocks = {"deep": _deep_block, "fences": _fences_block, "huge": _prose_block}
+    path = os.path.join(directory, f"{shape}.md")
+    _write_file(path, rng, size, blocks[shape])
+    return [path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("shape", choices=SHAPES)
+    parser.add_argument("directory")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.shape, args.directory, args.size_mb, args.seed)
+    print(f"Generated {len(paths)} file(s) in {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
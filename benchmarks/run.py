@@ -0,0 +1,240 @@
+"""
+run.py
+
+Benchmark suite: times each stage of the indexer, and the end-to-end CLI, over
+synthetic corpora of different shapes (see benchmarks/corpus.py), and writes
+the results to a JSON file that benchmarks/compare.py can check for regressions.
+
+Stages:
+    - parse: parse_markdown_headers
+    - number: header_numarator
+    - rewrite: new_headers
+    - index: create_index
+    - write: writing the indexed documents to disk
+    - pipeline: index_file (all of the above, streamed)
+    - cli: markdown-indexer.py run as a subprocess
+
+Each stage runs in its own process, so that its peak RSS can be reported. The
+time reported is the best of --repeat runs; throughput is given in MB/s of
+input and headings/s.
+
+Usage:
+    python -m benchmarks.run [--shapes deep,huge] [--stages parse,cli]
+                             [--size-mb N] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import SHAPES, generate_corpus
+
+STAGES = ("parse", "number", "rewrite", "index", "write", "pipeline", "cli")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "markdown-indexer.py")
+
+
+def peak_rss_mb(who="self"):
+    """
+    Returns the peak RSS of this process (or of its children) in MB, or None
+    where the resource module is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    target = resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN
+    rss = resource.getrusage(target).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+def time_stage(stage, paths, repeat):
+    """
+    Runs one stage over paths and returns (best_seconds, headings, peak_rss_mb).
+    Inputs needed by the stage are prepared before timing starts.
+    """
+    from src.parse_markdown_headers import parse_markdown_headers
+    from src.header_numarator import header_numarator
+    from src.new_headers import new_headers
+    from src.create_index import create_index
+    from src.index_markdown import index_file, index_text
+
+    tables = [parse_markdown_headers(path) for path in paths]
+    headings = sum(len(table) for table in tables)
+    for table in tables:
+        new_headers(header_numarator(table))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        outputs = [os.path.join(out_dir, f"{i}.md") for i in range(len(paths))]
+        texts = []
+        if stage == "write":
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    texts.append(index_text(f.read()))
+
+        def run():
+            if stage == "parse":
+                for path in paths:
+                    parse_markdown_headers(path)
+            elif stage == "number":
+                for table in tables:
+                    header_numarator(table)
+            elif stage == "rewrite":
+                for table in tables:
+                    new_headers(table)
+            elif stage == "index":
+                for table in tables:
+                    create_index(table)
+            elif stage == "write":
+                for text, output in zip(texts, outputs):
+                    with open(output, "w", encoding="utf-8") as f:
+                        f.write(text)
+            elif stage == "pipeline":
+                for path, output in zip(paths, outputs):
+                    index_file(path, output)
+            elif stage == "cli":
+                # Directories switch the CLI to batch mode; a single file does not
+                target = paths[0] if len(paths) == 1 else os.path.dirname(paths[0])
+                subprocess.run(
+                    [sys.executable, SCRIPT, target],
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                )
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+    rss = peak_rss_mb("children" if stage == "cli" else "self")
+    return best, headings, rss
+
+
+def run_child(stage, list_file, repeat):
+    """
+    Entry point of a stage process: prints the stage result as JSON.
+    """
+    with open(list_file, "r", encoding="utf-8") as f:
+        paths = [line.strip() for line in f if line.strip()]
+    seconds, headings, rss = time_stage(stage, paths, repeat)
+    print(json.dumps({"seconds": seconds, "headings": headings, "peak_rss_mb": rss}))
+
+
+def run_suite(shapes, stages, size_mb, repeat, seed=0):
+    """
+    Runs every stage over every corpus shape.
+
+    Returns:
+        dict: Results keyed by "<shape>/<stage>".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in shapes:
+            corpus_dir = os.path.join(tmp, shape)
+            paths = generate_corpus(shape, corpus_dir, size_mb, seed)
+            size = sum(os.path.getsize(path) for path in paths)
+            list_file = os.path.join(tmp, f"{shape}.txt")
+            with open(list_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(paths))
+
+            for stage in stages:
+                # Outputs of the cli stage land next to the inputs: start clean
+                for name in os.listdir(corpus_dir):
+                    if name.endswith("-indexed.md"):
+                        os.remove(os.path.join(corpus_dir, name))
+
+                cmd = [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.run",
+                    "--child",
+                    stage,
+                    list_file,
+                    "--repeat",
+                    str(repeat),
+                ]
+                output = subprocess.run(
+                    cmd, cwd=ROOT, check=True, capture_output=True, text=True
+                ).stdout
+                stats = json.loads(output)
+                seconds = stats["seconds"]
+                # A stage faster than the clock resolution has no throughput
+                timed = seconds > 0
+                result = {
+                    "files": len(paths),
+                    "bytes": size,
+                    "headings": stats["headings"],
+                    "seconds": seconds,
+                    "mb_per_s": size / 2**20 / seconds if timed else None,
+                    "headings_per_s": stats["headings"] / seconds if timed else None,
+                    "peak_rss_mb": stats["peak_rss_mb"],
+                }
+                results[f"{shape}/{stage}"] = result
+                print(
+                    f"{shape + '/' + stage:18} {seconds:8.3f} s "
+                    + (
+                        f"{result['mb_per_s']:9.1f} MB/s "
+                        f"{result['headings_per_s']:12,.0f} headings/s "
+                        if timed
+                        else f"{'-':>9} MB/s {'-':>12} headings/s "
+                    )
+                    + f"{result['peak_rss_mb'] or 0:8.1f} MB RSS"
+                )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--shapes", default=",".join(SHAPES))
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument(
+        "--child", nargs=2, metavar=("STAGE", "LIST"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.repeat)
+        return
+
+    shapes = args.shapes.split(",")
+    stages = args.stages.split(",")
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f"unknown shape '{shape}', expected one of {SHAPES}")
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error(f"unknown stage '{stage}', expected one of {STAGES}")
+
+    results = run_suite(shapes, stages, args.size_mb, args.repeat, args.seed)
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "size_mb": args.size_mb,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,14 @@ from setuptools import setup, find_packages
 setup(
     name="markdown_indexer",
     version="0.1.0",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
+    python_requires=">=3.7",
+    entry_points={
+        "console_scripts": [
+            "markdown-indexer=src.cli:main",
+            "markdown-indexer-client=src.client:main",
+        ]
+    },
     requires=[
         "argparse",
         "re",
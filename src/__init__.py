@@ -0,0 +1,59 @@
+"""
+Markdown Indexer: numbers the headings of Markdown documents and inserts a
+navigable index.
+
+The library API is available from the package itself:
+
+    from src import Indexer, index_text, index_stream
+
+    indexed = index_text("# Title\n## Usage\n")
+
+Names are imported on first access, so that importing the package (which the
+command line tool does) only loads the modules that are actually used.
+"""
+
+import importlib
+
+__version__ = "0.1.0"
+
+# Public names, mapped to the module that defines them
+_EXPORTS = {
+    "Indexer": "src.indexer",
+    "index_text": "src.index_markdown",
+    "index_stream": "src.index_markdown",
+    "index_lines": "src.index_markdown",
+    "index_file": "src.index_markdown",
+    "index_file_in_place": "src.index_markdown",
+    "index_file_incremental": "src.incremental_index",
+    "parse_markdown_text": "src.parse_markdown_headers",
+    "parse_markdown_headers": "src.parse_markdown_headers",
+    "batch_index": "src.batch_index",
+    "write_site_index": "src.site_index",
+    "heading_records": "src.heading_table",
+    "write_heading_table": "src.heading_table",
+    "HeadingStore": "src.heading_store",
+    "extract_section": "src.sections",
+    "split_files": "src.sections",
+    "Heading": "src.heading",
+    "Profiler": "src.profiling",
+    "Slugger": "src.slugger",
+    "SLUG_STYLES": "src.slugger",
+    "TocOptions": "src.toc_options",
+    "NUMBERING_STYLES": "src.header_numarator",
+}
+
+__all__ = ["__version__", *_EXPORTS]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    # Cache the value, so __getattr__ is not called for it again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
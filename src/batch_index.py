@@ -0,0 +1,349 @@
+"""
+batch_index.py
+
+This module provides batch indexing: it expands directories, glob patterns and
+file lists into Markdown files, then indexes them across a pool of worker
+processes so that thousands of files can be handled by a single invocation.
+
+In check mode nothing is written: each file is indexed in memory and compared
+with its current output, which is what a pre-commit hook or a CI job needs.
+git_changed_files selects the Markdown files a git diff touches, so such a
+check only reads the files that changed.
+"""
+
+import functools
+import glob
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from src.incremental_index import index_file_incremental
+from src.index_markdown import (
+    check_file,
+    index_file,
+    index_file_in_place,
+    indexed_path,
+)
+from src.profiling import NULL_PROFILER, Profiler
+
+# Characters that make a command-line path a glob pattern
+GLOB_CHARS = "*?["
+
+
+def is_glob(path):
+    """
+    Returns True if path contains glob wildcards.
+    """
+    return any(char in path for char in GLOB_CHARS)
+
+
+def is_markdown_source(path):
+    """
+    Returns True for '.md' files that are not '-indexed.md' outputs.
+    """
+    lower = path.lower()
+    return lower.endswith(".md") and not lower.endswith("-indexed.md")
+
+
+def collect_markdown_files(paths):
+    """
+    Expands directories and glob patterns into a sorted list of Markdown files.
+
+    Directories are walked recursively. Files ending in '-indexed.md' found while
+    walking a directory or expanding a glob are skipped, since they are outputs
+    of a previous run.
+    Explicit file paths are kept as given (even if missing) so that the error can
+    be reported per file.
+
+    Args:
+        paths (iterable of str): Files, directories or glob patterns.
+
+    Returns:
+        list of str: Unique Markdown file paths.
+    """
+    files = []
+    seen = set()
+
+    def add(path):
+        if path not in seen:
+            seen.add(path)
+            files.append(path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                for name in names:
+                    if is_markdown_source(name):
+                        found.append(os.path.join(root, name))
+            for found_path in sorted(found):
+                add(found_path)
+        elif is_glob(path):
+            for found_path in sorted(glob.glob(path, recursive=True)):
+                if is_markdown_source(found_path) and os.path.isfile(found_path):
+                    add(found_path)
+        else:
+            add(path)
+
+    return files
+
+
+def read_file_list(stream):
+    """
+    Reads one path per line from a text stream, ignoring blank lines.
+    """
+    return [line.strip() for line in stream if line.strip()]
+
+
+def changed_markdown_files(names, paths=()):
+    """
+    Keeps the Markdown sources among the changed file names (e.g. the output
+    of 'git diff --name-only'): files that are deleted, are not Markdown or
+    are outside every one of paths (when given) are left out.
+
+    Args:
+        names (iterable of str): Changed file paths.
+        paths (iterable of str): Files or directories to keep the names in.
+
+    Returns:
+        list of str: Unique Markdown file paths, in the order of names.
+    """
+    roots = [os.path.abspath(path) for path in paths]
+    files = []
+    seen = set()
+    for name in names:
+        if name in seen or not is_markdown_source(name) or not os.path.isfile(name):
+            continue
+        path = os.path.abspath(name)
+        if roots and not any(
+            path == root or path.startswith(os.path.join(root, "")) for root in roots
+        ):
+            continue
+        seen.add(name)
+        files.append(name)
+    return files
+
+
+def git_changed_files(rev="HEAD", paths=()):
+    """
+    Returns the Markdown files that differ from the git revision rev in the
+    working tree (staged or not), relative to the current directory. Untracked
+    files are not included.
+
+    Args:
+        rev (str): Revision to compare with, e.g. "HEAD" or "origin/main".
+        paths (iterable of str): See changed_markdown_files.
+
+    Returns:
+        list of str: Markdown file paths (see changed_markdown_files).
+
+    Raises:
+        OSError: If git cannot be run, or fails (e.g. outside a repository or
+            with an unknown revision).
+    """
+
+    def git(*args):
+        run = subprocess.run(("git",) + args, capture_output=True)
+        if run.returncode:
+            message = os.fsdecode(run.stderr).strip()
+            raise OSError(f"git {args[0]} failed: {message or run.returncode}")
+        return os.fsdecode(run.stdout)
+
+    top = git("rev-parse", "--show-toplevel").strip()
+    names = git("diff", "--name-only", "-z", "--diff-filter=d", rev, "--", top)
+    # With -z, every name ends with a NUL
+    names = [os.path.relpath(os.path.join(top, name)) for name in names.split("\0")]
+    return changed_markdown_files(names[:-1], paths)
+
+
+def output_path(input_file, in_place=False):
+    """
+    Returns the path a batch run writes input_file's result to.
+    """
+    return input_file if in_place else indexed_path(input_file)
+
+
+def index_one(
+    input_file,
+    engine="lines",
+    in_place=False,
+    slug_style="default",
+    profile=False,
+    incremental=False,
+    toc_options=None,
+    check=False,
+):
+    """
+    Indexes a single file and reports the outcome instead of raising.
+
+    This is the unit of work sent to the worker processes.
+
+    Args:
+        input_file (str): Path to the Markdown (.md) file.
+        engine (str): Indexing engine passed to index_file.
+        in_place (bool): Re-index the file in place (see index_file_in_place).
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        profile (bool): Record the stages of the run (see src.profiling).
+        incremental (bool): With in_place, only rescan what changed since the
+            last run (see index_file_incremental).
+        toc_options (TocOptions, optional): Headings to number and list, and
+            how (see src.toc_options).
+        check (bool): Write nothing, only check whether the output is up to
+            date (see check_file). incremental is then ignored: the result
+            would be the same.
+
+    Returns:
+        dict: {
+            "input": (str) the input path,
+            "output": (str) the output path,
+            "headers": (int) number of headings found,
+            "error": (str or None) error message if the file failed,
+            "cached": (bool) True if the file was skipped as unchanged,
+            "changed": (bool) False if an in-place file was already up to date
+                (in check mode, True if the output is out of date),
+            "written": (tuple or None) (mtime_ns, size) of the file right
+                after it was rewritten in place, so a watcher can tell its own
+                write from a later save,
+            "profile": (list of dict) stage records, only if profile is True
+        }
+    """
+    output_file = output_path(input_file, in_place)
+    result = {
+        "input": input_file,
+        "output": output_file,
+        "headers": 0,
+        "error": None,
+        "cached": False,
+        "changed": False,
+        "written": None,
+    }
+
+    if not input_file.lower().endswith(".md"):
+        result["error"] = "not a Markdown (.md) file"
+        return result
+
+    profiler = Profiler() if profile else NULL_PROFILER
+    try:
+        if check:
+            headers, result["changed"] = check_file(
+                input_file,
+                output_file,
+                "lines" if in_place else engine,
+                in_place,
+                slug_style,
+                profiler,
+                toc_options,
+            )
+        elif in_place and incremental:
+            headers, result["changed"] = index_file_incremental(
+                input_file, slug_style, profiler, toc_options
+            )
+        elif in_place:
+            headers, result["changed"] = index_file_in_place(
+                input_file, slug_style, profiler, toc_options
+            )
+        else:
+            headers = index_file(
+                input_file,
+                output_file,
+                engine=engine,
+                slug_style=slug_style,
+                profiler=profiler,
+                toc_options=toc_options,
+            )
+            result["changed"] = True
+        result["headers"] = len(headers)
+        if in_place and not check and result["changed"]:
+            stat = os.stat(input_file)
+            result["written"] = (stat.st_mtime_ns, stat.st_size)
+    except (OSError, UnicodeDecodeError) as e:
+        result["error"] = str(e)
+
+    if profile:
+        result["profile"] = profiler.records
+    return result
+
+
+def batch_index(
+    files,
+    workers=None,
+    chunksize=1,
+    cache=None,
+    engine="lines",
+    in_place=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    incremental=False,
+    toc_options=None,
+    check=False,
+):
+    """
+    Indexes many Markdown files, spreading them across worker processes.
+
+    Args:
+        files (list of str): Markdown file paths.
+        workers (int, optional): Number of worker processes. Defaults to the
+            number of CPUs; 1 processes the files in the current process.
+        chunksize (int): Number of files handed to a worker at a time.
+        cache (IndexCache, optional): When given, unchanged files are skipped
+            and successfully indexed files are recorded.
+        engine (str): Indexing engine passed to index_file.
+        in_place (bool): Re-index the files in place instead of writing
+            '<file>-indexed.md' outputs.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        profiler (Profiler): Receives the stage records of every file, sent
+            back by the workers, plus a "cache" stage per cache lookup.
+        incremental (bool): With in_place, only rescan what changed in each
+            file since the last run (see index_file_incremental).
+        toc_options (TocOptions, optional): See index_one.
+        check (bool): Write nothing, only check which outputs are out of date
+            (see index_one). Only the files found up to date are recorded in
+            the cache.
+
+    Returns:
+        list of dict: One result per input file (see index_one), in input order.
+                      Skipped files have "cached" set to True.
+    """
+    results = {}
+    pending = []
+    for path in files:
+        headers = None
+        if cache:
+            with profiler.stage("cache", path):
+                headers = cache.lookup(path, output_path(path, in_place))
+        if headers is None:
+            pending.append(path)
+        else:
+            results[path] = {
+                "input": path,
+                "output": output_path(path, in_place),
+                "headers": headers,
+                "error": None,
+                "cached": True,
+                "changed": False,
+            }
+
+    work = functools.partial(
+        index_one,
+        engine=engine,
+        in_place=in_place,
+        slug_style=slug_style,
+        profile=profiler.enabled,
+        incremental=incremental,
+        toc_options=toc_options,
+        check=check,
+    )
+    if workers == 1 or len(pending) <= 1:
+        indexed = [work(path) for path in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            indexed = list(executor.map(work, pending, chunksize=chunksize))
+
+    for result in indexed:
+        for record in result.pop("profile", ()):
+            profiler.add(record)
+        results[result["input"]] = result
+        if cache and not result["error"] and not (check and result["changed"]):
+            cache.store(result["input"], result["output"], result["headers"])
+
+    return [results[path] for path in files]
@@ -0,0 +1,233 @@
+"""
+charset.py
+
+This module works out the character encoding of Markdown files, so that the
+indexing pipelines can work on their bytes and only decode heading lines.
+
+sniff_charset looks at the first bytes of a document:
+    - A byte order mark gives the encoding: UTF-8, UTF-16 or UTF-32, little or
+      big endian. The mark is kept in the output.
+    - Without one, NUL bytes in every other position give away UTF-16 (the
+      ASCII characters of the Markdown syntax take two bytes, one of them 0).
+    - Anything else is taken as UTF-8. Only the heading lines are decoded, so
+      only they are checked: as soon as one of them is not valid UTF-8, the
+      document is taken as FALLBACK_ENCODING instead, which decodes any byte
+      (see Charset.fall_back and with_fallback). The body of a document whose
+      headings are valid UTF-8 can be in any ASCII-compatible encoding.
+
+The Markdown syntax is ASCII, so documents in an ASCII-compatible encoding
+(UTF-8, Latin-1) are scanned without being decoded: the "mmap" engine scans
+their bytes, and the "lines" engine reads them as TRANSPORT_ENCODING (Latin-1,
+a one-to-one mapping of bytes to characters). In both cases every byte outside
+the heading lines is written back unchanged, and only the heading lines are
+decoded, numbered and encoded again (see Charset.decode_line). UTF-16 and
+UTF-32 documents are decoded in full by the "lines" engine.
+
+A document that cannot be decoded with its encoding (a UTF-8 document with a
+byte order mark, or a UTF-16 one, with an invalid heading) raises
+UnicodeDecodeError; batch runs report it for that file and go on.
+"""
+
+import codecs
+
+# Encoding of the documents that are not valid UTF-8 (it decodes any byte)
+FALLBACK_ENCODING = "latin-1"
+
+# Encoding of the text read and written by the "lines" engine for
+# ASCII-compatible documents: each character stands for the byte of its code
+TRANSPORT_ENCODING = "latin-1"
+
+# Byte order marks, longest first (the UTF-32-LE mark starts with the UTF-16-LE one)
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Encodings in which ASCII characters take more than one byte
+WIDE_ENCODINGS = ("utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be")
+
+# Number of bytes sniff_charset looks at
+SNIFF_SIZE = 4096
+
+
+class Charset:
+    """
+    The encoding of a document.
+
+    Args:
+        encoding (str): Python codec name, e.g. "utf-8" or "utf-16-le".
+        bom (bytes): The byte order mark the document starts with, if any.
+        guessed (bool): True if the encoding is only a guess (UTF-8 without a
+            byte order mark), which with_fallback may revise.
+    """
+
+    __slots__ = ("encoding", "bom", "guessed")
+
+    def __init__(self, encoding="utf-8", bom=b"", guessed=False):
+        self.encoding = encoding
+        self.bom = bom
+        self.guessed = guessed
+
+    @property
+    def wide(self):
+        """
+        True if the document cannot be scanned as bytes (UTF-16, UTF-32).
+        """
+        return self.encoding in WIDE_ENCODINGS
+
+    @property
+    def stream_encoding(self):
+        """
+        The encoding the "lines" engine reads and writes the document with.
+        """
+        return self.encoding if self.wide else TRANSPORT_ENCODING
+
+    @property
+    def mark(self):
+        """
+        The byte order mark, as stream_encoding text ("" without one).
+        """
+        return self.bom.decode(self.stream_encoding)
+
+    def decode_line(self, text):
+        """
+        Decodes a heading read as stream_encoding text.
+        """
+        if self.wide or text.isascii():
+            return text
+        return text.encode(TRANSPORT_ENCODING).decode(self.encoding)
+
+    def encode_line(self, text):
+        """
+        Encodes a line (a rewritten heading or an index line) for writing as
+        stream_encoding text.
+        """
+        if self.wide or text.isascii():
+            return text
+        return text.encode(self.encoding).decode(TRANSPORT_ENCODING)
+
+    def fall_back(self, headers):
+        """
+        Switches a guessed charset to FALLBACK_ENCODING, when a heading turns
+        out not to be UTF-8. The headers (Heading) already decoded were valid
+        UTF-8, so their text is converted instead of being read again.
+        """
+        for header in headers:
+            header.header_text = _recode(header.header_text)
+            if header.new_text is not None:
+                header.new_text = _recode(header.new_text)
+        self.encoding = FALLBACK_ENCODING
+        self.guessed = False
+
+    def open(self, path, mode="r", newline=None):
+        """
+        Opens the document at path as stream_encoding text, for reading (after
+        the byte order mark) or for writing (after writing the mark).
+        """
+        file = open(path, mode, encoding=self.stream_encoding, newline=newline)
+        if self.bom:
+            if "r" in mode:
+                file.read(len(self.mark))
+            else:
+                file.write(self.mark)
+        return file
+
+    def __eq__(self, other):
+        if isinstance(other, Charset):
+            return (self.encoding, self.bom, self.guessed) == (
+                other.encoding,
+                other.bom,
+                other.guessed,
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"Charset({self.encoding!r}, bom={self.bom!r}, guessed={self.guessed!r})"
+        )
+
+
+def _recode(text):
+    # The text a FALLBACK_ENCODING decoding of the UTF-8 encoding of text gives
+    return text if text.isascii() else text.encode("utf-8").decode(FALLBACK_ENCODING)
+
+
+def sniff_charset(head):
+    """
+    Works out the encoding of a document from its first bytes (see the module
+    docstring).
+
+    Args:
+        head (bytes-like): The start of the document (SNIFF_SIZE bytes are
+            enough).
+
+    Returns:
+        Charset: The encoding of the document.
+    """
+    head = bytes(head[:SNIFF_SIZE])
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return Charset(encoding, bom)
+
+    if b"\x00" in head:
+        # ASCII characters in UTF-16 have a NUL high byte
+        even = head[0::2].count(0)
+        odd = head[1::2].count(0)
+        if odd == 0 and even * 4 > len(head) // 2:
+            return Charset("utf-16-be")
+        if even == 0 and odd * 4 > len(head) // 2:
+            return Charset("utf-16-le")
+    return Charset("utf-8", guessed=True)
+
+
+def sniff_file(path):
+    """
+    Returns the Charset of the file at path (see sniff_charset). A file that
+    cannot be read is taken as UTF-8, and opening it again reports the error.
+    """
+    try:
+        with open(path, "rb") as f:
+            return sniff_charset(f.read(SNIFF_SIZE))
+    except OSError:
+        return Charset("utf-8", guessed=True)
+
+
+def sniff_stream(stream):
+    """
+    Returns the Charset of a binary stream, and skips its byte order mark.
+
+    The start of the stream is looked at with peek when the stream has it
+    (e.g. sys.stdin.buffer), or read and sought back when it is seekable.
+    Other streams are taken as UTF-8.
+    """
+    if hasattr(stream, "peek"):
+        head = stream.peek(SNIFF_SIZE)
+    elif stream.seekable():
+        position = stream.tell()
+        head = stream.read(SNIFF_SIZE)
+        stream.seek(position)
+    else:
+        return Charset("utf-8", guessed=True)
+    charset = sniff_charset(head)
+    stream.read(len(charset.bom))
+    return charset
+
+
+def with_fallback(run, charset):
+    """
+    Returns run(charset). If charset is a guess and run raises
+    UnicodeDecodeError, the document is not UTF-8: returns run() with a
+    FALLBACK_ENCODING Charset instead. This is for the scans that cannot use
+    Charset.fall_back (the "mmap" scanner decodes the headings itself).
+    """
+    try:
+        return run(charset)
+    except UnicodeDecodeError:
+        if not charset.guessed:
+            raise
+    return run(Charset(FALLBACK_ENCODING))
@@ -0,0 +1,1380 @@
+"""
+cli.py
+
+This module provides the command line interface. It reads a Markdown file,
+detects all of its headings, applies a custom numbering scheme, and creates a
+navigable index at the beginning of the file. The updated file is then saved as
+a new Markdown file.
+
+It is installed as the markdown-indexer console script, and also runs through
+the markdown-indexer.py script at the root of the repository. To keep start-up
+fast, modules are imported by the code paths that use them, so a single-file
+run never loads the process pool, the SQLite cache or the watcher, and a plain
+single-file run (the call an editor integration makes on every save) is parsed
+without argparse. For even faster runs, src.client hands the work to a running
+"serve" process.
+
+Usage:
+    markdown-indexer <markdown_file.md> [options]
+    markdown-indexer - [options] < input.md > output.md
+    python markdown-indexer.py <markdown_file.md> [options]
+
+Example:
+    python markdown-indexer.py README.md 
+    python markdown-indexer.py doc.md -o doc-indexed.md
+    pandoc -t gfm manual.docx | python markdown-indexer.py - > manual.md
+    python markdown-indexer.py -i doc.md
+    python markdown-indexer.py -i --incremental handbook.md
+    python markdown-indexer.py -i --max-depth 3 --numbering roman doc.md
+    python markdown-indexer.py --watch -i docs/
+    python markdown-indexer.py docs/ "guides/**/*.md" -j 8
+    python markdown-indexer.py --parallel huge-manual.md
+    python markdown-indexer.py docs/ --profile --profile-top 5
+    find docs -name '*.md' | python markdown-indexer.py --files-from -
+    python markdown-indexer.py --check -i --changed
+    git diff --name-only main | python markdown-indexer.py --check -i --changed -
+    python markdown-indexer.py serve --socket /tmp/markdown-indexer.sock
+    python markdown-indexer.py site docs/ -o docs/index.md --json site.json
+    python markdown-indexer.py headings docs/ --format ndjson > headings.ndjson
+    python markdown-indexer.py store docs/
+    python markdown-indexer.py query "Install*"
+    python markdown-indexer.py query --path docs/guide.md --section 3.2.1
+    python markdown-indexer.py extract manual.md 3.2.1 > proxies.md
+    python markdown-indexer.py split manuals/ --level 2 -j 8
+
+Requirements:
+    - Python 3.7+
+    - Modules: argparse, concurrent.futures, re, os, sqlite3
+    - Local modules:
+        batch_index
+        charset
+        heading_store
+        heading_table
+        index_cache
+        index_markdown
+        profiling
+        sections
+        service
+        site_index
+        watch_index
+        parse_markdown_headers
+        header_numarator
+        new_headers
+        create_index
+        slugger
+        toc_options
+"""
+
+import os
+import sys
+
+# Slug styles accepted by --slug-style (src.slugger.SLUG_STYLES, which is not
+# imported here to keep start-up fast)
+SLUG_STYLES = ("default", "github", "gitlab", "commonmark")
+
+# Numbering styles accepted by --numbering (src.header_numarator.NUMBERING_STYLES)
+NUMBERING_STYLES = ("default", "dotted", "roman", "none")
+
+# Characters that make a command-line path a glob pattern (src.batch_index.GLOB_CHARS)
+GLOB_CHARS = "*?["
+
+# Default heading store (src.heading_store.STORE_FILE)
+STORE_FILE = "markdown-headings.sqlite3"
+
+# Path standing for stdin (as the input) or stdout (as --output)
+STDIO_PATH = "-"
+
+# Buffer size of the standard streams in filter mode, so that a pipe is read
+# and written in large blocks (src.index_markdown.BUFFER_SIZE)
+STDIO_BUFFER_SIZE = 1024 * 1024
+
+
+def open_cache(args):
+    """
+    Opens the index cache selected by --cache-dir, or returns None.
+    """
+    if not args.cache_dir:
+        return None
+    from src.index_cache import IndexCache
+
+    options = {
+        "engine": args.engine,
+        "in_place": args.in_place,
+        "slug_style": args.slug_style,
+        "toc": toc_options(args).as_dict(),
+    }
+    return IndexCache(args.cache_dir, options=options)
+
+
+def print_cache_stats(cache):
+    """
+    Prints the cache hit/miss/eviction counters.
+    """
+    stats = cache.stats
+    print(
+        f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions."
+    )
+
+
+def update_store(args, files, workers=1):
+    """
+    Updates the heading store selected by --store, if any, with files (see
+    src.heading_store) across workers processes, and reports the files that
+    failed.
+    """
+    if not args.store:
+        return
+    from src.heading_store import HeadingStore
+
+    with HeadingStore(args.store, args.slug_style, toc_options(args)) as store:
+        summary = store.update(files, workers, args.engine)
+    for path, error in summary["errors"]:
+        print(f"Failed to store: {path}: {error}", file=sys.stderr)
+
+
+def open_profiler(args):
+    """
+    Returns the profiler selected by --profile, or NULL_PROFILER.
+    """
+    from src.profiling import NULL_PROFILER, Profiler
+
+    return Profiler() if args.profile else NULL_PROFILER
+
+
+def toc_options(args):
+    """
+    Returns the TocOptions selected by --min-depth, --max-depth, --start-level
+    and --numbering.
+
+    Raises:
+        ValueError: If an option is out of range.
+    """
+    from src.toc_options import TocOptions
+
+    return TocOptions(args.min_depth, args.max_depth, args.start_level, args.numbering)
+
+
+def add_toc_arguments(parser):
+    """
+    Adds --min-depth, --max-depth, --start-level and --numbering, read by
+    toc_options, to parser.
+    """
+    parser.add_argument(
+        "--min-depth",
+        type=int,
+        default=1,
+        metavar="LEVEL",
+        help="Leave headings above this level out of the index and unnumbered "
+        "(default: 1).",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=6,
+        metavar="LEVEL",
+        help="Leave headings below this level out of the index and unnumbered "
+        "(default: 6). Headings ending with '<!-- omit from toc -->' are always "
+        "left out.",
+    )
+    parser.add_argument(
+        "--start-level",
+        type=int,
+        default=2,
+        metavar="LEVEL",
+        help="First numbered level; indexed headings above it are listed without "
+        "a number (default: 2).",
+    )
+    parser.add_argument(
+        "--numbering",
+        choices=NUMBERING_STYLES,
+        default="default",
+        help="Numbering style: 'default' (1., 1.1), 'dotted' (1., 1.1.), "
+        "'roman' (I., I.A) or 'none' (default: default).",
+    )
+
+
+def add_input_arguments(parser, workers=True):
+    """
+    Adds the arguments of the subcommands that read many Markdown files to
+    parser: their paths, --files-from, -j (unless workers is False),
+    --slug-style, --mmap and the TocOptions flags (see add_toc_arguments).
+    They are checked by check_input_arguments.
+    """
+    parser.add_argument(
+        "paths", nargs="*", help="Markdown files, directories or glob patterns."
+    )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Read paths from FILE, one per line ('-' for stdin).",
+    )
+    if workers:
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            help="Number of worker processes (default: number of CPUs).",
+        )
+    parser.add_argument(
+        "--slug-style",
+        choices=SLUG_STYLES,
+        default="default",
+        help="Rules used to build the slugs (default: default).",
+    )
+    parser.add_argument(
+        "--mmap",
+        dest="engine",
+        action="store_const",
+        const="mmap",
+        default="lines",
+        help="Memory-map the files instead of reading them line by line.",
+    )
+    add_toc_arguments(parser)
+
+
+def check_input_arguments(parser, args):
+    """
+    Exits through parser.error if the arguments added by add_input_arguments
+    are missing or out of range.
+    """
+    if not args.paths and not args.files_from:
+        parser.error("the following arguments are required: paths")
+    if getattr(args, "workers", None) is not None and args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    try:
+        toc_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def read_input_paths(paths, files_from=None):
+    """
+    Returns paths followed by those listed in the file files_from, one per
+    line ('-' reads them from stdin).
+    """
+    from src.batch_index import read_file_list
+
+    paths = list(paths)
+    if files_from == "-":
+        paths.extend(read_file_list(sys.stdin))
+    elif files_from:
+        with open(files_from, "r", encoding="utf-8") as f:
+            paths.extend(read_file_list(f))
+    return paths
+
+
+def print_profile(profiler, args):
+    """
+    Prints the recorded stages to stderr, as a table or as JSON lines.
+    """
+    from src.profiling import format_json_lines, format_table
+
+    if args.profile == "json":
+        lines = format_json_lines(profiler.records, args.profile_top)
+    else:
+        lines = format_table(profiler.records, args.profile_top)
+    for line in lines:
+        print(line, file=sys.stderr)
+
+
+def parse_simple_args(argv):
+    """
+    Parses the command line of a plain single-file run without argparse:
+
+        [-i | --in-place] [--incremental] [--slug-style STYLE] file.md
+
+    Args:
+        argv (list of str): The arguments.
+
+    Returns:
+        Namespace or None: The options, with the defaults main would give them,
+                           or None if argv is anything else (including invalid
+                           arguments, which argparse then reports).
+    """
+    from types import SimpleNamespace
+
+    args = SimpleNamespace(
+        markdown_file=[],
+        output=None,
+        slug_style="default",
+        in_place=False,
+        incremental=False,
+        engine="lines",
+        cache_dir=None,
+        store=None,
+        profile=None,
+        min_depth=1,
+        max_depth=6,
+        start_level=2,
+        numbering="default",
+    )
+    arguments = iter(argv)
+    for arg in arguments:
+        if arg in ("-i", "--in-place"):
+            args.in_place = True
+        elif arg == "--incremental":
+            args.incremental = True
+        elif arg == "--slug-style" or arg.startswith("--slug-style="):
+            style = arg[len("--slug-style=") :] if "=" in arg else next(arguments, "")
+            if style not in SLUG_STYLES:
+                return None
+            args.slug_style = style
+        elif arg.startswith("-") or args.markdown_file:
+            return None
+        else:
+            args.markdown_file.append(arg)
+
+    if len(args.markdown_file) != 1 or (args.incremental and not args.in_place):
+        return None
+    path = args.markdown_file[0]
+    if any(char in path for char in GLOB_CHARS):
+        return None
+    if not path.lower().endswith(".md") or not os.path.isfile(path):
+        return None
+    return args
+
+
+def run_batch(args):
+    """
+    Indexes (or with --check, checks) every file selected by the batch options
+    and prints a summary. Exits with status 1 if any file failed, or was out of
+    date with --check.
+    """
+    from src.batch_index import (
+        batch_index,
+        changed_markdown_files,
+        collect_markdown_files,
+        git_changed_files,
+        read_file_list,
+    )
+
+    paths = read_input_paths(args.markdown_file, args.files_from)
+
+    if args.changed == "-":
+        files = changed_markdown_files(read_file_list(sys.stdin), paths)
+    elif args.changed is not None:
+        try:
+            files = git_changed_files(args.changed, paths)
+        except OSError as e:
+            sys.exit(f"Error: {e}")
+    else:
+        files = collect_markdown_files(paths)
+    if args.changed is not None and not files:
+        print("No changed Markdown files.")
+        return
+
+    cache = open_cache(args)
+    profiler = open_profiler(args)
+    try:
+        results = batch_index(
+            files,
+            workers=args.workers,
+            chunksize=args.chunksize,
+            cache=cache,
+            engine=args.engine,
+            in_place=args.in_place,
+            slug_style=args.slug_style,
+            profiler=profiler,
+            incremental=args.incremental,
+            toc_options=toc_options(args),
+            check=args.check,
+        )
+        if cache:
+            cache.evict_missing()
+    finally:
+        if cache:
+            cache.close()
+
+    failures = [result for result in results if result["error"]]
+    for result in results:
+        if result["error"]:
+            continue
+        if result["cached"] or not result["changed"]:
+            status = "Up to date"
+        elif args.check:
+            status = "Out of date"
+        elif args.in_place:
+            status = "Updated"
+        else:
+            status = "Indexed file created"
+        print(f"{status}: {result['output']} ({result['headers']} headings)")
+    for result in failures:
+        print(f"Failed: {result['input']}: {result['error']}", file=sys.stderr)
+
+    stale = [result for result in results if args.check and result["changed"]]
+    if args.check:
+        print(
+            f"Checked {len(results) - len(failures)} of {len(results)} files, "
+            f"{len(stale)} out of date, {len(failures)} failed."
+        )
+    else:
+        print(
+            f"Indexed {len(results) - len(failures)} of {len(results)} files, "
+            f"{len(failures)} failed."
+        )
+    if cache:
+        print_cache_stats(cache)
+    indexed = [result["input"] for result in results if not result["error"]]
+    update_store(args, indexed, args.workers)
+    if args.profile:
+        print_profile(profiler, args)
+    if failures or stale:
+        sys.exit(1)
+
+
+def run_watch(args):
+    """
+    Watches the given paths and re-indexes files as they change, printing the
+    latency of each re-index. Runs until interrupted with Ctrl+C.
+    """
+    import functools
+    import time
+
+    from src.batch_index import index_one
+    from src.watch_index import Watcher, watch
+
+    index = functools.partial(
+        index_one,
+        engine=args.engine,
+        in_place=args.in_place,
+        slug_style=args.slug_style,
+        incremental=args.incremental,
+        toc_options=toc_options(args),
+    )
+    watcher = Watcher(args.markdown_file, index, debounce=args.debounce)
+
+    def report(result):
+        stamp = time.strftime("%H:%M:%S")
+        if result["error"]:
+            print(f"[{stamp}] Failed: {result['input']}: {result['error']}")
+            return
+        status = "Indexed" if result["changed"] else "Up to date"
+        print(
+            f"[{stamp}] {status}: {result['output']} ({result['headers']} headings) "
+            f"in {result['seconds'] * 1000:.1f} ms"
+        )
+
+    print("Watching for changes, press Ctrl+C to stop.")
+    try:
+        watch(watcher, report, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_serve(argv):
+    """
+    Runs the "serve" subcommand: the JSON-lines indexing service (see
+    src.service), on stdin/stdout or on a local socket, until end of input or
+    Ctrl+C. Prints the latency percentiles to stderr when it stops.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer serve",
+        description="Index Markdown documents sent as JSON lines, "
+        "over stdin/stdout or a local socket.",
+    )
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket.")
+    listen.add_argument(
+        "--port", type=int, help="Listen on a TCP port on localhost (127.0.0.1)."
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="Worker processes for large documents (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Documents that may wait in each queue (default: 64).",
+    )
+    parser.add_argument(
+        "--large-size",
+        type=int,
+        default=256 * 1024,
+        metavar="BYTES",
+        help="Requests of at least this many bytes are handled by the worker "
+        "processes (default: 262144).",
+    )
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1.")
+
+    import asyncio
+    from src.service import IndexService, serve_socket, serve_stdio
+
+    service = IndexService(args.workers, args.queue_size, args.large_size)
+    if args.socket or args.port is not None:
+
+        def ready(server):
+            address = server.sockets[0].getsockname()
+            print(f"Listening on {address}, press Ctrl+C to stop.", file=sys.stderr)
+
+        serving = serve_socket(service, args.socket, args.port, ready)
+    else:
+        serving = serve_stdio(service)
+
+    try:
+        asyncio.run(serving)
+    except KeyboardInterrupt:
+        pass
+
+    stats = service.stats() if service.completed or service.failed else None
+    if stats:
+        latency = stats["latency_ms"]
+        print(
+            f"Served {stats['completed']} documents, {stats['failed']} failed. "
+            f"Latency p50 {latency['p50']} ms, p90 {latency['p90']} ms, "
+            f"p99 {latency['p99']} ms, max {latency['max']} ms.",
+            file=sys.stderr,
+        )
+
+
+def run_site(argv):
+    """
+    Runs the "site" subcommand: writes one index spanning many Markdown files
+    (see src.site_index), as Markdown and optionally as JSON. Exits with status
+    1 if any file failed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer site",
+        description="Build one index linking to the headings of many Markdown "
+        "files, numbered per file.",
+    )
+    add_input_arguments(parser)
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="site-index.md",
+        help="Path of the Markdown index (default: site-index.md). Links are "
+        "relative to its directory.",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write the index as JSON.")
+    parser.add_argument(
+        "--order",
+        metavar="FILE",
+        help="File listing paths in the order they should appear, one per line. "
+        "Files it does not list follow, sorted by path (the default order).",
+    )
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args)
+
+    from src.batch_index import collect_markdown_files, read_file_list
+    from src.site_index import site_order, write_site_index
+
+    paths = read_input_paths(args.paths, args.files_from)
+    order = []
+    if args.order:
+        with open(args.order, "r", encoding="utf-8") as f:
+            order = read_file_list(f)
+
+    # The index itself must not be indexed by the next run
+    outputs = {os.path.abspath(path) for path in (args.output, args.json) if path}
+    files = [
+        path
+        for path in collect_markdown_files(paths)
+        if os.path.abspath(path) not in outputs
+    ]
+    files = site_order(files, order)
+
+    json_file = open(args.json, "w", encoding="utf-8") if args.json else None
+    try:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = write_site_index(
+                files,
+                output,
+                json_file,
+                base_dir=os.path.dirname(os.path.abspath(args.output)),
+                workers=args.workers,
+                engine=args.engine,
+                slug_style=args.slug_style,
+                toc_options=toc_options(args),
+            )
+    finally:
+        if json_file:
+            json_file.close()
+
+    for path, error in summary["errors"]:
+        print(f"Failed: {path}: {error}", file=sys.stderr)
+    print(
+        f"Site index created: {args.output} ({summary['files']} files, "
+        f"{summary['headings']} headings, {len(summary['errors'])} failed)."
+    )
+    if summary["errors"]:
+        sys.exit(1)
+
+
+def run_headings(argv):
+    """
+    Runs the "headings" subcommand: writes the heading table of Markdown files
+    (see src.heading_table) as NDJSON or JSON, to stdout or to a file. Exits
+    with status 1 if any file failed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer headings",
+        description="Write the headings of Markdown files, with their line, "
+        "byte offset, level, number, text and slug, as NDJSON or JSON.",
+    )
+    add_input_arguments(parser, workers=False)
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="Path of the heading table ('-' for stdout, the default).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("ndjson", "json"),
+        default="ndjson",
+        help="One JSON object per line (ndjson, the default) or a JSON array.",
+    )
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args)
+
+    from src.batch_index import collect_markdown_files
+    from src.heading_table import write_heading_table
+
+    files = collect_markdown_files(read_input_paths(args.paths, args.files_from))
+
+    if args.output == "-":
+        summary = write_heading_table(
+            files,
+            sys.stdout,
+            args.format,
+            args.engine,
+            args.slug_style,
+            toc_options(args),
+        )
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = write_heading_table(
+                files,
+                output,
+                args.format,
+                args.engine,
+                args.slug_style,
+                toc_options(args),
+            )
+
+    # stdout may hold the table, so messages go to stderr
+    for path, error in summary["errors"]:
+        print(f"Failed: {path}: {error}", file=sys.stderr)
+    if summary["errors"]:
+        sys.exit(1)
+
+
+def run_store(argv):
+    """
+    Runs the "store" subcommand: updates the heading store (see
+    src.heading_store) with the given Markdown files, scanning only those that
+    changed, and removes the files that no longer exist. Exits with status 1
+    if any file failed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer store",
+        description="Store the headings of Markdown files, with their section "
+        "ranges, in a SQLite database for the query subcommand.",
+    )
+    add_input_arguments(parser)
+    parser.add_argument(
+        "--store",
+        default=STORE_FILE,
+        metavar="PATH",
+        help=f"Path of the database (default: {STORE_FILE}).",
+    )
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args)
+
+    from src.batch_index import collect_markdown_files
+    from src.heading_store import HeadingStore
+
+    files = collect_markdown_files(read_input_paths(args.paths, args.files_from))
+
+    with HeadingStore(args.store, args.slug_style, toc_options(args)) as store:
+        summary = store.update(files, args.workers, args.engine)
+        removed = store.remove_missing()
+
+    for path, error in summary["errors"]:
+        print(f"Failed: {path}: {error}", file=sys.stderr)
+    print(
+        f"Heading store updated: {args.store} ({summary['files']} files, "
+        f"{summary['scanned']} scanned, {removed} removed, "
+        f"{len(summary['errors'])} failed)."
+    )
+    if summary["errors"]:
+        sys.exit(1)
+
+
+def run_query(argv):
+    """
+    Runs the "query" subcommand: looks headings up in the heading store (see
+    src.heading_store) and writes them as NDJSON or JSON, or only their file
+    paths. Exits with status 1 if nothing matches.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer query",
+        description="Look up headings in the store built by the store "
+        "subcommand, by text, slug, file, level or section number.",
+    )
+    parser.add_argument(
+        "text",
+        nargs="?",
+        help="Pattern the heading text must match, case insensitively ('*' and "
+        "'?' are wildcards).",
+    )
+    parser.add_argument("--slug", help="Anchor of the heading.")
+    parser.add_argument("--path", help="File the heading is in.")
+    parser.add_argument("--level", type=int, help="Level of the heading.")
+    parser.add_argument(
+        "--section",
+        metavar="HEADING",
+        help="With --path: the heading with this number (e.g. 3.2.1) or slug, "
+        "whose record gives the line and byte range of its section.",
+    )
+    parser.add_argument(
+        "--files",
+        action="store_true",
+        help="Only write the paths of the matching files, one per line.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("ndjson", "json"),
+        default="ndjson",
+        help="One JSON object per line (ndjson, the default) or a JSON array.",
+    )
+    parser.add_argument("--limit", type=int, help="Maximum number of headings.")
+    parser.add_argument(
+        "--store",
+        default=STORE_FILE,
+        metavar="PATH",
+        help=f"Path of the database (default: {STORE_FILE}).",
+    )
+    args = parser.parse_args(argv)
+    if args.section is not None:
+        if args.path is None:
+            parser.error("--section requires --path.")
+        if args.text or args.slug or args.level is not None or args.files:
+            parser.error(
+                "--section cannot be combined with a text, --slug, --level or "
+                "--files."
+            )
+    if args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1.")
+    if not os.path.exists(args.store):
+        sys.exit(
+            f"Error: No heading store at '{args.store}', create it with "
+            "'markdown-indexer store'."
+        )
+
+    import json
+
+    from src.heading_store import HeadingStore
+
+    with HeadingStore(args.store) as store:
+        if args.section is not None:
+            record = store.section(args.path, args.section)
+            results = [record] if record else []
+        elif args.files:
+            results = store.find_files(args.text, args.slug, args.level)
+        else:
+            results = store.find(
+                args.text, args.slug, args.path, args.level, args.limit
+            )
+
+    if args.files:
+        lines = results
+    elif args.format == "json":
+        lines = ["[" + ",\n".join(json.dumps(record) for record in results) + "]"]
+    else:
+        lines = [json.dumps(record) for record in results]
+    for line in lines:
+        print(line)
+    if not results:
+        sys.exit(1)
+
+
+def run_extract(argv):
+    """
+    Runs the "extract" subcommand: writes the sections of the given headings
+    of a Markdown file (see src.sections), to stdout or to a file. Exits with
+    status 1 if a heading is not found.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer extract",
+        description="Copy the sections of headings of a Markdown file, from each "
+        "heading to the next one of the same or a higher level.",
+    )
+    parser.add_argument("markdown_file", help="Path to the Markdown file.")
+    parser.add_argument(
+        "headings",
+        nargs="+",
+        metavar="heading",
+        help="Number (e.g. 3.2.1) or slug of a heading, as the file gets them "
+        "when indexed in place with the same options.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=STDIO_PATH,
+        help="Path of the extracted sections ('-' for stdout, the default).",
+    )
+    parser.add_argument(
+        "--store",
+        metavar="PATH",
+        help="Take the byte ranges from this heading store when it is up to date "
+        "for the file, instead of scanning it.",
+    )
+    parser.add_argument(
+        "--slug-style",
+        choices=SLUG_STYLES,
+        default="default",
+        help="Rules used to build the slugs (default: default).",
+    )
+    parser.add_argument(
+        "--mmap",
+        dest="engine",
+        action="store_const",
+        const="mmap",
+        default="lines",
+        help="Memory-map the file instead of reading it line by line.",
+    )
+    add_toc_arguments(parser)
+    args = parser.parse_args(argv)
+    if not os.path.isfile(args.markdown_file):
+        parser.error(f"Error: The file '{args.markdown_file}' does not exist.")
+    try:
+        options = toc_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from src.sections import extract_section
+
+    store = None
+    if args.store and os.path.exists(args.store):
+        from src.heading_store import HeadingStore
+
+        store = HeadingStore(args.store, args.slug_style, options)
+    missing = []
+    try:
+        with open_stdio(args.output, "wb") as output:
+            for heading in args.headings:
+                record = extract_section(
+                    args.markdown_file,
+                    heading,
+                    output,
+                    args.engine,
+                    args.slug_style,
+                    store,
+                    options,
+                )
+                if record is None:
+                    missing.append(heading)
+    except UnicodeDecodeError as e:
+        sys.exit(f"Error: Cannot decode '{args.markdown_file}': {e}")
+    finally:
+        if store:
+            store.close()
+
+    # stdout may hold the sections, so messages go to stderr
+    for heading in missing:
+        print(
+            f"Error: No heading '{heading}' in '{args.markdown_file}'.",
+            file=sys.stderr,
+        )
+    if missing:
+        sys.exit(1)
+
+
+def run_split(argv):
+    """
+    Runs the "split" subcommand: splits Markdown files into one file per
+    section (see src.sections), across worker processes, and prints a summary.
+    Exits with status 1 if any file failed.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="markdown-indexer split",
+        description="Split Markdown files into one file per section, cut at the "
+        "headings of a level or higher.",
+    )
+    add_input_arguments(parser)
+    parser.add_argument(
+        "--level",
+        type=int,
+        default=2,
+        metavar="LEVEL",
+        help="Cut at the headings of this level or higher (default: 2, chapters).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="DIR",
+        help="Directory of the parts of a single file. By default the parts of "
+        "'<file>.md' go to '<file>-split/'.",
+    )
+    args = parser.parse_args(argv)
+    check_input_arguments(parser, args)
+    if not 1 <= args.level <= 6:
+        parser.error("--level must be between 1 and 6.")
+
+    from src.batch_index import collect_markdown_files
+    from src.sections import split_files
+
+    files = collect_markdown_files(read_input_paths(args.paths, args.files_from))
+    if args.output and len(files) > 1:
+        parser.error("Error: --output can only be used with a single input file.")
+
+    results = split_files(
+        files,
+        args.output,
+        args.level,
+        args.workers,
+        args.engine,
+        args.slug_style,
+        toc_options(args),
+    )
+
+    failures = [result for result in results if result["error"]]
+    for result in results:
+        if not result["error"]:
+            print(
+                f"Split: {result['input']} -> {result['output']} "
+                f"({len(result['parts'])} parts)"
+            )
+    for result in failures:
+        print(f"Failed: {result['input']}: {result['error']}", file=sys.stderr)
+    print(
+        f"Split {len(results) - len(failures)} of {len(results)} files, "
+        f"{len(failures)} failed."
+    )
+    if failures:
+        sys.exit(1)
+
+
+# Subcommands, selected by the first command-line argument
+SUBCOMMANDS = {
+    "serve": run_serve,
+    "site": run_site,
+    "headings": run_headings,
+    "store": run_store,
+    "query": run_query,
+    "extract": run_extract,
+    "split": run_split,
+}
+
+
+def main(argv=None):
+    """
+    Main function to parse command-line arguments, validate inputs,
+    process the Markdown file headings, and produce a new indexed file.
+
+    Args:
+        argv (list of str, optional): Arguments, by default sys.argv[1:].
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Subcommands have their own options
+    if argv and argv[0] in SUBCOMMANDS:
+        SUBCOMMANDS[argv[0]](argv[1:])
+        return
+
+    # A plain single-file run skips argparse
+    args = parse_simple_args(argv)
+    if args is not None:
+        run_single(args)
+        return
+
+    # 1) Set up argument parsing
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Generate an index from a markdown file, reorder its headings, "
+        "and save a new indexed version."
+    )
+    parser.add_argument(
+        "markdown_file",
+        nargs="*",
+        help="Path to the Markdown file to be indexed ('-' for stdin, which is "
+        "indexed to stdout by default). Several files, directories or glob "
+        "patterns switch to batch mode.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Optional path for the output file ('-' for stdout). "
+        "If omitted, '<input-file>-indexed.md' will be used.",
+    )
+    parser.add_argument(
+        "--slug-style",
+        choices=SLUG_STYLES,
+        default="default",
+        help="Rules used to build the index anchors (default: default). "
+        "Use 'github' or 'gitlab' to match the anchors of those sites.",
+    )
+    parser.add_argument(
+        "-i",
+        "--in-place",
+        action="store_true",
+        help="Re-index the file itself instead of writing '<input-file>-indexed.md'. "
+        "The index is wrapped in <!-- toc --> markers and existing numbering is "
+        "replaced, so running it again changes nothing.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="With --in-place, keep the heading table in a '.<file>.toc.json' "
+        "sidecar and only rescan the part of the file that changed since the "
+        "last run.",
+    )
+    add_toc_arguments(parser)
+    parser.add_argument(
+        "--mmap",
+        dest="engine",
+        action="store_const",
+        const="mmap",
+        default="lines",
+        help="Memory-map the input and copy the body as raw bytes instead of "
+        "decoding it. Faster and leaner on very large files.",
+    )
+    parser.add_argument(
+        "--parallel",
+        dest="engine",
+        action="store_const",
+        const="parallel",
+        help="Like --mmap, and scan a single huge file in chunks across all CPUs.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-index the given files, directories or globs "
+        "whenever they change.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.1,
+        help="Watch mode: seconds between polls (default: 0.1).",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.2,
+        help="Watch mode: seconds a file must stay unchanged before it is "
+        "re-indexed (default: 0.2).",
+    )
+    parser.add_argument(
+        "--files-from",
+        metavar="FILE",
+        help="Batch mode: read paths to index from FILE, one per line ('-' for stdin).",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        help="Batch mode: number of worker processes (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Write nothing: report the files whose index is out of date and exit "
+        "with status 1 if there are any. With --in-place, the files themselves "
+        "are checked, otherwise their '-indexed.md' outputs.",
+    )
+    parser.add_argument(
+        "--changed",
+        nargs="?",
+        const="HEAD",
+        metavar="REV",
+        help="Batch mode: only process the Markdown files that differ from the git "
+        "revision REV (default: HEAD), within the given files or directories if "
+        "any (put them before --changed). Untracked files are left out. '-' reads "
+        "the changed paths from stdin instead, e.g. from 'git diff --name-only'.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Skip files unchanged since the last run, using a cache stored in DIR.",
+    )
+    parser.add_argument(
+        "--store",
+        metavar="PATH",
+        help="Also keep the headings of the indexed files in the heading store "
+        "at PATH, for the query subcommand (only files that changed are "
+        "scanned).",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=16,
+        help="Batch mode: number of files handed to a worker at a time (default: 16).",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="table",
+        choices=("table", "json"),
+        help="Print the time, bytes, lines, headings and peak memory growth of "
+        "each stage to stderr, as a table (default) or as JSON lines.",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Batch mode: number of slowest files listed by --profile (default: 10).",
+    )
+
+    # Parse arguments
+    args = parser.parse_args(argv)
+
+    if not args.markdown_file and not args.files_from and args.changed is None:
+        parser.error("the following arguments are required: markdown_file")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    if args.chunksize < 1:
+        parser.error("--chunksize must be at least 1.")
+    if args.in_place and args.output:
+        parser.error("Error: --in-place cannot be combined with --output.")
+    if args.in_place and args.engine != "lines":
+        parser.error(f"Error: --in-place cannot be combined with --{args.engine}.")
+    if args.incremental and not args.in_place:
+        parser.error("Error: --incremental requires --in-place.")
+    if args.profile_top < 0:
+        parser.error("--profile-top cannot be negative.")
+    if args.check and args.engine == "parallel":
+        parser.error("Error: --check cannot be combined with --parallel, use --mmap.")
+    try:
+        toc_options(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # 2) '-' reads stdin or writes stdout: index a single document as a filter
+    stdio = STDIO_PATH in args.markdown_file or args.output == STDIO_PATH
+    if stdio:
+        if (
+            len(args.markdown_file) != 1
+            or args.watch
+            or args.files_from
+            or args.changed is not None
+            or args.check
+        ):
+            parser.error(
+                "Error: '-' can only be used with a single input file, without "
+                "--watch, --files-from, --changed or --check."
+            )
+        if args.in_place:
+            parser.error("Error: --in-place cannot be used with '-'.")
+        if args.engine != "lines":
+            parser.error(f"Error: --{args.engine} cannot be used with '-'.")
+        if args.cache_dir or args.store:
+            parser.error("Error: --cache-dir and --store cannot be used with '-'.")
+
+    # 3) Watch mode keeps running over the given paths
+    if args.watch:
+        if args.output or args.files_from or args.profile or args.check:
+            parser.error(
+                "Error: --watch cannot be used with --output, --files-from, "
+                "--profile or --check."
+            )
+        if args.changed is not None or args.store:
+            parser.error("Error: --watch cannot be used with --changed or --store.")
+        run_watch(args)
+        return
+
+    # 4) Several inputs, directories, globs, a file list, changed files or a
+    # check: run in batch mode
+    if not stdio and (
+        args.files_from
+        or args.changed is not None
+        or args.check
+        or len(args.markdown_file) > 1
+        or os.path.isdir(args.markdown_file[0])
+        or any(char in args.markdown_file[0] for char in GLOB_CHARS)
+    ):
+        if args.output:
+            parser.error(
+                "Error: --output can only be used with a single input file, "
+                "without --check."
+            )
+        if args.changed is not None and args.files_from:
+            parser.error("Error: --changed cannot be combined with --files-from.")
+        if args.engine == "parallel":
+            parser.error(
+                "Error: --parallel can only be used with a single input file; "
+                "batch mode already spreads the files across processes."
+            )
+        run_batch(args)
+        return
+
+    # 5) Validate the file
+    input_file = args.markdown_file[0]
+
+    if input_file != STDIO_PATH:
+        # Check if file exists
+        if not os.path.isfile(input_file):
+            parser.error(f"Error: The file '{input_file}' does not exist.")
+
+        # Check if file has .md extension
+        if not input_file.lower().endswith(".md"):
+            parser.error(
+                f"Error: The file '{input_file}' is not a Markdown (.md) file."
+            )
+
+    if stdio:
+        run_filter(args)
+    else:
+        run_single(args)
+
+
+def open_stdio(path, mode):
+    """
+    Opens path in binary mode with a STDIO_BUFFER_SIZE buffer. STDIO_PATH
+    stands for stdin or stdout (depending on mode), whose file descriptor is
+    opened again, and left open when the file is closed.
+    """
+    if path != STDIO_PATH:
+        return open(path, mode, buffering=STDIO_BUFFER_SIZE)
+    stream = sys.stdin if "r" in mode else sys.stdout
+    return open(stream.fileno(), mode, buffering=STDIO_BUFFER_SIZE, closefd=False)
+
+
+def run_filter(args):
+    """
+    Indexes args.markdown_file[0] to args.output, either of which may be '-'
+    for stdin or stdout, as a streaming filter (see index_stream): only the
+    heading table is held in memory, the body is spooled to a temporary file
+    as in file mode, and the output is written in STDIO_BUFFER_SIZE blocks.
+    Prints nothing when the document goes to stdout.
+    """
+    from src.index_markdown import index_stream, indexed_path
+
+    input_file = args.markdown_file[0]
+    if args.output:
+        output_file = args.output
+    elif input_file == STDIO_PATH:
+        output_file = STDIO_PATH
+    else:
+        output_file = indexed_path(input_file)
+
+    profiler = open_profiler(args)
+    # Messages printed so far must come before the document
+    sys.stdout.flush()
+    try:
+        with open_stdio(input_file, "rb") as source:
+            with open_stdio(output_file, "wb") as destination:
+                index_stream(
+                    source,
+                    destination,
+                    slug_style=args.slug_style,
+                    profiler=profiler,
+                    toc_options=toc_options(args),
+                    # A pipe may carry any amount: spool to disk like a file
+                    spool_size=0,
+                )
+    except UnicodeDecodeError as e:
+        name = "stdin" if input_file == STDIO_PATH else f"'{input_file}'"
+        sys.exit(f"Error: Cannot decode {name}: {e}")
+    except BrokenPipeError:
+        # The reader stopped early (e.g. head): Python would still try to
+        # flush stdout at exit, so point it at /dev/null
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+    if output_file != STDIO_PATH:
+        print(f"Indexed file created: {output_file}")
+    if args.profile:
+        print_profile(profiler, args)
+
+
+def run_single(args):
+    """
+    Indexes the single file args.markdown_file[0], already validated, and
+    prints the outcome.
+    """
+    input_file = args.markdown_file[0]
+
+    # 6) Determine the output file path
+    from src.index_markdown import index_file, index_file_in_place, indexed_path
+
+    if args.in_place:
+        output_file = input_file
+    elif args.output:
+        output_file = args.output
+    else:
+        # Replace or append '-indexed.md'
+        output_file = indexed_path(input_file)
+
+    # 7) Index the file in a single streaming pass, unless the cache says
+    # the existing output is still up to date
+    cache = open_cache(args)
+    profiler = open_profiler(args)
+    try:
+        if cache:
+            with profiler.stage("cache", input_file):
+                up_to_date = cache.lookup(input_file, output_file) is not None
+            if up_to_date:
+                print(f"Up to date: {output_file}")
+                update_store(args, [input_file])
+                if args.profile:
+                    print_profile(profiler, args)
+                return
+
+        if args.in_place and args.incremental:
+            from src.incremental_index import index_file_incremental
+
+            headers, changed = index_file_incremental(
+                input_file, args.slug_style, profiler, toc_options(args)
+            )
+        elif args.in_place:
+            headers, changed = index_file_in_place(
+                input_file, args.slug_style, profiler, toc_options(args)
+            )
+        else:
+            headers = index_file(
+                input_file,
+                output_file,
+                args.engine,
+                slug_style=args.slug_style,
+                profiler=profiler,
+                toc_options=toc_options(args),
+            )
+            changed = True
+        if cache:
+            cache.store(input_file, output_file, len(headers))
+    except UnicodeDecodeError as e:
+        sys.exit(f"Error: Cannot decode '{input_file}': {e}")
+    finally:
+        if cache:
+            cache.close()
+
+    if not changed:
+        print(f"Up to date: {output_file}")
+    elif args.in_place:
+        print(f"Updated: {output_file}")
+    else:
+        print(f"Indexed file created: {output_file}")
+    update_store(args, [input_file])
+    if args.profile:
+        print_profile(profiler, args)
+
+
+if __name__ == "__main__":
+    main()
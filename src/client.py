@@ -0,0 +1,191 @@
+"""
+client.py
+
+This module provides a thin command line client for the indexing service (see
+src.service). It hands the files to a "serve --socket" process that is already
+running, so that an editor integration calling it on every save does not pay
+for loading the indexing modules: the client only imports the few standard
+library modules it needs, and parses its options without argparse.
+
+Usage:
+    markdown-indexer-client [--socket PATH] [-i] [--incremental]
+                            [--slug-style STYLE] [--min-depth LEVEL]
+                            [--max-depth LEVEL] [--start-level LEVEL]
+                            [--numbering STYLE] <markdown_file.md>...
+
+The socket path defaults to the MARKDOWN_INDEXER_SOCKET environment variable.
+Without a socket, or without a service listening on it, the files are indexed
+by the command line interface in this process instead, so the client can be
+used wherever markdown-indexer is.
+
+Example:
+    markdown-indexer serve --socket /tmp/markdown-indexer.sock &
+    export MARKDOWN_INDEXER_SOCKET=/tmp/markdown-indexer.sock
+    markdown-indexer-client -i README.md
+"""
+
+import json
+import os
+import socket
+import sys
+
+# Environment variable giving the default socket path
+SOCKET_ENV = "MARKDOWN_INDEXER_SOCKET"
+
+USAGE = (
+    "usage: markdown-indexer-client [--socket PATH] [-i] [--incremental] "
+    "[--slug-style STYLE] [--min-depth LEVEL] [--max-depth LEVEL] "
+    "[--start-level LEVEL] [--numbering STYLE] markdown_file [markdown_file ...]"
+)
+
+# Options taking a value, with the request field they set and its type
+VALUE_OPTIONS = {
+    "--slug-style": ("slug_style", str),
+    "--min-depth": ("min_depth", int),
+    "--max-depth": ("max_depth", int),
+    "--start-level": ("start_level", int),
+    "--numbering": ("numbering", str),
+}
+
+
+def parse_args(argv):
+    """
+    Parses the client options.
+
+    Args:
+        argv (list of str): The arguments.
+
+    Returns:
+        tuple: (socket_path, files, options, cli_argv) where options holds the
+               request fields ("in_place", "incremental", "slug_style", ...)
+               and cli_argv the same arguments for src.cli, without --socket.
+
+    Raises:
+        ValueError: If an option is unknown or misses its value, or if a
+            level is not an integer.
+    """
+    socket_path = os.environ.get(SOCKET_ENV)
+    files = []
+    options = {}
+    cli_argv = []
+    arguments = iter(argv)
+    for arg in arguments:
+        name, has_value, value = arg.partition("=")
+        if name == "--socket" or name in VALUE_OPTIONS:
+            if not has_value:
+                value = next(arguments, None)
+                if value is None:
+                    raise ValueError(f"argument {name}: expected one argument")
+            if name == "--socket":
+                socket_path = value
+                continue
+            field, convert = VALUE_OPTIONS[name]
+            try:
+                options[field] = convert(value)
+            except ValueError:
+                raise ValueError(f"argument {name}: invalid value: '{value}'")
+            cli_argv.extend((name, value))
+            continue
+
+        if arg in ("-i", "--in-place"):
+            options["in_place"] = True
+        elif arg == "--incremental":
+            options["incremental"] = True
+        elif arg.startswith("-"):
+            raise ValueError(f"unrecognized argument: {arg}")
+        else:
+            files.append(arg)
+        cli_argv.append(arg)
+
+    if not files:
+        raise ValueError("the following arguments are required: markdown_file")
+    return socket_path, files, options, cli_argv
+
+
+def send_requests(socket_path, requests):
+    """
+    Sends requests to the service listening on the Unix socket at socket_path
+    and waits for all the responses.
+
+    Args:
+        socket_path (str): Path of the service socket.
+        requests (list of dict): Requests, with their index as "id".
+
+    Returns:
+        list: The response to each request, in order (None if missing).
+
+    Raises:
+        OSError: If the service cannot be reached.
+    """
+    payload = b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in requests)
+    responses = {}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(payload)
+        # The service answers every request before closing the connection
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                response = json.loads(line)
+                responses[response.get("id")] = response
+    return [responses.get(i) for i in range(len(requests))]
+
+
+def main(argv=None):
+    """
+    Runs the client: prints one line per file, like a batch run of
+    markdown-indexer, and exits with status 1 if any file failed.
+
+    Args:
+        argv (list of str, optional): Arguments, by default sys.argv[1:].
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # 1) Parse the options
+    try:
+        socket_path, files, options, cli_argv = parse_args(argv)
+    except ValueError as e:
+        print(f"{USAGE}\nmarkdown-indexer-client: error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    # 2) Hand the files to the service, whose working directory may differ
+    responses = None
+    if socket_path and hasattr(socket, "AF_UNIX"):
+        requests = [
+            {"id": i, "path": os.path.abspath(path), **options}
+            for i, path in enumerate(files)
+        ]
+        try:
+            responses = send_requests(socket_path, requests)
+        except OSError:
+            responses = None
+
+    # 3) No service: run the command line interface here
+    if responses is None:
+        from src.cli import main as cli_main
+
+        cli_main(cli_argv)
+        return
+
+    # 4) Report the outcome of each file
+    failed = False
+    for path, response in zip(files, responses):
+        if response is None or "error" in response:
+            error = response["error"] if response else "no response from the service"
+            print(f"Failed: {path}: {error}", file=sys.stderr)
+            failed = True
+            continue
+        if not response["changed"]:
+            status = "Up to date"
+        elif options.get("in_place"):
+            status = "Updated"
+        else:
+            status = "Indexed file created"
+        print(f"{status}: {response['output']} ({response['headings']} headings)")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
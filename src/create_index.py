@@ -3,20 +3,24 @@ create_index.py
 
 This module provides a function to build a Markdown index (a navigable list)
 from the numbered headings. The index uses standard Markdown anchors based
-on a simplified slug of the heading text (including numbering if desired).
+on a slug of the heading text (including numbering if desired), generated
+by src.slugger.
 """
 
-import re
+from src.heading import as_headings
+from src.slugger import Slugger
 
 
-def create_index(headers):
+def create_index(headers, slug_style="default", min_depth=1):
     """
-    Generates a navigable index in Markdown format from a list of heading dicts.
-    The anchor is built by converting (header_number + header_text) to a slug:
+    Generates a navigable index in Markdown format from a list of headings.
+    The anchor is built by converting (header_number + header_text) to a slug.
+    With the "default" slug style:
         1) convert to lowercase
         2) strip non-alphanumeric characters except whitespace and '-'
         3) replace spaces with '-'
         4) reduce multiple hyphens to a single '-'
+    Repeated slugs get a "-1", "-2", ... suffix, as on GitHub.
 
     Example output:
         - [1. Introduction](#1-introduction)
@@ -24,34 +28,32 @@ def create_index(headers):
           - [1.2 Configuration](#1-2-configuration)
 
     Args:
-        headers (list of dict): Each dict must have:
+        headers (list of Heading): Each heading must have:
             - "header_level" (int)
             - "header_number" (str)
             - "header_text" (str)
+            Old-style dicts are converted to Heading objects in place.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        min_depth (int): Level of the top entries of the index, which are not
+            indented (see src.toc_options).
 
     Returns:
         list of str: Lines of Markdown forming an index (each line is a list item).
     """
     index_lines = []
+    slugger = Slugger(slug_style)
 
-    for header in headers:
+    for header in as_headings(headers):
         # Indentation based on header_level:
-        # Level 1 -> no indent, Level 2 -> 2 spaces, etc.
-        indent = "  " * (header["header_level"] - 1)
+        # Level 1 -> no indent, Level 2 -> 2 spaces, etc. (from min_depth)
+        indent = "  " * (header.header_level - min_depth)
 
         # Link text: the visible text in the list
         # If H1 has header_number as "", it will effectively be just the text
-        link_text = f"{header['header_number']} {header['header_text']}".strip()
+        link_text = f"{header.header_number} {header.header_text}".strip()
 
-        # Create a slug for the anchor
-        anchor_text = link_text.lower()  # 1) to lowercase
-        anchor_text = re.sub(r"[^\w\s-]", "", anchor_text)  # 2) remove unwanted chars
-        anchor_text = anchor_text.strip().replace(" ", "-")  # 3) spaces -> hyphens
-        anchor_text = re.sub(r"-+", "-", anchor_text)  # 4) reduce multiple hyphens
-
-        # If the slug ends up empty, assign a default
-        if not anchor_text:
-            anchor_text = "header"
+        # Create a unique slug for the anchor
+        anchor_text = slugger.slug(link_text)
 
         # Build the Markdown link line
         index_line = f"{indent}- [{link_text}](#{anchor_text})"
@@ -7,31 +7,195 @@ for Markdown headings. For instance:
     - Level 3 heading under "1." becomes "1.1"
     - Level 4 heading under "1.1" becomes "1.1.1"
 ... and so on.
+
+Other numbering styles are available (see format_number), and numbering can
+start at another level than H2.
 """
 
+import functools
+import re
+
+from src.heading import as_headings
+
+# Numbering styles, for a level 3 heading under the first level 2 one:
+#   "default": "1." then "1.1"      "dotted": "1." then "1.1."
+#   "roman": "I." then "I.A"        "none": no numbers
+NUMBERING_STYLES = ("default", "dotted", "roman", "none")
+
+# With the "roman" style, the formats of the parts of a number, by depth
+_ROMAN_NUMERALS = (
+    (1000, "M"),
+    (900, "CM"),
+    (500, "D"),
+    (400, "CD"),
+    (100, "C"),
+    (90, "XC"),
+    (50, "L"),
+    (40, "XL"),
+    (10, "X"),
+    (9, "IX"),
+    (5, "V"),
+    (4, "IV"),
+    (1, "I"),
+)
+_ROMAN_PART_PATTERNS = (
+    "[IVXLCDM]+|0",
+    "[A-Z]+|0",
+    r"\d+",
+    "[a-z]+|0",
+    "[ivxlcdm]+|0",
+)
+
+
+def _roman(count):
+    numeral = []
+    for value, letters in _ROMAN_NUMERALS:
+        while count >= value:
+            numeral.append(letters)
+            count -= value
+    return "".join(numeral)
+
+
+def _letters(count):
+    # 1 -> "A", 26 -> "Z", 27 -> "AA", ...
+    letters = ""
+    while count:
+        count, rest = divmod(count - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+_ROMAN_PART_FORMATS = (
+    _roman,
+    _letters,
+    str,
+    lambda count: _letters(count).lower(),
+    lambda count: _roman(count).lower(),
+)
+
+
+def _parse_roman(numeral):
+    values = dict((letters, value) for value, letters in _ROMAN_NUMERALS[::2])
+    count = 0
+    for letter, following in zip(numeral, numeral[1:] + " "):
+        value = values[letter]
+        # A smaller numeral before a larger one is subtracted ("IV")
+        count += -value if values.get(following, 0) > value else value
+    return count
+
+
+def _parse_letters(letters):
+    count = 0
+    for letter in letters:
+        count = count * 26 + ord(letter) - ord("A") + 1
+    return count
+
+
+_ROMAN_PART_PARSERS = (
+    _parse_roman,
+    _parse_letters,
+    int,
+    lambda part: _parse_letters(part.upper()),
+    lambda part: _parse_roman(part.upper()),
+)
+
+
+def format_number(parts, style="default"):
+    """
+    Formats the counters of a heading and of its numbered parents.
+
+    Args:
+        parts (list of int): The counters, from the first numbered level down
+            to the heading's level, e.g. [2, 1] for the first H3 under the
+            second H2.
+        style (str): One of NUMBERING_STYLES.
+
+    Returns:
+        str: The number: "2.1" ("default"), "2.1." ("dotted"), "II.A" ("roman")
+             or "" ("none"). A single part always ends with a dot ("2.").
+    """
+    if style == "none":
+        return ""
+    if style == "roman":
+        # Skipped levels keep a 0 part, whatever their format
+        number = ".".join(
+            _ROMAN_PART_FORMATS[depth % 5](part) if part else "0"
+            for depth, part in enumerate(parts)
+        )
+    else:
+        number = ".".join(map(str, parts))
+    if len(parts) == 1 or style == "dotted":
+        number += "."
+    return number
+
 
-def header_numarator(headers):
+def parse_number(number, style="default"):
+    """
+    Returns the counters a number was formatted from: the inverse of
+    format_number, e.g. [2, 1] for "2.1" or "II.A". Numbers of the "none"
+    style have no counters.
+    """
+    parts = [part for part in number.split(".") if part]
+    if style == "roman":
+        return [
+            _ROMAN_PART_PARSERS[depth % 5](part) if part != "0" else 0
+            for depth, part in enumerate(parts)
+        ]
+    return [int(part) for part in parts]
+
+
+@functools.lru_cache(maxsize=None)
+def number_pattern(parts, style="default"):
+    """
+    Returns the compiled pattern of a number of the given style with that many
+    parts (see format_number), followed by the space that separates it from
+    the heading text or by the end of an empty heading, or None if there is
+    no such number.
+    """
+    if parts < 1 or style == "none":
+        return None
+    if style == "roman":
+        part_patterns = [
+            f"(?:{_ROMAN_PART_PATTERNS[depth % 5]})" for depth in range(parts)
+        ]
+    else:
+        part_patterns = [r"\d+"] * parts
+    pattern = r"\.".join(part_patterns)
+    if parts == 1 or style == "dotted":
+        pattern += r"\."
+    return re.compile(f"^{pattern}(?:\\s+|$)")
+
+
+def header_numarator(headers, level_counts=None, style="default", start_level=2):
     """
     Assigns a hierarchical numbering (like 1., 1.1, 1.1.1, etc.) to each heading
-    according to its level. The numbering is stored in "header_number" key
-    within the headers list.
+    according to its level. The numbering is stored in the "header_number"
+    field of each heading.
 
     Args:
-        headers (list of dict): Output from parse_markdown_headers.
-                                Each dict must have "header_level".
+        headers (list of Heading): Output from parse_markdown_headers.
+                                   Old-style dicts with "header_level" are
+                                   converted to Heading objects in place.
+        level_counts (list of int, optional): Numbering state for levels 1 to 6.
+            Pass the same list on every call to keep numbering continuous when
+            headings are fed in one at a time (e.g. by the streaming indexer).
+        style (str): Numbering style, one of NUMBERING_STYLES.
+        start_level (int): First numbered level; headings above it (H1 by
+            default) get an empty number.
 
     Returns:
-        list of dict: The same list of headers, but with "header_number" field added.
+        list of Heading: The same list of headers, with "header_number" set.
     """
     # Track numbering count for levels 1 to 6
-    level_counts = [0, 0, 0, 0, 0, 0]
+    if level_counts is None:
+        level_counts = [0, 0, 0, 0, 0, 0]
 
-    for header in headers:
-        level = header["header_level"]
+    for header in as_headings(headers):
+        level = header.header_level
 
-        # For top-level heading (H1), we typically don't assign a number
-        if level == 1:
-            header["header_number"] = ""
+        # Headings above the start level (H1 by default) get no number
+        if level < start_level:
+            header.header_number = ""
         else:
             # Increase the count for this level
             level_counts[level - 1] += 1
@@ -40,15 +204,32 @@ def header_numarator(headers):
             for i in range(level, len(level_counts)):
                 level_counts[i] = 0
 
-            # Build the numbering string from level 2 upward
-            numbering_parts = [str(level_counts[i]) for i in range(1, level)]
-            numbering_str = ".".join(numbering_parts)
+            # Build the number from the start level downward
+            parts = level_counts[start_level - 1 : level]
+            header.header_number = format_number(parts, style)
 
-            # For example, if numbering_parts = ["1"], we might want "1."
-            # Some prefer to skip the trailing dot, adapt as you wish.
-            if len(numbering_parts) == 1:
-                numbering_str += "."
+    return headers
 
-            header["header_number"] = numbering_str
 
-    return headers
+def strip_header_number(header_text, level, style="default", start_level=2):
+    """
+    Removes a numbering prefix previously added by header_numarator, so that
+    re-indexing an already indexed document does not number headings twice
+    ("1. 1. Getting Started").
+
+    Only a prefix matching the numbering format of the heading's level is
+    removed (e.g. "1." for H2, "1.2" for H3 with the default style).
+
+    Args:
+        header_text (str): The heading text.
+        level (int): The heading level (1 to 6).
+        style (str): Numbering style the document was numbered with.
+        start_level (int): First numbered level the document was numbered with.
+
+    Returns:
+        str: The heading text without its numbering prefix.
+    """
+    pattern = number_pattern(level - start_level + 1, style)
+    if pattern is None:
+        return header_text
+    return pattern.sub("", header_text, count=1)
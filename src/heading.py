@@ -0,0 +1,130 @@
+"""
+heading.py
+
+This module provides the Heading type, the compact record that flows between
+parse_markdown_headers, header_numarator, new_headers and create_index.
+
+Heading uses __slots__ instead of a per-instance dict, which roughly halves
+the memory used by a heading table (see benchmarks/bench_heading_memory.py).
+For existing callers it still behaves like the old heading dicts:
+heading["header_text"], heading.get(...), "key" in heading and comparisons
+with plain dicts all keep working.
+"""
+
+
+class Heading:
+    """
+    A single Markdown heading.
+
+    Attributes:
+        line (int): 1-based line number of the heading.
+        header_level (int): Heading level (1 to 6).
+        header_text (str): The heading text (excluding the #).
+        header_number (str or None): Numbering set by header_numarator.
+        new_text (str or None): Rewritten heading line set by new_headers.
+        offset (int or None): Byte offset of the heading line, when scanned
+                              from a buffer.
+        end (int or None): Byte offset just past the heading line (including
+                           its line ending), when scanned from a buffer.
+    """
+
+    __slots__ = (
+        "line",
+        "header_level",
+        "header_text",
+        "header_number",
+        "new_text",
+        "offset",
+        "end",
+    )
+
+    def __init__(
+        self,
+        line,
+        header_level,
+        header_text="",
+        header_number=None,
+        new_text=None,
+        offset=None,
+        end=None,
+    ):
+        self.line = line
+        self.header_level = header_level
+        self.header_text = header_text
+        self.header_number = header_number
+        self.new_text = new_text
+        self.offset = offset
+        self.end = end
+
+    @classmethod
+    def from_dict(cls, header):
+        """
+        Builds a Heading from an old-style heading dict.
+        """
+        heading = cls(header.get("line", 0), header["header_level"])
+        for key in cls.__slots__:
+            if key in header:
+                setattr(heading, key, header[key])
+        return heading
+
+    # Compatibility shim: the dict view used by the original heading dicts.
+    # Only fields that have been set (are not None) are visible as keys.
+
+    def keys(self):
+        return [key for key in self.__slots__ if getattr(self, key) is not None]
+
+    def as_dict(self):
+        """
+        Returns the heading as an old-style dict.
+        """
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def __getitem__(self, key):
+        if key not in self.__slots__ or getattr(self, key) is None:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def copy(self):
+        return Heading(*(getattr(self, key) for key in self.__slots__))
+
+    def __eq__(self, other):
+        if isinstance(other, Heading):
+            other = other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Heading({self.as_dict()!r})"
+
+
+def as_headings(headers):
+    """
+    Converts old-style heading dicts in a list into Heading objects, in place.
+
+    Args:
+        headers (list of Heading or dict): Headings from any caller.
+
+    Returns:
+        list of Heading: The same list, containing only Heading objects.
+    """
+    for i, header in enumerate(headers):
+        if not isinstance(header, Heading):
+            headers[i] = Heading.from_dict(header)
+    return headers
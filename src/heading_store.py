@@ -0,0 +1,376 @@
+"""
+heading_store.py
+
+This module keeps the heading tables of many Markdown files in a local SQLite
+database, so that tools such as a link checker can look headings up without
+parsing the files again:
+
+    - which files have a heading whose text matches a pattern, or whose
+      anchor is a given slug;
+    - where the section of a heading ("3.2.1", or its slug) starts and ends
+      in a file, as a line range and a byte range.
+
+Each heading is stored with the fields of its heading_table record (path,
+line, byte offset, level, number, text, slug), plus the end of its section:
+the line before, and the byte offset of, the next heading of the same or a
+higher level (or the end of the file). The text and slug columns are indexed,
+so lookups take milliseconds even for large sites.
+
+The store is updated incrementally: a file is only scanned again when its
+size or mtime changed since it was stored, or when it was stored with other
+options or by another version. The files to scan are spread across worker
+processes. Paths are stored relative to the directory of the database, so a
+store can be moved together with the files it describes; they are returned
+relative to the current directory.
+"""
+
+import codecs
+import functools
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from src import __version__
+from src.charset import sniff_file
+from src.heading_table import heading_records, section_ranges
+from src.parse_markdown_headers import SCANNER_VERSION
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Default name of the database file
+STORE_FILE = "markdown-headings.sqlite3"
+
+# Read size used when counting the lines of a file
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+# Number of files handed to a worker at a time by HeadingStore.update
+STORE_CHUNKSIZE = 16
+
+# Columns of the headings table, in the order of the records' fields
+FIELDS = (
+    "path",
+    "line",
+    "end_line",
+    "offset",
+    "end",
+    "level",
+    "number",
+    "text",
+    "slug",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS headings (
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    number TEXT NOT NULL,
+    text TEXT NOT NULL COLLATE NOCASE,
+    slug TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS headings_path ON headings (path, line);
+CREATE INDEX IF NOT EXISTS headings_slug ON headings (slug);
+CREATE INDEX IF NOT EXISTS headings_text ON headings (text);
+"""
+
+
+def count_file_lines(path, charset):
+    """
+    Returns the number of lines in the file at path, in the encoding charset
+    (a last line without a newline counts too).
+    """
+    decoder = codecs.getincrementaldecoder(charset.stream_encoding)()
+    count = 0
+    last = ""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COUNT_CHUNK_SIZE), b""):
+            text = decoder.decode(chunk)
+            count += text.count("\n")
+            last = text[-1:] or last
+    if last and last != "\n":
+        count += 1
+    return count
+
+
+def scan_store_file(path, engine="lines", slug_style="default", toc_options=None):
+    """
+    Scans one file for the store, reporting errors instead of raising. This
+    is the unit of work sent to the worker processes. The numbers and slugs
+    follow toc_options (see heading_records).
+
+    Returns:
+        dict: {
+            "path": (str) the file path,
+            "size": (int) its size, and "mtime_ns": (int) its mtime, both
+                taken before the scan,
+            "rows": (list of tuple) one tuple of FIELDS per heading, without
+                the path,
+            "error": (str or None) error message if the file failed
+        }
+    """
+    result = {"path": path, "size": 0, "mtime_ns": 0, "rows": [], "error": None}
+    try:
+        stat = os.stat(path)
+        result["size"], result["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+        records = list(heading_records(path, engine, slug_style, toc_options))
+        lines = count_file_lines(path, sniff_file(path))
+        section_ranges(records, stat.st_size, lines)
+        result["rows"] = [
+            tuple(record[field] for field in FIELDS[1:]) for record in records
+        ]
+    except (OSError, UnicodeDecodeError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def _like_pattern(pattern):
+    """
+    Converts a pattern with '*' and '?' wildcards into a LIKE pattern escaped
+    with a backslash.
+    """
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+class HeadingStore:
+    """
+    Persistent heading tables of Markdown files (see the module docstring).
+
+    Args:
+        path (str): Path of the database file (created if needed, together
+            with its directory).
+        slug_style (str): Anchor rules of the stored slugs, one of
+            src.slugger.SLUG_STYLES. Files stored with other rules are
+            scanned again by update.
+        toc_options (TocOptions, optional): Headings numbered and slugged,
+            and how, by default DEFAULT_TOC_OPTIONS. Files stored with other
+            options are scanned again by update.
+    """
+
+    def __init__(self, path=STORE_FILE, slug_style="default", toc_options=None):
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.slug_style = slug_style
+        self.toc_options = toc_options or DEFAULT_TOC_OPTIONS
+        self.key = json.dumps(
+            {
+                "version": __version__,
+                "scanner": SCANNER_VERSION,
+                "slug_style": slug_style,
+                "toc_options": self.toc_options.as_dict(),
+            },
+            sort_keys=True,
+        )
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Commits pending changes and closes the database.
+        """
+        self.db.commit()
+        self.db.close()
+
+    def _key_path(self, path):
+        # Path of a file as stored: relative to the database
+        return os.path.relpath(os.path.abspath(path), self.base_dir)
+
+    def _local_paths(self, stored_paths):
+        # Paths of stored files, relative to the current directory (joined to
+        # the directory of the database, which is much faster than relpath)
+        local_dir = os.path.relpath(self.base_dir)
+        if local_dir == os.curdir:
+            return list(stored_paths)
+        return [
+            os.path.normpath(os.path.join(local_dir, path)) for path in stored_paths
+        ]
+
+    def is_current(self, path):
+        """
+        Returns True if the headings stored for the file at path are up to
+        date (same size, mtime and options).
+        """
+        row = self.db.execute(
+            "SELECT size, mtime_ns, key FROM files WHERE path = ?",
+            (self._key_path(path),),
+        ).fetchone()
+        if row is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return row == (stat.st_size, stat.st_mtime_ns, self.key)
+
+    def update(self, files, workers=None, engine="lines"):
+        """
+        Stores the headings of the files that changed since they were stored,
+        scanning them across worker processes. A file that fails is removed
+        from the store.
+
+        Args:
+            files (iterable of str): Markdown file paths.
+            workers (int, optional): Number of worker processes. Defaults to
+                the number of CPUs; 1 scans the files in the current process.
+            engine (str): Scanning engine passed to heading_records.
+
+        Returns:
+            dict: {"files": (int) files given, "scanned": (int) files scanned
+                   again, "headings": (int) headings stored for them,
+                   "errors": (list of tuple) (path, error) for the files that
+                   failed}
+        """
+        files = list(dict.fromkeys(files))
+        stale = [path for path in files if not self.is_current(path)]
+        summary = {"files": len(files), "scanned": 0, "headings": 0, "errors": []}
+
+        work = functools.partial(
+            scan_store_file,
+            engine=engine,
+            slug_style=self.slug_style,
+            toc_options=self.toc_options,
+        )
+        if workers == 1 or len(stale) <= 1:
+            results = [work(path) for path in stale]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(work, stale, chunksize=STORE_CHUNKSIZE))
+
+        with self.db:
+            for result in results:
+                path = self._key_path(result["path"])
+                self.db.execute("DELETE FROM headings WHERE path = ?", (path,))
+                if result["error"]:
+                    self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    summary["errors"].append((result["path"], result["error"]))
+                    continue
+                self.db.executemany(
+                    "INSERT INTO headings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((path,) + row for row in result["rows"]),
+                )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                    (path, result["size"], result["mtime_ns"], self.key),
+                )
+                summary["scanned"] += 1
+                summary["headings"] += len(result["rows"])
+        return summary
+
+    def remove_missing(self):
+        """
+        Removes the files that no longer exist from the store.
+
+        Returns:
+            int: Number of removed files.
+        """
+        missing = [
+            (path,)
+            for (path,) in self.db.execute("SELECT path FROM files")
+            if not os.path.exists(os.path.join(self.base_dir, path))
+        ]
+        with self.db:
+            self.db.executemany("DELETE FROM headings WHERE path = ?", missing)
+            self.db.executemany("DELETE FROM files WHERE path = ?", missing)
+        return len(missing)
+
+    def _select(self, columns, text, slug, path, level):
+        # SELECT statement and parameters for the given filters
+        conditions = []
+        parameters = []
+        if text is not None:
+            conditions.append("text LIKE ? ESCAPE '\\'")
+            parameters.append(_like_pattern(text))
+        if slug is not None:
+            conditions.append("slug = ?")
+            parameters.append(slug)
+        if path is not None:
+            conditions.append("path = ?")
+            parameters.append(self._key_path(path))
+        if level is not None:
+            conditions.append("level = ?")
+            parameters.append(level)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT {columns} FROM headings{where}", parameters
+
+    def find(self, text=None, slug=None, path=None, level=None, limit=None):
+        """
+        Looks up the stored headings matching every given filter.
+
+        Args:
+            text (str, optional): Pattern the heading text must match, case
+                insensitively; '*' matches any characters and '?' any one
+                character. Without wildcards, the whole text must match.
+            slug (str, optional): Anchor of the heading.
+            path (str, optional): File the heading is in.
+            level (int, optional): Level of the heading.
+            limit (int, optional): Maximum number of headings returned.
+
+        Returns:
+            list of dict: Heading records with the keys of FIELDS, by path
+                          and line.
+        """
+        columns = ", ".join(f'"{field}"' for field in FIELDS)
+        query, parameters = self._select(columns, text, slug, path, level)
+        query += " ORDER BY path, line"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        records = [dict(zip(FIELDS, row)) for row in self.db.execute(query, parameters)]
+        paths = self._local_paths(record["path"] for record in records)
+        for record, path in zip(records, paths):
+            record["path"] = path
+        return records
+
+    def find_files(self, text=None, slug=None, level=None):
+        """
+        Returns the files having a heading that matches every given filter
+        (see find), sorted.
+        """
+        query, parameters = self._select("DISTINCT path", text, slug, None, level)
+        rows = self.db.execute(query + " ORDER BY path", parameters)
+        return self._local_paths(path for (path,) in rows)
+
+    def section(self, path, heading):
+        """
+        Finds the section of a heading in a file.
+
+        Args:
+            path (str): File the heading is in.
+            heading (str): Number of the heading, with or without its final
+                dot ("3.2.1"), or its slug.
+
+        Returns:
+            dict or None: The heading record (see find), whose "line" and
+                          "end_line" give the line range of the section, and
+                          "offset" and "end" its byte range; None if the file
+                          has no such heading.
+        """
+        columns = ", ".join(f'"{field}"' for field in FIELDS)
+        row = self.db.execute(
+            f"SELECT {columns} FROM headings WHERE path = ? AND "
+            "(rtrim(number, '.') = rtrim(?, '.') AND number != '' "
+            "OR slug = ? AND slug != '') "
+            "ORDER BY line LIMIT 1",
+            (self._key_path(path), heading, heading),
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(FIELDS, row))
+        record["path"] = self._local_paths([record["path"]])[0]
+        return record
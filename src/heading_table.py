@@ -0,0 +1,223 @@
+"""
+heading_table.py
+
+This module exports the heading table of Markdown files for other tools (a
+search indexer, for instance), so that they do not have to parse the Markdown
+again. Each heading becomes one record:
+
+    {"path": "docs/guide.md", "line": 5, "offset": 73, "level": 2,
+     "number": "1.", "text": "Install", "slug": "1-install"}
+
+where "offset" is the byte offset of the heading line in the file, and
+"number" and "slug" are those the heading gets when the file is indexed in
+place with the same TocOptions (existing numbers are removed first, see
+index_file_in_place). Headings the options leave out of the index keep their
+text as it is, and get "" as number and slug.
+
+The records are written as NDJSON (one JSON object per line) or as a JSON
+array with one record per line. They are written file by file while the
+files are scanned, so a consumer can process them as a stream; the records
+of a file are only written once the whole file has been scanned, so a file
+that fails halfway contributes no records.
+
+section_ranges adds the extent of the section each heading starts (up to the
+next heading of the same or a higher level) to the records of a file, which
+the heading store and the section extraction use.
+"""
+
+import functools
+import json
+import mmap
+import os
+
+from src.charset import sniff_file, with_fallback
+from src.header_numarator import header_numarator, strip_header_number
+from src.parse_markdown_headers import (
+    ENGINES,
+    scan_markdown_buffer,
+    scan_markdown_lines,
+)
+from src.slugger import Slugger
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Output formats of write_heading_table
+FORMATS = ("ndjson", "json")
+
+
+def scan_headings_with_offsets(path, engine="lines"):
+    """
+    Scans a Markdown file and yields its headings with their byte offsets.
+
+    Args:
+        path (str): Path to the Markdown file.
+        engine (str): Scanning engine, one of ENGINES (see
+            parse_markdown_headers).
+
+    Yields:
+        tuple: (heading, offset), the Heading and the byte offset of its first
+               line.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}.")
+
+    # The headings are all decoded before the first one is yielded, in case
+    # the file has to be scanned again in the fallback encoding
+    run = functools.partial(_scan_with_offsets, path, engine)
+    yield from with_fallback(run, sniff_file(path))
+
+
+def _scan_with_offsets(path, engine, charset):
+    """
+    Returns the list of (heading, offset) of scan_headings_with_offsets, for a
+    file in the encoding charset.
+    """
+    if engine != "lines" and not charset.wide:
+        with open(path, "rb") as file:
+            # Empty files cannot be memory-mapped
+            if os.fstat(file.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                if engine == "parallel":
+                    from src.parallel_scan import scan_buffer_parallel
+
+                    headings = scan_buffer_parallel(
+                        path, buffer, encoding=charset.encoding, start=len(charset.bom)
+                    )
+                else:
+                    headings = scan_markdown_buffer(
+                        buffer, charset.encoding, len(charset.bom)
+                    )
+                return [(heading, heading.offset) for heading in headings]
+
+    # Line endings are kept as they are, so the lengths add up to offsets:
+    # stream_encoding text has a character per byte, unless the file is wide
+    found = []
+    offset = len(charset.bom)
+    with charset.open(path, newline="\n") as file:
+        for line, heading in scan_markdown_lines(file):
+            if heading:
+                heading.header_text = charset.decode_line(heading.header_text)
+                found.append((heading, offset))
+            offset += len(line.encode(charset.encoding)) if charset.wide else len(line)
+    return found
+
+
+def heading_records(path, engine="lines", slug_style="default", toc_options=None):
+    """
+    Yields the heading records of a Markdown file (see the module docstring)
+    as it is scanned.
+
+    Args:
+        path (str): Path to the Markdown file.
+        engine (str): Scanning engine, one of ENGINES.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        toc_options (TocOptions, optional): Headings to number and how, by
+            default DEFAULT_TOC_OPTIONS.
+
+    Yields:
+        dict: One record per heading, in document order.
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    style = toc_options.numbering
+    start_level = toc_options.start_level
+    level_counts = [0, 0, 0, 0, 0, 0]
+    slugger = Slugger(slug_style)
+    for heading, offset in scan_headings_with_offsets(path, engine):
+        # As in the index, excluded headings are neither numbered nor linked
+        number = slug = ""
+        if toc_options.includes(heading):
+            heading.header_text = strip_header_number(
+                heading.header_text, heading.header_level, style, start_level
+            )
+            header_numarator([heading], level_counts, style, start_level)
+            number = heading.header_number
+            slug = slugger.slug(f"{number} {heading.header_text}".strip())
+        yield {
+            "path": path,
+            "line": heading.line,
+            "offset": offset,
+            "level": heading.header_level,
+            "number": number,
+            "text": heading.header_text,
+            "slug": slug,
+        }
+
+
+def section_ranges(records, size, lines=None):
+    """
+    Sets the end of the section of each heading record of a file: "end_line"
+    and "end" are the line before, and the byte offset of, the next heading
+    of the same or a higher level, or lines and size for the last sections.
+
+    Args:
+        records (list of dict): Heading records of the file, in order (see
+            heading_records).
+        size (int): Size of the file in bytes.
+        lines (int, optional): Number of lines in the file. Without it, the
+            sections running to the end of the file get None as "end_line".
+    """
+    # Sections still open, with increasing levels
+    open_sections = []
+    for record in records:
+        while open_sections and open_sections[-1]["level"] >= record["level"]:
+            closed = open_sections.pop()
+            closed["end_line"] = record["line"] - 1
+            closed["end"] = record["offset"]
+        open_sections.append(record)
+    for record in open_sections:
+        record["end_line"] = lines
+        record["end"] = size
+
+
+def write_heading_table(
+    files,
+    output,
+    format="ndjson",
+    engine="lines",
+    slug_style="default",
+    toc_options=None,
+):
+    """
+    Scans files one after the other and writes their heading records to
+    output, flushing it after each file.
+
+    Args:
+        files (iterable of str): Markdown file paths.
+        output (file object): Writable text file.
+        format (str): "ndjson" (default) or "json".
+        engine (str): Scanning engine, one of ENGINES.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        toc_options (TocOptions, optional): Headings to number and how.
+
+    Returns:
+        dict: {"files": (int) files scanned, "headings": (int) records written,
+               "errors": (list of tuple) (path, error) for the files that failed}
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format '{format}', expected one of {FORMATS}.")
+
+    summary = {"files": 0, "headings": 0, "errors": []}
+    if format == "json":
+        output.write("[")
+
+    for path in files:
+        try:
+            records = [
+                json.dumps(record)
+                for record in heading_records(path, engine, slug_style, toc_options)
+            ]
+        except (OSError, UnicodeDecodeError) as e:
+            summary["errors"].append((path, str(e)))
+            continue
+        summary["files"] += 1
+        for record in records:
+            if format == "json":
+                output.write(("\n" if summary["headings"] == 0 else ",\n") + record)
+            else:
+                output.write(record + "\n")
+            summary["headings"] += 1
+        output.flush()
+
+    if format == "json":
+        output.write("\n]\n" if summary["headings"] else "]\n")
+    return summary
@@ -0,0 +1,515 @@
+"""
+incremental_index.py
+
+This module provides incremental in-place indexing, for very large documents
+where a small edit should not cost a full re-index.
+
+After each run, the heading table of the document (the position, level,
+number and text of each heading) is saved in a sidecar file next to it,
+together with CRC-32s of the document cut into blocks of whole lines. On the
+next run:
+
+    1) The document (without its index block) is compared with the saved
+       blocks: the blocks it starts and ends with are unchanged, the lines
+       between them may have changed.
+    2) The scan resumes after the last heading before the change (the block
+       scanner state is reset after a heading line), and stops at the first
+       heading after the change that was a heading in the previous run too:
+       from there on, the scan would find the same headings as before.
+    3) Numbering resumes from the number of the last heading kept, and the
+       headings after the scanned region are only renumbered until one of them
+       gets its previous number back.
+    4) The index and the rewritten heading lines are spliced into the document.
+       If the result is the current file (e.g. a paragraph was edited), the
+       file is not written at all.
+
+Without a usable sidecar (first run, other options, unreadable file), the
+whole document is scanned. Documents that are not plain UTF-8 (with a byte
+order mark, UTF-16 or Latin-1, see src.charset) are handed over to
+index_file_in_place, and have no sidecar. Either way the result is the
+document that index_file_in_place would write.
+"""
+
+import bisect
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+from src.charset import sniff_charset
+from src.create_index import create_index
+from src.heading import Heading
+from src.header_numarator import (
+    header_numarator,
+    parse_number,
+    strip_header_number,
+)
+from src.index_markdown import TOC_END, TOC_START, index_file_in_place, strip_toc
+from src.new_headers import new_headers
+from src.parse_markdown_headers import SCANNER_VERSION, scan_markdown_lines
+from src.profiling import NULL_PROFILER
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Format of the sidecar files; a sidecar of another version is ignored
+SIDECAR_VERSION = 1
+
+# Approximate size of the blocks the document is cut into for comparison
+BLOCK_SIZE = 16 * 1024
+
+# Both index markers end with it, so a single search finds the last of them
+_MARKER_TAIL = os.path.commonprefix([TOC_START[::-1], TOC_END[::-1]])[::-1]
+
+
+def sidecar_path(path):
+    """
+    Returns the path of the sidecar of the Markdown file at path:
+    '.<name>.toc.json' in the same directory.
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.toc.json")
+
+
+def _sidecar_key(slug_style, toc_options):
+    # Sidecars written with other settings are ignored
+    return {
+        "version": SIDECAR_VERSION,
+        "scanner": SCANNER_VERSION,
+        "slug_style": slug_style,
+        "toc": toc_options.as_dict(),
+        "block_size": BLOCK_SIZE,
+    }
+
+
+def load_sidecar(path, slug_style="default", toc_options=DEFAULT_TOC_OPTIONS):
+    """
+    Loads the sidecar of path.
+
+    Returns:
+        dict or None: The state saved by save_sidecar, or None if there is no
+                      usable sidecar.
+    """
+    try:
+        with open(sidecar_path(path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    key = _sidecar_key(slug_style, toc_options)
+    if not isinstance(state, dict) or state.get("key") != key:
+        return None
+    return state
+
+
+def save_sidecar(path, slug_style, state, toc_options=DEFAULT_TOC_OPTIONS):
+    """
+    Saves the sidecar of path, atomically.
+
+    Args:
+        path (str): Path of the Markdown file.
+        slug_style (str): Anchor rules the file was indexed with.
+        state (dict): The document without its index block, described by
+            "size" and "lines", its size in bytes and lines; "head", the byte
+            offset of the index block (after the front matter and the first
+            line); "blocks", [lines, size, crc32] per block; and "headings",
+            [line, offset, level, number, text] per heading, with 0-based
+            line numbers.
+        toc_options (TocOptions): Options the file was indexed with.
+    """
+    target = sidecar_path(path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".", suffix=".tmp", dir=os.path.dirname(os.path.abspath(target))
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            # json.dumps, unlike json.dump, runs the C encoder
+            f.write(json.dumps({"key": _sidecar_key(slug_style, toc_options), **state}))
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def make_blocks(buffer):
+    """
+    Cuts a document into blocks of whole lines of about BLOCK_SIZE bytes.
+
+    Returns:
+        list of list: [lines, size, crc32] per block.
+    """
+    blocks = []
+    view = memoryview(buffer)
+    start = 0
+    while start < len(buffer):
+        stop = buffer.find(b"\n", start + BLOCK_SIZE - 1) + 1 or len(buffer)
+        # The last line of the document may have no line ending
+        lines = buffer.count(b"\n", start, stop) + (buffer[stop - 1] != 10)
+        blocks.append([lines, stop - start, zlib.crc32(view[start:stop])])
+        start = stop
+    return blocks
+
+
+def common_blocks(blocks, buffer):
+    """
+    Compares the blocks of a previous version of a document with the document
+    in buffer.
+
+    Returns:
+        tuple: (prefix, suffix), the number of blocks the document still
+               starts and ends with (they do not overlap).
+    """
+    view = memoryview(buffer)
+    prefix = start = 0
+    for _, size, crc in blocks:
+        stop = start + size
+        # The block must still end a line
+        if stop > len(buffer) or (stop < len(buffer) and buffer[stop - 1] != 10):
+            break
+        if zlib.crc32(view[start:stop]) != crc:
+            break
+        prefix += 1
+        start = stop
+
+    suffix = 0
+    stop = len(buffer)
+    for _, size, crc in reversed(blocks[prefix:]):
+        begin = stop - size
+        # The block must still start a line, after the common prefix
+        if begin < start or (begin > 0 and buffer[begin - 1] != 10):
+            break
+        if zlib.crc32(view[begin:stop]) != crc:
+            break
+        suffix += 1
+        stop = begin
+    return prefix, suffix
+
+
+def level_counts_after(number, style="default", start_level=2):
+    """
+    Returns the numbering state (see header_numarator) after a heading
+    numbered number, e.g. [0, 2, 1, 0, 0, 0] after "2.1".
+    """
+    level_counts = [0, 0, 0, 0, 0, 0]
+    for level, part in enumerate(parse_number(number, style), start=start_level):
+        level_counts[level - 1] = part
+    return level_counts
+
+
+def document_bytes(data):
+    """
+    Normalizes the line endings of a document like a file opened in text mode
+    (without decoding it), and removes its index blocks like strip_toc.
+
+    Only the lines from the blank line before the first index marker to the
+    last marker are decoded and go through strip_toc: the others cannot be
+    markers.
+
+    Args:
+        data (bytes): The UTF-8 encoded document.
+
+    Returns:
+        tuple: (document, removed) where removed is the (start, stop) span of
+               data that was cut out, if that is all that changed, else None.
+    """
+    pure = b"\r" not in data
+    if not pure:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    first = data.find(TOC_START.encode("utf-8"))
+    if first == -1:
+        return data, None
+
+    line_start = data.rfind(b"\n", 0, first) + 1
+    start = data.rfind(b"\n", 0, line_start - 1) + 1 if line_start else 0
+    last = data.rfind(_MARKER_TAIL.encode("utf-8"))
+    stop = data.find(b"\n", last) + 1 or len(data)
+    # bytes.splitlines, unlike str.splitlines, only splits on line endings
+    segment = [line.decode("utf-8") for line in data[start:stop].splitlines(True)]
+    stripped = "".join(strip_toc(segment)).encode("utf-8")
+    # The lines after the last marker are dropped if it opened an index block
+    markers = (line.strip() for line in reversed(segment))
+    last_marker = next((m for m in markers if m in (TOC_START, TOC_END)), None)
+    rest = len(data) if last_marker == TOC_START else stop
+    removed = (start, rest) if pure and not stripped else None
+    view = memoryview(data)
+    return b"".join([view[:start], stripped, view[rest:]]), removed
+
+
+def _is_plain_utf8(data):
+    # True for UTF-8 documents without a byte order mark
+    if not sniff_charset(data).guessed:
+        return False
+    if data.isascii():
+        return True
+    try:
+        data.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _line_end(buffer, offset):
+    # Offset of the line after the one at offset
+    return buffer.find(b"\n", offset) + 1 or len(buffer)
+
+
+def _decoded_lines(buffer, offset):
+    # The lines of buffer from offset, decoded
+    while offset < len(buffer):
+        stop = _line_end(buffer, offset)
+        yield buffer[offset:stop].decode("utf-8")
+        offset = stop
+
+
+def _spliced(buffer, replacements, start, stop):
+    """
+    Returns buffer[start:stop] as a list of pieces (memoryviews and bytes),
+    with each (begin, end, new) of replacements, in order, replacing
+    buffer[begin:end].
+    """
+    view = memoryview(buffer)
+    pieces = []
+    for begin, end, new in replacements:
+        if start <= begin and end <= stop:
+            pieces.append(view[start:begin])
+            pieces.append(new)
+            start = end
+    pieces.append(view[start:stop])
+    return pieces
+
+
+def index_file_incremental(
+    path, slug_style="default", profiler=NULL_PROFILER, toc_options=None
+):
+    """
+    Re-indexes a Markdown file in place, like index_file_in_place, rescanning
+    only the part of it that changed since the last run (see the module
+    docstring), and updates its sidecar.
+
+    Args:
+        path (str): Path to the Markdown (.md) file.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        profiler (Profiler): Records the "scan", "index" and "write" stages;
+            "lines" counts the rescanned lines only.
+        toc_options (TocOptions, optional): See src.index_markdown.index_lines.
+
+    Returns:
+        tuple: (headers, changed) where changed is False if the file was
+               already up to date.
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    style = toc_options.numbering
+    start_level = toc_options.start_level
+    state = load_sidecar(path, slug_style, toc_options) or {
+        "size": 0,
+        "lines": 0,
+        "head": 0,
+        "blocks": [],
+        "headings": [],
+    }
+    blocks = state["blocks"]
+    old_headings = state["headings"]
+    old_lines = [heading[0] for heading in old_headings]
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if not _is_plain_utf8(data):
+        try:
+            os.remove(sidecar_path(path))
+        except FileNotFoundError:
+            pass
+        return index_file_in_place(path, slug_style, profiler, toc_options)
+
+    with profiler.stage("scan", path) as record:
+        # 1) Find the unchanged blocks at both ends
+        doc, removed = document_bytes(data)
+        prefix, suffix = common_blocks(blocks, doc)
+        prefix_lines = sum(block[0] for block in blocks[:prefix])
+        prefix_bytes = sum(block[1] for block in blocks[:prefix])
+        suffix_lines = sum(block[0] for block in blocks[len(blocks) - suffix :])
+        suffix_bytes = sum(block[1] for block in blocks[len(blocks) - suffix :])
+        middle_stop = len(doc) - suffix_bytes
+        lines = (
+            prefix_lines
+            + doc.count(b"\n", prefix_bytes, middle_stop)
+            + (middle_stop > prefix_bytes and doc[middle_stop - 1] != 10)
+            + suffix_lines
+        )
+        delta_lines = lines - state["lines"]
+        delta_bytes = len(doc) - state["size"]
+
+        # 2) Resume after the last heading before the change, with the
+        # numbering state of the last numbered heading
+        kept = bisect.bisect_left(old_lines, prefix_lines)
+        number = next(
+            (h[3] for h in reversed(old_headings[:kept]) if h[2] >= start_level), ""
+        )
+        level_counts = level_counts_after(number, style, start_level)
+        if kept:
+            line = old_lines[kept - 1] + 1
+            offset = _line_end(doc, old_headings[kept - 1][1])
+            head = state["head"]
+        else:
+            line = offset = 0
+            head = None
+        restart = line
+
+        scanned = []
+        tail = len(old_headings)
+        old_index = {old_line: i for i, old_line in enumerate(old_lines)}
+        front_matter = []
+        items = scan_markdown_lines(
+            _decoded_lines(doc, offset), front_matter if kept == 0 else None, line
+        )
+        for item, header in items:
+            size = len(item) if item.isascii() else len(item.encode("utf-8"))
+            if head is None:
+                # The front matter is collected before the first item, and the
+                # index goes after it and the first line
+                line += len(front_matter)
+                offset += len("".join(front_matter).encode("utf-8"))
+                head = offset + size
+            item_lines = item.count("\n") + (not item.endswith("\n"))
+            # Excluded headings are left as they are, like other lines
+            if header is not None and toc_options.includes(header):
+                if line >= lines - suffix_lines and line - delta_lines in old_index:
+                    # Back in step with the previous run
+                    tail = old_index[line - delta_lines]
+                    break
+                header.header_text = strip_header_number(
+                    header.header_text, header.header_level, style, start_level
+                )
+                header_numarator([header], level_counts, style, start_level)
+                new_headers([header])
+                scanned.append((line, offset, size, item_lines, header))
+            line += item_lines
+            offset += size
+        if head is None:
+            # Nothing but front matter, if anything
+            head = len(doc)
+
+        if profiler.enabled:
+            record["bytes_read"] = len(data)
+            record["lines"] = line - restart
+            record["headings"] = len(scanned)
+
+    # 3) Renumber the headings after the scanned region, until one of them
+    # gets its previous number back
+    with profiler.stage("index", path) as record:
+        headers = []
+        table = []
+        replacements = []
+        for old_line, old_offset, level, number, text in old_headings[:kept]:
+            headers.append(Heading(old_line + 1, level, text, number))
+            table.append([old_line, old_offset, level, number, text])
+
+        # Lines and bytes removed by the rewritten heading lines so far
+        shift_lines = shift_bytes = 0
+        for line, offset, size, item_lines, header in scanned:
+            headers.append(header)
+            table.append(
+                [
+                    line - shift_lines,
+                    offset - shift_bytes,
+                    header.header_level,
+                    header.header_number,
+                    header.header_text,
+                ]
+            )
+            new_line = header.new_text.encode("utf-8") + b"\n"
+            if doc[offset : offset + size] != new_line:
+                replacements.append((offset, offset + size, new_line))
+                shift_lines += item_lines - 1
+                shift_bytes += size - len(new_line)
+        if doc[head - 1 : head] not in (b"", b"\n") and not (
+            replacements and replacements[0][1] == head
+        ):
+            # The first line or front matter closes the document: end it, so
+            # the index is preceded by a blank line as in a full run
+            replacements.append((head, head, b"\n"))
+            shift_bytes -= 1
+
+        renumber = True
+        for old_line, old_offset, level, number, text in old_headings[tail:]:
+            line = old_line + delta_lines
+            offset = old_offset + delta_bytes
+            header = Heading(line + 1, level, text, number)
+            table_offset = offset - shift_bytes
+            if renumber:
+                header_numarator([header], level_counts, style, start_level)
+                if header.header_number != number:
+                    new_headers([header])
+                    stop = _line_end(doc, offset)
+                    new_line = header.new_text.encode("utf-8") + b"\n"
+                    replacements.append((offset, stop, new_line))
+                    shift_bytes += stop - offset - len(new_line)
+                elif level >= start_level:
+                    renumber = False
+            headers.append(header)
+            table.append(
+                [line - shift_lines, table_offset, level, header.header_number, text]
+            )
+
+        toc = create_index(headers, slug_style, toc_options.min_depth)
+        record["headings"] = len(headers)
+
+    # 4) Splice the index and the rewritten headings into the document
+    index_block = "".join(
+        [TOC_START + "\n", *(idx_line + "\n" for idx_line in toc), TOC_END + "\n"]
+    ).encode("utf-8")
+    if doc:
+        index_block = b"\n" + index_block
+    changed = (
+        bool(replacements)
+        or removed is None
+        or removed[0] != head
+        or data[removed[0] : removed[1]] != index_block
+    )
+    if changed:
+        with profiler.stage("write", path) as record:
+            # Sorted, the index goes before a heading rewritten at head
+            pieces = _spliced(
+                doc, sorted(replacements + [(head, head, index_block)]), 0, len(doc)
+            )
+            _replace_file(path, pieces)
+            record["bytes_written"] = len(doc) - shift_bytes + len(index_block)
+
+    # The blocks that do not overlap the rewritten lines are still valid
+    low, low_bytes = prefix, prefix_bytes
+    high, high_bytes = suffix, suffix_bytes
+    if replacements:
+        while low and low_bytes > replacements[0][0]:
+            low -= 1
+            low_bytes -= blocks[low][1]
+        while high and len(doc) - high_bytes < replacements[-1][1]:
+            high_bytes -= blocks[len(blocks) - high][1]
+            high -= 1
+    middle = b"".join(_spliced(doc, replacements, low_bytes, len(doc) - high_bytes))
+    if replacements and replacements[0][1] <= head:
+        # The first line is a rewritten heading
+        start, stop, new_line = replacements[0]
+        head -= stop - start - len(new_line)
+    new_state = {
+        "size": len(doc) - shift_bytes,
+        "lines": lines - shift_lines,
+        "head": head,
+        "blocks": blocks[:low] + make_blocks(middle) + blocks[len(blocks) - high :],
+        "headings": table,
+    }
+    save_sidecar(path, slug_style, new_state, toc_options)
+    return headers, changed
+
+
+def _replace_file(path, pieces):
+    """
+    Atomically replaces the file at path with the concatenation of pieces
+    (bytes-like objects), keeping its permissions.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".md.tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(pieces)
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
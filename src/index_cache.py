@@ -0,0 +1,200 @@
+"""
+index_cache.py
+
+This module provides a persistent cache that lets repeated runs skip files
+whose content has not changed since they were last indexed.
+
+Entries are stored in a small SQLite database under the cache directory and
+are keyed by the input path. An entry is only reused when:
+    - it was written by the same indexer and scanner versions with the same
+      options,
+    - the recorded output file still exists and has not been modified, and
+    - the input has the same size and mtime, or the same content hash.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from src import __version__
+from src.parse_markdown_headers import SCANNER_VERSION
+
+# Name of the database file created inside the cache directory
+CACHE_FILE = "index-cache.sqlite3"
+
+# Read size used when hashing input files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """
+    Returns the SHA-256 hex digest of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IndexCache:
+    """
+    Persistent record of indexed files, used to skip unchanged inputs.
+
+    Args:
+        cache_dir (str): Directory holding the cache database (created if needed).
+        options (dict, optional): Options affecting the output. Entries written
+            with different options (or by another version) are treated as misses.
+
+    Attributes:
+        stats (dict): Counters for "hits", "misses" and "evictions".
+    """
+
+    def __init__(self, cache_dir, options=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        self.key = json.dumps(
+            {
+                "version": __version__,
+                "scanner": SCANNER_VERSION,
+                "options": options or {},
+            },
+            sort_keys=True,
+        )
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                input TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                output TEXT NOT NULL,
+                output_size INTEGER NOT NULL,
+                output_mtime_ns INTEGER NOT NULL,
+                headers INTEGER NOT NULL,
+                key TEXT NOT NULL
+            )
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Commits pending changes and closes the database.
+        """
+        self.db.commit()
+        self.db.close()
+
+    def lookup(self, input_file, output_file):
+        """
+        Checks whether input_file can be skipped.
+
+        The input is only read (to compare its hash) when its size is unchanged
+        but its mtime differs, e.g. after a fresh checkout.
+
+        Args:
+            input_file (str): Path to the Markdown file.
+            output_file (str): Path the indexed file would be written to.
+
+        Returns:
+            int or None: The number of headings recorded for a cache hit,
+                         or None for a miss.
+        """
+        row = self.db.execute(
+            "SELECT size, mtime_ns, digest, output, output_size, output_mtime_ns,"
+            " headers, key FROM entries WHERE input = ?",
+            (os.path.abspath(input_file),),
+        ).fetchone()
+
+        headers = self._validate(row, input_file, output_file)
+        if headers is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return headers
+
+    def _validate(self, row, input_file, output_file):
+        if row is None:
+            return None
+
+        size, mtime_ns, digest, output, output_size, output_mtime_ns, headers, key = row
+        if key != self.key or output != os.path.abspath(output_file):
+            return None
+
+        try:
+            input_stat = os.stat(input_file)
+            output_stat = os.stat(output_file)
+        except OSError:
+            return None
+
+        # The output must still be the file we produced
+        if (output_stat.st_size, output_stat.st_mtime_ns) != (
+            output_size,
+            output_mtime_ns,
+        ):
+            return None
+
+        if input_stat.st_size != size:
+            return None
+
+        if input_stat.st_mtime_ns != mtime_ns:
+            # Touched but possibly unchanged: fall back to the content hash
+            if file_digest(input_file) != digest:
+                return None
+            self.db.execute(
+                "UPDATE entries SET mtime_ns = ? WHERE input = ?",
+                (input_stat.st_mtime_ns, os.path.abspath(input_file)),
+            )
+
+        return headers
+
+    def store(self, input_file, output_file, headers):
+        """
+        Records a successfully indexed file.
+
+        Args:
+            input_file (str): Path to the Markdown file.
+            output_file (str): Path of the indexed file that was written.
+            headers (int): Number of headings found.
+        """
+        input_stat = os.stat(input_file)
+        output_stat = os.stat(output_file)
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.abspath(input_file),
+                input_stat.st_size,
+                input_stat.st_mtime_ns,
+                file_digest(input_file),
+                os.path.abspath(output_file),
+                output_stat.st_size,
+                output_stat.st_mtime_ns,
+                headers,
+                self.key,
+            ),
+        )
+
+    def evict_missing(self):
+        """
+        Removes entries whose input file no longer exists.
+
+        Returns:
+            int: Number of evicted entries.
+        """
+        missing = [
+            (input_file,)
+            for (input_file,) in self.db.execute("SELECT input FROM entries")
+            if not os.path.exists(input_file)
+        ]
+        self.db.executemany("DELETE FROM entries WHERE input = ?", missing)
+        self.stats["evictions"] += len(missing)
+        return len(missing)
@@ -0,0 +1,857 @@
+"""
+index_markdown.py
+
+This module provides the streaming indexing engine. The input is read exactly
+once, as a stream of lines: heading detection, numbering, heading rewriting and
+index building all run as stages over that single pass.
+
+Because the index has to be written before the body, the (rewritten) body is
+spooled to a temporary file while scanning. Only the heading list is kept in
+memory, so peak memory is bounded by the number of headings, not by file size.
+Documents indexed from text or streams keep their body in memory up to
+SPOOL_SIZE, so indexing a string does not touch the disk.
+
+For very large files, the "mmap" engine memory-maps the input instead and
+records the byte span of each heading. The output is then assembled from
+memoryview slices of the unchanged byte ranges between headings, with the
+rewritten heading lines spliced in, so the body is never decoded at all. The
+"parallel" engine works the same way, but scans the input in chunks across
+worker processes (see src.parallel_scan); numbering and the rest of the
+pipeline then run once over the joined heading list.
+
+In "reindex" mode the index is wrapped in TOC_START/TOC_END markers, and an
+existing marked index and existing heading numbers are removed before indexing,
+so indexing an already indexed document gives the same document back. This is
+what index_file_in_place relies on.
+
+Files are indexed in their own encoding (see src.charset): the byte order
+mark, if any, is kept, and only the heading lines are decoded and encoded
+again. For UTF-8 and Latin-1 files, every other byte is copied unchanged
+(except for the line endings the "lines" engine normalizes).
+
+Which headings are numbered and listed, and how, is set by an optional
+TocOptions (see src.toc_options). Headings it excludes are dropped as soon as
+they are scanned and are left unchanged in the output.
+
+Every function that runs the pipeline takes an optional profiler (see
+src.profiling) that records its stages: "scan", then "number" and "rewrite"
+(which the lines engine folds into "scan", since they run during the same
+pass), "index" and "write", plus "replace" for in-place runs and "check" for
+check_file, which compares the result with an existing output instead of
+writing it.
+"""
+
+import filecmp
+import functools
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+from src.charset import sniff_charset, sniff_file, sniff_stream, with_fallback
+from src.parse_markdown_headers import (
+    ENGINES,
+    count_newlines,
+    front_matter_end,
+    scan_markdown_buffer,
+    scan_markdown_lines,
+)
+from src.header_numarator import header_numarator, strip_header_number
+from src.new_headers import new_headers
+from src.create_index import create_index
+from src.profiling import NULL_PROFILER
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Chunk size used when copying the spooled body to the output
+BUFFER_SIZE = 1024 * 1024
+
+# Bodies spooled by index_lines stay in memory up to this size
+SPOOL_SIZE = 8 * 1024 * 1024
+
+# With the mmap engine, pages already processed are released in steps of this size
+RELEASE_STEP = 16 * 1024 * 1024
+
+# Markers wrapping the index in reindex mode
+TOC_START = "<!-- toc -->"
+TOC_END = "<!-- /toc -->"
+
+
+def strip_toc(lines):
+    """
+    Removes index blocks wrapped in TOC_START/TOC_END markers from a stream
+    of lines, along with the blank line inserted before them.
+
+    Args:
+        lines (iterable of str): Lines of a Markdown document.
+
+    Yields:
+        str: The lines outside index blocks.
+    """
+    in_toc = False
+    # A blank line is held back until we know whether an index block follows
+    pending_blank = None
+
+    for line in lines:
+        marker = line.strip()
+        if in_toc:
+            if marker == TOC_END:
+                in_toc = False
+            continue
+
+        if marker == TOC_START:
+            in_toc = True
+            pending_blank = None
+            continue
+
+        if pending_blank is not None:
+            yield pending_blank
+            pending_blank = None
+
+        if marker:
+            yield line
+        else:
+            pending_blank = line
+
+    if pending_blank is not None:
+        yield pending_blank
+
+
+def _scan_into(
+    lines, body, reindex=False, toc_options=DEFAULT_TOC_OPTIONS, charset=None
+):
+    """
+    Runs the scanning stages over the lines and spools the rewritten body.
+
+    Args:
+        lines (iterable of str): Lines of the input document.
+        body (file object): Writable text file receiving every line after the first.
+        reindex (bool): Strip an existing marked index and heading numbers first.
+        toc_options (TocOptions): Headings to number and list, and how.
+        charset (Charset, optional): Encoding of the document, when lines are
+            read with Charset.open; only the headings are decoded.
+
+    Returns:
+        tuple: (first_line, headers) where first_line is the (possibly rewritten)
+               first line, preceded by the front matter block if there is one,
+               or None for an empty document.
+    """
+    headers = []
+    level_counts = [0, 0, 0, 0, 0, 0]
+    first_line = None
+    front_matter = []
+
+    if reindex:
+        lines = strip_toc(lines)
+
+    style = toc_options.numbering
+    start_level = toc_options.start_level
+    for line, header in scan_markdown_lines(lines, front_matter):
+        # Excluded headings are left as they are, and not kept
+        if header is not None and toc_options.includes(header):
+            if charset is not None:
+                try:
+                    header.header_text = charset.decode_line(header.header_text)
+                except UnicodeDecodeError:
+                    # Not UTF-8 after all (see src.charset)
+                    if not charset.guessed:
+                        raise
+                    charset.fall_back(headers)
+            if reindex:
+                header.header_text = strip_header_number(
+                    header.header_text, header.header_level, style, start_level
+                )
+            # Number and rewrite the heading as soon as it is found;
+            # level_counts carries the numbering state between headings.
+            header_numarator([header], level_counts, style, start_level)
+            new_headers([header])
+            headers.append(header)
+            line = header.new_text + "\n"
+            if charset is not None:
+                line = charset.encode_line(line)
+
+        if first_line is None:
+            # The index goes after the front matter and the first line
+            first_line = "".join(front_matter) + line
+        else:
+            body.write(line)
+
+    if first_line is None and front_matter:
+        first_line = "".join(front_matter)
+    # A first line or front matter closing the document without a newline
+    # gets one, so the index is preceded by a blank line and re-running gives
+    # the same result
+    if first_line is not None and not first_line.endswith("\n"):
+        first_line += "\n"
+    return first_line, headers
+
+
+def _write_indexed(output, first_line, toc, body, reindex=False, charset=None):
+    """
+    Writes the first line, the index block (toc, from create_index) and the
+    spooled body to the output. In reindex mode the index block is wrapped in
+    TOC markers. The index lines are encoded with charset, if given.
+    """
+    if first_line is not None:
+        output.write(first_line + "\n")
+
+    if reindex:
+        output.write(TOC_START + "\n")
+    for idx_line in toc:
+        if charset is not None:
+            idx_line = charset.encode_line(idx_line)
+        output.write(idx_line + "\n")
+    if reindex:
+        output.write(TOC_END + "\n")
+
+    body.seek(0)
+    shutil.copyfileobj(body, output, BUFFER_SIZE)
+
+
+def index_lines(
+    lines,
+    output,
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+    charset=None,
+    spool_size=SPOOL_SIZE,
+):
+    """
+    Indexes a Markdown document given as a stream of lines.
+
+    The first line (usually a title or H1) is kept at the top, followed by a
+    blank line and the navigable index, then the rest of the document with
+    numbered headings.
+
+    Args:
+        lines (iterable of str): Lines of the input document (e.g. an open file).
+        output (file object): Writable text file for the indexed document.
+        reindex (bool): Mark the index and replace an existing one, so that the
+            result can be indexed again without change (see module docstring).
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        profiler (Profiler): Records the stages of the run (see src.profiling).
+        toc_options (TocOptions, optional): Depth range, start level, numbering
+            style (see src.toc_options). By default every heading is indexed.
+        charset (Charset, optional): Encoding of the document, when lines and
+            output are read and written as Charset.stream_encoding text (see
+            src.charset). By default they are plain text.
+        spool_size (int): The body is kept in memory up to this size, then
+            spilled to disk. 0 spools it to a temporary file right away, as
+            index_file does, which is faster for documents of unknown size
+            (writes to an in-memory spool go through its size check).
+
+    Returns:
+        list of Heading: The processed headings (with header_number and new_text).
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    encoding = charset.stream_encoding if charset else "utf-8"
+    # Documents given as text or streams are usually small: keep their body in
+    # memory, and only spill to disk past spool_size
+    if spool_size:
+        body = tempfile.SpooledTemporaryFile(
+            spool_size, "w+", encoding=encoding, newline=""
+        )
+    else:
+        body = tempfile.TemporaryFile("w+", encoding=encoding, newline="")
+    with body:
+        with profiler.stage("scan") as record:
+            lines = profiler.count_lines(lines, record)
+            first_line, headers = _scan_into(
+                lines, body, reindex, toc_options, charset
+            )
+            record["headings"] = len(headers)
+        toc = _build_index(headers, slug_style, profiler, toc_options=toc_options)
+        with profiler.stage("write"):
+            _write_indexed(output, first_line, toc, body, reindex, charset)
+
+    return headers
+
+
+def index_text(
+    text,
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+):
+    """
+    Indexes a Markdown document held in memory.
+
+    Args:
+        text (str): Markdown document content.
+        reindex (bool): See index_lines.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+
+    Returns:
+        str: The indexed document.
+    """
+    output = io.StringIO()
+    index_lines(io.StringIO(text), output, reindex, slug_style, profiler, toc_options)
+    return output.getvalue()
+
+
+def _is_binary(stream):
+    """
+    Returns True if stream is a binary (bytes) file object.
+    """
+    return isinstance(stream, (io.RawIOBase, io.BufferedIOBase)) or "b" in str(
+        getattr(stream, "mode", "")
+    )
+
+
+def index_stream(
+    source,
+    destination,
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+    spool_size=SPOOL_SIZE,
+):
+    """
+    Indexes a Markdown document read from one file object into another, e.g.
+    sys.stdin into sys.stdout, or a socket file into a BytesIO.
+
+    The encoding of a binary source is sniffed (see src.charset): a byte order
+    mark is kept, and a source without one is taken as UTF-8, which only its
+    heading lines have to be. When both streams are binary, only the heading
+    lines are decoded. Neither stream is closed.
+
+    Args:
+        source (file object): Readable text or binary stream.
+        destination (file object): Writable text or binary stream.
+        reindex (bool): See index_lines.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+        spool_size (int): See index_lines.
+
+    Returns:
+        list of Heading: The processed headings.
+    """
+    lines = source
+    charset = None
+    if _is_binary(source):
+        charset = sniff_stream(source)
+        if not _is_binary(destination):
+            # The body is written as text: decode all of it
+            lines = io.TextIOWrapper(source, encoding=charset.encoding)
+            charset = None
+        else:
+            lines = io.TextIOWrapper(source, encoding=charset.stream_encoding)
+    output = destination
+    if _is_binary(destination):
+        encoding = charset.stream_encoding if charset else "utf-8"
+        output = io.TextIOWrapper(destination, encoding=encoding, newline="")
+        if charset is not None:
+            output.write(charset.mark)
+
+    try:
+        headers = index_lines(
+            lines,
+            output,
+            reindex,
+            slug_style,
+            profiler,
+            toc_options,
+            charset,
+            spool_size,
+        )
+    finally:
+        # Detach rather than close the wrappers, so the streams stay open
+        if lines is not source:
+            lines.detach()
+        if output is not destination:
+            output.flush()
+            output.detach()
+    return headers
+
+
+def _build_index(
+    headers, slug_style, profiler, path=None, toc_options=DEFAULT_TOC_OPTIONS
+):
+    """
+    Runs create_index as the "index" stage of profiler.
+    """
+    with profiler.stage("index", path) as record:
+        toc = create_index(headers, slug_style, toc_options.min_depth)
+        record["headings"] = len(headers)
+    return toc
+
+
+def _output_size(output):
+    """
+    Returns the number of bytes written so far to a file opened on disk.
+    """
+    output.flush()
+    return os.fstat(output.fileno()).st_size
+
+
+def indexed_path(input_file):
+    """
+    Returns the default output path for input_file: '<base>-indexed.md'.
+    """
+    base, _ = os.path.splitext(input_file)
+    return f"{base}-indexed.md"
+
+
+def _release_pages(buffer, start, end):
+    """
+    Tells the kernel that buffer[start:end] will not be read again, so that the
+    mapped pages stop counting towards the process RSS (they stay in the page
+    cache). Does nothing on platforms without MADV_DONTNEED, or if buffer is
+    not an mmap object.
+    """
+    if not hasattr(mmap, "MADV_DONTNEED") or not isinstance(buffer, mmap.mmap):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def _write_indexed_buffer(output, buffer, headers, toc, charset, first=None):
+    """
+    Writes the indexed document for a memory-mapped input, with the index
+    lines toc (from create_index).
+
+    The front matter, the first line and the index (encoded with charset) are
+    written first; the rest of the document is copied as memoryview slices of the
+    input, with only the heading lines replaced. The line ending of the first
+    line is reused for new lines. first is the first heading of the document,
+    even if it is not in headers: when it starts the document, the index goes
+    after all of its lines (e.g. the underline of a setext heading).
+    """
+    # An unclosed front matter block takes up the whole document
+    encoding = charset.encoding
+    head = front_matter_end(buffer, len(charset.bom))
+    head = len(buffer) if head is None else head
+    first_end = buffer.find(b"\n", head) + 1 or len(buffer)
+    newline = b"\r\n" if buffer[first_end - 2 : first_end] == b"\r\n" else b"\n"
+
+    with memoryview(buffer) as view:
+        body_headers = headers
+        if first is None and headers:
+            first = headers[0]
+        if headers and headers[0] is first and first.offset == head:
+            output.write(view[:head])
+            output.write(first.new_text.encode(encoding) + newline)
+            first_end = first.end
+            body_headers = headers[1:]
+        else:
+            if first is not None and first.offset == head:
+                # A heading left out of the index is kept whole
+                first_end = first.end
+            output.write(view[:first_end])
+            if buffer[first_end - 1 : first_end] != b"\n":
+                # The first line or front matter closes the document
+                output.write(newline)
+        output.write(newline)
+
+        output.write(b"".join(idx_line.encode(encoding) + newline for idx_line in toc))
+
+        pos = released = first_end
+        for header in body_headers:
+            output.write(view[pos : header.offset])
+            output.write(header.new_text.encode(encoding) + newline)
+            pos = header.end
+            if pos - released > RELEASE_STEP:
+                _release_pages(buffer, released, pos)
+                released = pos
+        output.write(view[pos:])
+
+
+def _collect_headers(buffer, scanned, toc_options):
+    """
+    Collects the headings of scanned (from the scanner run over buffer) that
+    toc_options includes, releasing the pages of buffer already scanned.
+
+    Returns:
+        tuple: (headers, first) where first is the first heading of scanned,
+               included or not (see _write_indexed_buffer), or None.
+    """
+    headers = []
+    first = None
+    released = 0
+    for header in scanned:
+        if first is None:
+            first = header
+        if toc_options.includes(header):
+            headers.append(header)
+        if header.offset - released > RELEASE_STEP:
+            _release_pages(buffer, released, header.offset)
+            released = header.offset
+    _release_pages(buffer, released, len(buffer))
+    return headers, first
+
+
+def _number_and_index(headers, slug_style, profiler, path, toc_options):
+    """
+    Runs the "number", "rewrite" and "index" stages over the headings found
+    in a buffer, and returns the index lines.
+    """
+    with profiler.stage("number", path) as record:
+        header_numarator(headers, None, toc_options.numbering, toc_options.start_level)
+        record["headings"] = len(headers)
+    with profiler.stage("rewrite", path) as record:
+        new_headers(headers)
+        record["headings"] = len(headers)
+    return _build_index(headers, slug_style, profiler, path, toc_options)
+
+
+def _index_file_mmap(
+    input_file, output_file, slug_style, profiler, toc_options, engine, charset
+):
+    """
+    Indexes a file with the "mmap" or "parallel" engine (see the module
+    docstring), in the ASCII-compatible encoding charset.
+    """
+    with open(input_file, "rb") as f:
+        # Empty files cannot be memory-mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            open(output_file, "wb").close()
+            return []
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with profiler.stage("scan", input_file) as record:
+                if engine == "parallel":
+                    from src.parallel_scan import scan_buffer_parallel
+
+                    scanned = scan_buffer_parallel(
+                        input_file,
+                        buffer,
+                        encoding=charset.encoding,
+                        start=len(charset.bom),
+                    )
+                else:
+                    scanned = scan_markdown_buffer(
+                        buffer, charset.encoding, len(charset.bom)
+                    )
+                headers, first = _collect_headers(buffer, scanned, toc_options)
+                if profiler.enabled:
+                    record["bytes_read"] = len(buffer)
+                    record["lines"] = _count_lines(buffer)
+                    record["headings"] = len(headers)
+
+            toc = _number_and_index(
+                headers, slug_style, profiler, input_file, toc_options
+            )
+
+            # Writing to the input itself would clobber the mapping: go through
+            # a temporary copy of the output in that case
+            same_file = os.path.exists(output_file) and os.path.samefile(
+                input_file, output_file
+            )
+            with profiler.stage("write", input_file) as record:
+                if same_file:
+                    with tempfile.TemporaryFile() as tmp:
+                        _write_indexed_buffer(
+                            tmp, buffer, headers, toc, charset, first
+                        )
+                        buffer.close()
+                        tmp.seek(0)
+                        with open(output_file, "wb") as out:
+                            shutil.copyfileobj(tmp, out, BUFFER_SIZE)
+                            record["bytes_written"] = out.tell()
+                else:
+                    with open(output_file, "wb") as out:
+                        _write_indexed_buffer(
+                            out, buffer, headers, toc, charset, first
+                        )
+                        record["bytes_written"] = out.tell()
+
+    return headers
+
+
+def _count_lines(buffer):
+    """
+    Returns the number of lines in buffer (a last line without a newline
+    counts too).
+    """
+    lines = count_newlines(buffer, 0, len(buffer))
+    if len(buffer) and buffer[len(buffer) - 1 : len(buffer)] != b"\n":
+        lines += 1
+    return lines
+
+
+def index_file(
+    input_file,
+    output_file,
+    engine="lines",
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+):
+    """
+    Indexes a Markdown file and writes the result to output_file.
+
+    The input file is read only once and is closed before the output is opened,
+    so output_file may safely be the same path as input_file.
+
+    Args:
+        input_file (str): Path to the Markdown (.md) file.
+        output_file (str): Path of the indexed file to create.
+        engine (str): "lines" (default) streams the lines; "mmap" memory-maps
+            the input and copies the body as raw bytes, which is faster and uses
+            less memory on very large files. With "mmap", line endings in the
+            body are kept as they are instead of being normalized. "parallel"
+            is "mmap" with the scan spread across worker processes, for files
+            of several hundred megabytes or more. UTF-16 and UTF-32 files are
+            always indexed by the "lines" engine.
+        reindex (bool): See index_lines. Only supported by the "lines" engine.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+
+    Returns:
+        list of Heading: The processed headings.
+
+    Raises:
+        UnicodeDecodeError: If a heading cannot be decoded with the encoding
+            of the file (see src.charset).
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}.")
+    if engine != "lines" and reindex:
+        raise ValueError(f"The {engine} engine does not support reindex mode.")
+
+    charset = sniff_file(input_file)
+    if engine == "lines" or charset.wide:
+        return _index_file_lines(
+            input_file, output_file, reindex, slug_style, profiler, toc_options, charset
+        )
+    run = functools.partial(
+        _index_file_mmap,
+        input_file,
+        output_file,
+        slug_style,
+        profiler,
+        toc_options,
+        engine,
+    )
+    return with_fallback(run, charset)
+
+
+def _index_file_lines(
+    input_file, output_file, reindex, slug_style, profiler, toc_options, charset
+):
+    """
+    Indexes a file with the "lines" engine, in the encoding charset.
+    """
+    with tempfile.TemporaryFile(
+        "w+", encoding=charset.stream_encoding, newline=""
+    ) as body:
+        with profiler.stage("scan", input_file) as record:
+            with charset.open(input_file) as f:
+                lines = profiler.count_lines(f, record)
+                first_line, headers = _scan_into(
+                    lines, body, reindex, toc_options, charset
+                )
+                if profiler.enabled:
+                    record["bytes_read"] = os.fstat(f.fileno()).st_size
+                    record["headings"] = len(headers)
+
+        toc = _build_index(headers, slug_style, profiler, input_file, toc_options)
+        with profiler.stage("write", input_file) as record:
+            with charset.open(output_file, "w") as f:
+                _write_indexed(f, first_line, toc, body, reindex, charset)
+                if profiler.enabled:
+                    record["bytes_written"] = _output_size(f)
+
+    return headers
+
+
+def index_file_in_place(
+    path, slug_style="default", profiler=NULL_PROFILER, toc_options=None
+):
+    """
+    Re-indexes a Markdown file in place, in reindex mode.
+
+    The result is written to a temporary file next to path, which then
+    atomically replaces it with os.replace. If the result is byte-identical to
+    the current file, nothing is written: the file and its mtime are left alone.
+
+    Args:
+        path (str): Path to the Markdown (.md) file.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+
+    Returns:
+        tuple: (headers, changed) where changed is False if the file was
+               already up to date.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".md.tmp", dir=directory)
+    os.close(fd)
+
+    try:
+        headers = index_file(
+            path,
+            tmp_path,
+            reindex=True,
+            slug_style=slug_style,
+            profiler=profiler,
+            toc_options=toc_options,
+        )
+        with profiler.stage("replace", path):
+            changed = not filecmp.cmp(path, tmp_path, shallow=False)
+            if changed:
+                shutil.copymode(path, tmp_path)
+                os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return headers, changed
+
+
+def index_bytes(
+    data,
+    engine="lines",
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+):
+    """
+    Indexes a Markdown document held in memory as bytes, in its own encoding.
+
+    The result is the content index_file would write for a file holding data,
+    so a document read once can be checked against it without writing
+    anything (the "parallel" engine scans data as "mmap" does).
+
+    Args:
+        data (bytes): Markdown document content, in any encoding src.charset
+            recognizes.
+        engine (str): See index_file.
+        reindex (bool): See index_file.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+
+    Returns:
+        tuple: (output, headers) where output is the indexed document as
+               bytes and headers the list of processed Heading.
+
+    Raises:
+        UnicodeDecodeError: If a heading cannot be decoded with the encoding
+            of the document (see src.charset).
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}.")
+    if engine != "lines" and reindex:
+        raise ValueError(f"The {engine} engine does not support reindex mode.")
+
+    charset = sniff_charset(data)
+    if engine == "lines" or charset.wide:
+        return _index_bytes_lines(
+            data, reindex, slug_style, profiler, toc_options, charset
+        )
+    if not data:
+        return b"", []
+    run = functools.partial(
+        _index_bytes_buffer, data, slug_style, profiler, toc_options
+    )
+    return with_fallback(run, charset)
+
+
+def _index_bytes_lines(data, reindex, slug_style, profiler, toc_options, charset):
+    """
+    Indexes bytes with the "lines" engine, in the encoding charset.
+    """
+    # Read and written as a file opened in text mode would be: universal
+    # newlines in, os.linesep out
+    text = data[len(charset.bom) :].decode(charset.stream_encoding)
+    output = io.StringIO()
+    headers = index_lines(
+        io.StringIO(text, newline=None),
+        output,
+        reindex,
+        slug_style,
+        profiler,
+        toc_options,
+        charset,
+    )
+    result = charset.mark + output.getvalue()
+    if os.linesep != "\n":
+        result = result.replace("\n", os.linesep)
+    return result.encode(charset.stream_encoding), headers
+
+
+def _index_bytes_buffer(data, slug_style, profiler, toc_options, charset):
+    """
+    Indexes bytes as the "mmap" engine does, in the ASCII-compatible encoding
+    charset.
+    """
+    with profiler.stage("scan") as record:
+        scanned = scan_markdown_buffer(data, charset.encoding, len(charset.bom))
+        headers, first = _collect_headers(data, scanned, toc_options)
+        if profiler.enabled:
+            record["bytes_read"] = len(data)
+            record["lines"] = _count_lines(data)
+            record["headings"] = len(headers)
+
+    toc = _number_and_index(headers, slug_style, profiler, None, toc_options)
+    output = io.BytesIO()
+    with profiler.stage("write") as record:
+        _write_indexed_buffer(output, data, headers, toc, charset, first)
+        record["bytes_written"] = output.tell()
+    return output.getvalue(), headers
+
+
+def check_file(
+    input_file,
+    output_file,
+    engine="lines",
+    reindex=False,
+    slug_style="default",
+    profiler=NULL_PROFILER,
+    toc_options=None,
+):
+    """
+    Checks whether output_file holds what index_file would write to it,
+    without writing anything.
+
+    The input file is read once and indexed in memory (see index_bytes), and
+    the result is compared with output_file. To check a file indexed in place,
+    pass the same path as output_file, with reindex.
+
+    Args:
+        input_file (str): Path to the Markdown (.md) file.
+        output_file (str): Path of the indexed file to check.
+        engine (str): See index_file.
+        reindex (bool): See index_file.
+        slug_style (str): See index_lines.
+        profiler (Profiler): See index_lines.
+        toc_options (TocOptions, optional): See index_lines.
+
+    Returns:
+        tuple: (headers, stale) where stale is True if output_file is missing
+               or differs from the indexed document.
+
+    Raises:
+        UnicodeDecodeError: See index_bytes.
+    """
+    with open(input_file, "rb") as f:
+        data = f.read()
+    expected, headers = index_bytes(
+        data, engine, reindex, slug_style, profiler, toc_options
+    )
+    with profiler.stage("check", input_file):
+        if os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+            stale = expected != data
+        else:
+            try:
+                with open(output_file, "rb") as f:
+                    stale = expected != f.read()
+            except FileNotFoundError:
+                stale = True
+    return headers, stale
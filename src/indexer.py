@@ -0,0 +1,141 @@
+"""
+indexer.py
+
+This module provides Indexer, the reusable entry point of the library API.
+
+An Indexer is configured once (anchor rules, reindex mode, engine, profiler,
+TOC depth and numbering) and then indexes any number of documents, whether
+held in memory, read from streams or stored in files. The options are
+validated when the Indexer is created, and the compiled patterns and the slug
+cache it relies on stay warm from one document to the next, which suits
+long-running services.
+
+Example:
+    from src import Indexer
+
+    indexer = Indexer(slug_style="github", reindex=True)
+    indexed = indexer.index_text("# Title\\n## Usage\\n")
+"""
+
+from src.index_markdown import (
+    index_file,
+    index_file_in_place,
+    index_stream,
+    index_text,
+    indexed_path,
+)
+from src.parse_markdown_headers import ENGINES, parse_markdown_text
+from src.profiling import NULL_PROFILER
+from src.slugger import SLUG_STYLES
+from src.toc_options import TocOptions
+
+
+class Indexer:
+    """
+    Indexes Markdown documents with a fixed set of options.
+
+    Args:
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        reindex (bool): Wrap the index in TOC markers and replace an existing
+            index and heading numbers (see src.index_markdown).
+        engine (str): Engine used for files, one of ENGINES. Only "lines"
+            supports reindex mode; text and streams always use it.
+        profiler (Profiler): Records the stages of every run (see src.profiling).
+        min_depth (int): Shallowest heading level indexed (see src.toc_options).
+        max_depth (int): Deepest heading level indexed.
+        start_level (int): First numbered level.
+        numbering (str): Numbering style, one of NUMBERING_STYLES.
+    """
+
+    def __init__(
+        self,
+        slug_style="default",
+        reindex=False,
+        engine="lines",
+        profiler=None,
+        min_depth=1,
+        max_depth=6,
+        start_level=2,
+        numbering="default",
+    ):
+        if slug_style not in SLUG_STYLES:
+            raise ValueError(
+                f"Unknown slug style '{slug_style}', expected one of {SLUG_STYLES}."
+            )
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}.")
+        if engine != "lines" and reindex:
+            raise ValueError(f"The {engine} engine does not support reindex mode.")
+
+        self.slug_style = slug_style
+        self.reindex = reindex
+        self.engine = engine
+        self.profiler = profiler or NULL_PROFILER
+        self.toc_options = TocOptions(min_depth, max_depth, start_level, numbering)
+
+    def index_text(self, text):
+        """
+        Indexes a document held in memory.
+
+        Returns:
+            str: The indexed document.
+        """
+        return index_text(
+            text, self.reindex, self.slug_style, self.profiler, self.toc_options
+        )
+
+    def index_stream(self, source, destination):
+        """
+        Indexes a document read from source (a text or binary file object) into
+        destination. Neither stream is closed.
+
+        Returns:
+            list of Heading: The processed headings.
+        """
+        return index_stream(
+            source,
+            destination,
+            self.reindex,
+            self.slug_style,
+            self.profiler,
+            self.toc_options,
+        )
+
+    def index_file(self, input_file, output_file=None):
+        """
+        Indexes a file into output_file, by default '<input_file>-indexed.md'.
+
+        Returns:
+            list of Heading: The processed headings.
+        """
+        if output_file is None:
+            output_file = indexed_path(input_file)
+        return index_file(
+            input_file,
+            output_file,
+            self.engine,
+            self.reindex,
+            self.slug_style,
+            self.profiler,
+            self.toc_options,
+        )
+
+    def index_file_in_place(self, path):
+        """
+        Re-indexes a file in place (always in reindex mode).
+
+        Returns:
+            tuple: (headers, changed), see index_file_in_place.
+        """
+        return index_file_in_place(
+            path, self.slug_style, self.profiler, self.toc_options
+        )
+
+    def headings(self, text):
+        """
+        Returns the headings of a document held in memory, without numbering.
+
+        Returns:
+            list of Heading: The headings (see src.parse_markdown_headers).
+        """
+        return parse_markdown_text(text)
@@ -5,6 +5,8 @@ This module provides a function to build the "new_text" of each heading,
 combining the Markdown hashes, the assigned numbering (if any), and the header text itself.
 """
 
+from src.heading import as_headings
+
 
 def new_headers(headers):
     """
@@ -13,22 +15,23 @@ def new_headers(headers):
     For others, it includes the numbering (e.g., '1.', '1.2', etc.) after the '#' characters.
 
     Args:
-        headers (list of dict): Output from header_numarator. Each dict is expected to have:
+        headers (list of Heading): Output from header_numarator. Each heading is expected to have:
             - "header_level" (int)
             - "header_text" (str)
             - "header_number" (str)
+            Old-style dicts are converted to Heading objects in place.
 
     Returns:
-        list of dict: The same list but with the "new_text" field set for each header.
+        list of Heading: The same list but with the "new_text" field set for each header.
     """
-    for header in headers:
-        if header["header_level"] == 1:
-            # For H1, no numbering is added
-            header["new_text"] = f"# {header['header_text']}"
+    for header in as_headings(headers):
+        if not header.header_number:
+            # For H1 (or any heading left unnumbered), no numbering is added
+            header.new_text = f"{header.header_level * '#'} {header.header_text}"
         else:
             # For H2-H6, add the numbering between the '#' and the text
-            header["new_text"] = (
-                f"{header['header_level'] * '#'} {header['header_number']} {header['header_text']}"
+            header.new_text = (
+                f"{header.header_level * '#'} {header.header_number} {header.header_text}"
             )
 
     return headers
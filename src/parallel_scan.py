@@ -0,0 +1,204 @@
+"""
+parallel_scan.py
+
+This module provides the "parallel" scanning engine: it scans a single very
+large Markdown file on several cores.
+
+The file is cut into chunks of whole lines, and each chunk is scanned by a
+worker process with the "mmap" scanner (src.parse_markdown_headers), which
+maps the file again: the pages are shared through the page cache, and only
+the headings found travel back. A worker cannot know whether its chunk starts
+inside a code block, an HTML block or a paragraph, so it assumes that it does
+not, and also reports the scanner state at the end of its chunk.
+
+The chunks are then reconciled in order, in this process. When the state at
+the end of a chunk is the one the next chunk was scanned with (the usual case:
+a chunk boundary in the middle of plain text between blocks), the headings of
+the next chunk are kept as they are. Otherwise (e.g. a fenced code block runs
+across the boundary) the next chunk is scanned again from the right state,
+until the rescan finds a heading the worker found too: the scanner state is
+reset after a heading, so from there on the worker's headings are right.
+
+Line numbers are counted per chunk by the workers and offset here, so the
+headings are the same as with the "mmap" engine. Files smaller than
+PARALLEL_MIN_SIZE are scanned in this process.
+"""
+
+import functools
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.heading import Heading
+from src.parse_markdown_headers import (
+    BufferState,
+    count_newlines,
+    front_matter_end,
+    scan_buffer_region,
+    scan_markdown_buffer,
+)
+
+# Files smaller than this are not worth starting worker processes for
+PARALLEL_MIN_SIZE = 32 * 1024 * 1024
+
+# Smallest chunk handed to a worker
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+
+# The file is cut into this many chunks per worker, so that a slow chunk
+# (e.g. one full of headings) does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+
+def split_chunks(buffer, start, chunk_size):
+    """
+    Cuts buffer[start:] into chunks of whole lines of about chunk_size bytes.
+
+    Returns:
+        list of tuple: (start, stop) offsets of each chunk.
+    """
+    bounds = [start]
+    while True:
+        stop = buffer.find(b"\n", bounds[-1] + chunk_size - 1) + 1
+        if stop <= 0 or stop >= len(buffer):
+            break
+        bounds.append(stop)
+    bounds.append(len(buffer))
+    return list(zip(bounds, bounds[1:]))
+
+
+def scan_chunk(path, start, stop, encoding="utf-8"):
+    """
+    Scans the lines of the file at path from offset start to stop, as if no
+    block or paragraph was open at start. This is the unit of work sent to the
+    worker processes; encoding is that of the file (see scan_markdown_buffer).
+
+    Returns:
+        tuple: (headings, state, lines) where headings holds a
+               (line, level, text, offset, end) tuple per heading, with line
+               numbers counted from the start of the chunk, state the
+               (pos, paragraph, paragraph_start) of the scanner at stop (see
+               BufferState), and lines the number of newlines in the chunk.
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            state = BufferState(start)
+            headings = [
+                (h.line, h.header_level, h.header_text, h.offset, h.end)
+                for h in scan_buffer_region(buffer, state, stop, 1, start, encoding)
+            ]
+            # The newlines before the last heading are already counted
+            counted = headings[-1][3] if headings else start
+            lines = count_newlines(buffer, counted, stop)
+            if headings:
+                lines += headings[-1][0] - 1
+    return headings, (state.pos, state.paragraph, state.paragraph_start), lines
+
+
+def _chunk_headings(found, first_line):
+    # Headings of a chunk, numbered from first_line (positional arguments are
+    # noticeably faster here, and this runs for every heading of the file)
+    return [
+        Heading(first_line + line - 1, level, text, None, None, offset, end)
+        for line, level, text, offset, end in found
+    ]
+
+
+def reconcile(buffer, chunks, results, encoding="utf-8"):
+    """
+    Joins the results of scan_chunk for each chunk of buffer (see the module
+    docstring).
+
+    Returns:
+        list of Heading: The headings of the whole buffer.
+    """
+    headings = []
+    state = BufferState(chunks[0][0])
+    # Line number of the first line of the current chunk
+    first_line = 1 + count_newlines(buffer, 0, chunks[0][0])
+
+    for (start, stop), (found, end_state, lines) in zip(chunks, results):
+        if state.is_fresh(start):
+            headings.extend(_chunk_headings(found, first_line))
+            state = BufferState(*end_state)
+        else:
+            rescan = scan_buffer_region(
+                buffer, state, stop, first_line, start, encoding
+            )
+            i = 0
+            for heading in rescan:
+                headings.append(heading)
+                # Both lists are in order: skip the worker's headings before it
+                while i < len(found) and found[i][4] < heading.end:
+                    i += 1
+                if i < len(found) and found[i][4] == heading.end:
+                    # Back in step with the worker
+                    rescan.close()
+                    headings.extend(_chunk_headings(found[i + 1 :], first_line))
+                    state = BufferState(*end_state)
+                    break
+        first_line += lines
+    return headings
+
+
+def scan_buffer_parallel(
+    path, buffer, workers=None, chunk_size=None, encoding="utf-8", start=0
+):
+    """
+    Scans the file at path, mapped in buffer, across worker processes. Files
+    smaller than PARALLEL_MIN_SIZE are scanned in this process.
+
+    Args:
+        path (str): Path to the Markdown file, which the workers map again.
+        buffer (bytes-like): The content of the file.
+        workers (int, optional): Number of worker processes. Defaults to the
+            number of CPUs.
+        chunk_size (int, optional): Size of the chunks. By default the file is
+            cut into CHUNKS_PER_WORKER chunks per worker, of MIN_CHUNK_SIZE
+            bytes at least.
+        encoding (str): See scan_markdown_buffer.
+        start (int): See scan_markdown_buffer.
+
+    Returns:
+        list of Heading: The same headings as scan_markdown_buffer.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(buffer) < PARALLEL_MIN_SIZE:
+        return list(scan_markdown_buffer(buffer, encoding, start))
+    head = front_matter_end(buffer, start)
+    if head is None:
+        return []
+    if chunk_size is None:
+        chunk_size = max(
+            MIN_CHUNK_SIZE, -(-(len(buffer) - head) // (workers * CHUNKS_PER_WORKER))
+        )
+    chunks = split_chunks(buffer, head, chunk_size)
+    if len(chunks) == 1:
+        return list(scan_markdown_buffer(buffer, encoding, start))
+
+    starts, stops = zip(*chunks)
+    work = functools.partial(scan_chunk, path, encoding=encoding)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        results = list(executor.map(work, starts, stops))
+    return reconcile(buffer, chunks, results, encoding)
+
+
+def scan_file_parallel(path, workers=None, encoding="utf-8", start=0):
+    """
+    Scans a Markdown file with the "parallel" engine.
+
+    Args:
+        path (str): Path to the Markdown (.md) file.
+        workers (int, optional): Number of worker processes (see
+            scan_buffer_parallel).
+        encoding (str): See scan_markdown_buffer.
+        start (int): See scan_markdown_buffer.
+
+    Returns:
+        list of Heading: The headings, as parse_markdown_headers returns them.
+    """
+    with open(path, "rb") as f:
+        # Empty files cannot be memory-mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return scan_buffer_parallel(path, buffer, workers, None, encoding, start)
@@ -2,65 +2,684 @@
 parse_markdown_headers.py
 
 This module provides a function to parse Markdown headings from a file, while
-ignoring any headings that appear inside fenced code blocks (triple-backtick blocks).
+ignoring anything that looks like a heading but is not one, following the
+CommonMark block rules:
+    - ATX headings ("## Title"), indented by up to 3 spaces, with an optional
+      closing sequence of '#' ("## Title ##").
+    - Setext headings: a paragraph underlined with '=' (level 1) or '-'
+      (level 2). The heading text is the paragraph's lines, joined by spaces.
+    - Fenced code blocks, opened by 3 or more '`' or '~' and closed by the same
+      character repeated at least as many times; an unclosed fence runs to the
+      end of the document.
+    - Indented code blocks (4 or more columns of indentation).
+    - HTML blocks (<div>, <details>, comments, <pre>, ...), which end at a
+      blank line or at their closing marker depending on their kind.
+    - Front matter: a block at the very top of the document between '---' and
+      '---' (or '...'), or between '+++' and '+++'.
+Container blocks (block quotes and list items) are only tracked as far as
+needed to tell their paragraphs from setext headings: "> # Quoted" is not a
+heading, while a heading on its own line inside a list item is.
+
+A paragraph longer than MAX_SETEXT_LINES lines never becomes a setext heading,
+which bounds the number of lines held back while scanning.
+
+Three scanning engines are available, and find the same headings:
+    - "lines": reads the file line by line and classifies every line (default).
+    - "mmap": memory-maps the file and jumps straight to the candidate lines
+      (lines whose first non-blank character can start a block), accounting
+      for the lines in between in bulk. Faster on large, prose-heavy files.
+    - "parallel": the "mmap" scanner, run over chunks of a very large file
+      in worker processes (see src.parallel_scan).
 """
 
+import functools
+import io
+import itertools
+import mmap
+import os
 import re
 
+from src.charset import sniff_file, with_fallback
+from src.heading import Heading
+
+# ATX heading opener: 1 to 6 '#' characters, then whitespace or the end of the
+# line (applied after the indentation is removed)
+HEADER_PATTERN = re.compile(r"(#{1,6})(?:[ \t]+|$)")
+
+# Optional closing sequence of an ATX heading
+ATX_CLOSING_PATTERN = re.compile(r"(?:^|[ \t]+)#+$")
+
+SETEXT_PATTERN = re.compile(r"(?:=+|-+)[ \t]*$")
+THEMATIC_BREAK_PATTERN = re.compile(
+    r"(?:(?:\*[ \t]*){3,}|(?:-[ \t]*){3,}|(?:_[ \t]*){3,})$"
+)
+FENCE_PATTERN = re.compile(r"(`{3,}|~{3,})(.*)$")
+LIST_ITEM_PATTERN = re.compile(r"([-+*]|\d{1,9}[.)])(?:[ \t](.*))?$")
+
+# HTML block openers (CommonMark kinds 1 to 7) and the markers ending them
+HTML_RAW_PATTERN = re.compile(r"<(?:script|pre|style|textarea)(?:[ \t>]|$)", re.I)
+HTML_RAW_END = ("</script>", "</pre>", "</style>", "</textarea>")
+HTML_BLOCK_TAGS = (
+    "address|article|aside|base|basefont|blockquote|body|caption|center|col|"
+    "colgroup|dd|details|dialog|dir|div|dl|dt|fieldset|figcaption|figure|footer|"
+    "form|frame|frameset|h[1-6]|head|header|hr|html|iframe|legend|li|link|main|"
+    "menu|menuitem|nav|noframes|ol|optgroup|option|p|param|search|section|"
+    "summary|table|tbody|td|tfoot|th|thead|title|tr|track|ul"
+)
+HTML_BLOCK_PATTERN = re.compile(rf"</?(?:{HTML_BLOCK_TAGS})(?:[ \t>]|/>|$)", re.I)
+HTML_TAG_PATTERN = re.compile(
+    r"(?:<[A-Za-z][A-Za-z0-9-]*"
+    r"(?:[ \t]+[A-Za-z_:][A-Za-z0-9_.:-]*"
+    r"(?:[ \t]*=[ \t]*(?:[^ \t\"'=<>`]+|'[^']*'|\"[^\"]*\"))?)*"
+    r"[ \t]*/?>|</[A-Za-z][A-Za-z0-9-]*[ \t]*>)[ \t]*$"
+)
+HTML_SPECIAL_BLOCKS = (
+    ("<!--", ("-->",)),
+    ("<?", ("?>",)),
+    ("<![CDATA[", ("]]>",)),
+)
+
+# Front matter openers, and the lines that close them
+FRONT_MATTER = {"---": ("---", "..."), "+++": ("+++",)}
+
+# Longest paragraph (in lines) that can still become a setext heading
+MAX_SETEXT_LINES = 64
+
+# Characters that can start a block (after up to 3 spaces of indentation);
+# lines starting with anything else are paragraph text
+BLOCK_START_CHARS = frozenset("#`~<=-*_+>0123456789")
+
+# First characters of the lines scan_markdown_lines has to classify
+_CLASSIFIED_CHARS = BLOCK_START_CHARS | frozenset(" \t\r\n")
+
+# Line kinds returned by classify_line
+BLANK, INDENTED, TEXT, ATX, SETEXT, FENCE, HTML, BREAK, CONTAINER = range(9)
+
+# Paragraph states: no open paragraph, an open paragraph that a setext
+# underline turns into a heading, or one that it cannot (inside a container
+# block, or longer than MAX_SETEXT_LINES)
+NO_PARAGRAPH, PARAGRAPH, CONTINUATION = range(3)
+
+# HTML blocks of kinds 6 and 7 end at a blank line
+HTML_BLANK_END = ()
+
+# Largest slice copied at once when counting newlines in a buffer
+COUNT_CHUNK_SIZE = 16 * 1024 * 1024
+
+ENGINES = ("lines", "mmap", "parallel")
+
+# Bumped whenever the headings found in a document change (it is part of the
+# index cache key)
+SCANNER_VERSION = 2
+
 
-def parse_markdown_headers(file_path):
+def _html_block(content, paragraph):
     """
-    Parses the specified Markdown file to extract heading information.
+    Returns the end markers of the HTML block opened by content (HTML_BLANK_END
+    for blocks ending at a blank line), or None if content opens no block.
+    """
+    if HTML_RAW_PATTERN.match(content):
+        return HTML_RAW_END
+    for opener, end in HTML_SPECIAL_BLOCKS:
+        if content.startswith(opener):
+            return end
+    if content.startswith("<!") and content[2:3].isalpha():
+        return (">",)
+    if HTML_BLOCK_PATTERN.match(content):
+        return HTML_BLANK_END
+    # Other tags alone on their line cannot interrupt a paragraph
+    if paragraph == NO_PARAGRAPH and HTML_TAG_PATTERN.match(content):
+        return HTML_BLANK_END
+    return None
 
-    Headings are identified by lines that match the pattern:
-        ^(#{1,6})\s+(.*)$
 
-    The function also skips headings located inside fenced code blocks
-    (denoted by lines containing triple backticks: ```).
+def classify_line(content, paragraph):
+    """
+    Classifies a line found outside code, HTML and front matter blocks.
 
     Args:
-        file_path (str): Path to the Markdown (.md) file.
+        content (str): The line, without its line ending.
+        paragraph (int): State of the paragraph the previous line belongs to:
+            NO_PARAGRAPH, PARAGRAPH or CONTINUATION.
 
     Returns:
-        list of dict: A list of dictionaries, where each dictionary contains:
-            {
-                "line": (int) 1-based line number of the heading in the file,
-                "header_level": (int) heading level (1 to 6),
-                "header_text": (str) the raw text of the heading (excluding the #)
-            }
-    """
-    headers = []
-
-    # Temporary dictionary for storing heading info
-    temp = {
-        "line": 0,
-        "header_level": 0,
-        "header_text": "",
-    }
-
-    # Regex pattern for capturing headings: 1 to 6 '#' characters,
-    # followed by space(s), then the heading text.
-    header_pattern = re.compile(r"^(#{1,6})\s+(.*)$")
-
-    with open(file_path, "r", encoding="utf-8") as file:
-        in_code_block = False
-
-        for line_num, line in enumerate(file, start=1):
-            # Check if we are toggling in/out of a fenced code block
-            if "```" in line:
-                in_code_block = not in_code_block
-
-            # If we're not inside a code block, test for a heading
-            if not in_code_block:
-                match = header_pattern.match(line)
-                if match:
-                    header_level = len(match.group(1))
-                    header_text = match.group(2).strip()
-
-                    temp["line"] = line_num
-                    temp["header_level"] = header_level
-                    temp["header_text"] = header_text
-
-                    headers.append(temp.copy())
+        tuple: (kind, value) where kind is one of BLANK, INDENTED, TEXT, ATX,
+               SETEXT, FENCE, HTML, BREAK or CONTAINER, and value is
+               (level, text) for ATX, the level for SETEXT, (char, length) for
+               FENCE, the end markers (None if it ends on this line) for HTML,
+               and None otherwise.
+    """
+    first = content[:1]
+    if first == " " or first == "\t":
+        stripped = content.lstrip(" \t")
+        if not stripped:
+            return BLANK, None
+        # Tab stops are 4 columns apart
+        if len(content[: len(content) - len(stripped)].expandtabs(4)) >= 4:
+            return INDENTED, None
+        content = stripped
+        first = content[0]
+    elif not first:
+        return BLANK, None
+
+    if first not in BLOCK_START_CHARS:
+        return TEXT, None
+
+    if first == "#":
+        match = HEADER_PATTERN.match(content)
+        if match:
+            text = content[match.end() :].strip(" \t")
+            if text.endswith("#"):
+                text = ATX_CLOSING_PATTERN.sub("", text).strip(" \t")
+            return ATX, (len(match.group(1)), text)
+        return TEXT, None
+
+    if first in "=-" and paragraph == PARAGRAPH and SETEXT_PATTERN.match(content):
+        return SETEXT, 1 if first == "=" else 2
+
+    if first in "-*_" and THEMATIC_BREAK_PATTERN.match(content):
+        return BREAK, None
+
+    if first in "`~":
+        match = FENCE_PATTERN.match(content)
+        # The info string of a backtick fence cannot contain backticks
+        if match and not (first == "`" and "`" in match.group(2)):
+            return FENCE, (first, len(match.group(1)))
+        return TEXT, None
+
+    if first == "<":
+        end = _html_block(content, paragraph)
+        if end is None:
+            return TEXT, None
+        if end and any(marker in content[2:].lower() for marker in end):
+            end = None
+        return HTML, end
+
+    if first == ">":
+        return CONTAINER, None
+
+    match = LIST_ITEM_PATTERN.match(content)
+    if match:
+        # Only non-empty items, and ordered lists starting at 1, can
+        # interrupt a paragraph
+        marker, rest = match.groups()
+        empty = not (rest or "").strip(" \t")
+        if paragraph == NO_PARAGRAPH or not (
+            empty or (marker[0].isdigit() and int(marker[:-1]) != 1)
+        ):
+            return CONTAINER, None
+    return TEXT, None
+
+
+@functools.lru_cache(maxsize=None)
+def _block_end_line(kind, value):
+    """
+    Returns a pattern matching the last line of a fenced code block (kind
+    FENCE, value (char, length)) or of an HTML block (kind HTML, value its end
+    markers, or HTML_BLANK_END).
+    """
+    if kind == FENCE:
+        char, length = value
+        return re.compile(r" {0,3}%s{%d,}[ \t]*\r?\n?\Z" % (re.escape(char), length))
+    if value == HTML_BLANK_END:
+        return re.compile(r"[ \t]*\r?\n?\Z")
+    return re.compile(".*?(?:%s)" % "|".join(map(re.escape, value)), re.I | re.S)
+
+
+def scan_markdown_lines(lines, front_matter=None, line_num=0):
+    """
+    Scans an iterable of Markdown lines and yields every line together with
+    the heading detected on it (or None).
+
+    This is the single-pass building block used by both parse_markdown_headers
+    and the streaming indexer: the lines are consumed lazily, so a file object
+    can be passed directly without reading it into memory first. The lines of
+    a paragraph are held back until it is clear whether a setext underline
+    turns them into a heading (at most MAX_SETEXT_LINES lines).
+
+    Args:
+        lines (iterable of str): Lines of a Markdown document.
+        front_matter (list, optional): If given, the lines of the front matter
+            block are appended to it instead of being yielded.
+        line_num (int): Number of lines of the document before lines. A scan
+            may resume after any heading line, since the scanner state is
+            reset there; front matter is only looked for at line 0.
+
+    Yields:
+        tuple: (line, header) where header is a Heading, or None for regular
+               lines. A setext heading is yielded as a single item whose
+               "line" holds the paragraph and underline lines together.
+    """
+    lines = iter(lines)
+    first_line = next(lines, "") if line_num == 0 else ""
+    closers = FRONT_MATTER.get(first_line.rstrip(" \t\r\n"))
+    if closers:
+        # An unclosed front matter block runs to the end of the document
+        block = [first_line]
+        for line in lines:
+            block.append(line)
+            if line.rstrip(" \t\r\n") in closers:
+                break
+        line_num = len(block)
+        if front_matter is not None:
+            front_matter.extend(block)
+        else:
+            for line in block:
+                yield line, None
+    elif first_line:
+        lines = itertools.chain((first_line,), lines)
+
+    # Inside a code or HTML block: matches its last line
+    block_end = None
+    paragraph = NO_PARAGRAPH
+    held = []
+    held_start = 0
+
+    for line_num, line in enumerate(lines, start=line_num + 1):
+        if block_end is not None:
+            if block_end(line):
+                block_end = None
+            yield line, None
+            continue
+
+        # Fast paths: plain paragraph text and empty lines
+        first = line[:1]
+        if first not in _CLASSIFIED_CHARS:
+            kind = TEXT
+        elif first == "\n":
+            kind = BLANK
+        else:
+            kind, value = classify_line(line.rstrip("\r\n"), paragraph)
+            if kind == INDENTED and paragraph != NO_PARAGRAPH:
+                kind = TEXT
+
+        if kind == TEXT:
+            if paragraph == PARAGRAPH:
+                held.append(line)
+                if len(held) <= MAX_SETEXT_LINES:
+                    continue
+                # Too long to become a heading: stop holding lines back
+                paragraph = CONTINUATION
+                for held_line in held:
+                    yield held_line, None
+                held.clear()
+            elif paragraph == NO_PARAGRAPH:
+                paragraph = PARAGRAPH
+                held_start = line_num
+                held.append(line)
+            else:
+                yield line, None
+            continue
+
+        if kind == SETEXT:
+            text = " ".join(held_line.strip(" \t\r\n") for held_line in held)
+            held.append(line)
+            yield "".join(held), Heading(held_start, value, text)
+            held.clear()
+            paragraph = NO_PARAGRAPH
+            continue
+
+        # Any other line ends the paragraph
+        if held:
+            for held_line in held:
+                yield held_line, None
+            held.clear()
+        paragraph = NO_PARAGRAPH
+
+        header = None
+        if kind == ATX:
+            header = Heading(line_num, value[0], value[1])
+        elif kind == FENCE or (kind == HTML and value is not None):
+            block_end = _block_end_line(kind, value).match
+        elif kind == CONTAINER:
+            paragraph = CONTINUATION
+        yield line, header
+
+    for held_line in held:
+        yield held_line, None
+
+
+def count_newlines(buffer, start, end):
+    """
+    Counts the newlines in buffer[start:end] (mmap objects have no count method).
+    """
+    count = 0
+    while start < end:
+        stop = min(start + COUNT_CHUNK_SIZE, end)
+        count += buffer[start:stop].count(b"\n")
+        start = stop
+    return count
+
+
+# Lines that may start a block: up to 3 spaces, then a BLOCK_START_CHARS byte
+_CANDIDATE_PATTERN = re.compile(rb"\n {0,3}([#`~<=\-*_+>0-9])")
+_FIRST_CANDIDATE_PATTERN = re.compile(rb" {0,3}([#`~<=\-*_+>0-9])")
+
+# First bytes of the candidates whose kind does not depend on the paragraph
+# state (and which never continue a paragraph unless they are plain text)
+_STATELESS_BYTES = b"#`~_"
+
+# Matches the lines of a region up to its last blank line (empty, or spaces
+# and tabs only), if it has one
+_LAST_BLANK_LINE_PATTERN = re.compile(rb"(?s)(?:.*\n)?[ \t]*\r?\n")
+
+# Newline ending the line before a blank line
+_BLANK_LINE_PATTERN = re.compile(rb"\n(?=[ \t]*\r?\n)")
+
+# First line indented by less than 4 columns (in a region without blank lines)
+_UNINDENTED_LINE_PATTERN = re.compile(rb"^ {0,3}[^ \t\r\n]", re.M)
+# The same, at a given line start ('^' does not match after a byte order mark)
+_UNINDENTED_LINE_START = re.compile(rb" {0,3}[^ \t\r\n]")
+
+
+@functools.lru_cache(maxsize=None)
+def _block_end_search(kind, value):
+    """
+    Returns the bytes pattern that scan_markdown_buffer searches for to find
+    the end of a block (see _block_end_line): the newline before the closing
+    fence, the newline before the blank line, or the end marker.
+    """
+    if kind == FENCE:
+        char, length = value
+        pattern = r"\n {0,3}%s{%d,}[ \t]*\r?(?=\n|\Z)" % (re.escape(char), length)
+        return re.compile(pattern.encode())
+    if value == HTML_BLANK_END:
+        return _BLANK_LINE_PATTERN
+    return re.compile("|".join(map(re.escape, value)).encode(), re.I)
+
+
+def _line_end(buffer, start):
+    end = buffer.find(b"\n", start)
+    return len(buffer) if end == -1 else end + 1
+
 
+def front_matter_end(buffer, start=0):
+    """
+    Returns the offset just past the front matter block at the top of buffer
+    (start, the offset of the first line, if there is none), or None if the
+    block is never closed.
+    """
+    first_end = _line_end(buffer, start)
+    opener = bytes(buffer[start:first_end]).rstrip(b" \t\r\n").decode("latin-1")
+    if opener not in FRONT_MATTER:
+        return start
+    closers = "|".join(re.escape(closer) for closer in FRONT_MATTER[opener])
+    pattern = re.compile(rb"\n(?:%s)[ \t]*\r?(?=\n|\Z)" % closers.encode())
+    match = pattern.search(buffer, first_end - 1)
+    return None if match is None else _line_end(buffer, match.start() + 1)
+
+
+def _paragraph_after(buffer, paragraph, paragraph_start, start, end):
+    """
+    Works out the paragraph state after the lines buffer[start:end], which are
+    all paragraph text, indented or blank lines.
+
+    Returns:
+        tuple: (paragraph, paragraph_start), the state and the offset of the
+               first line of the open paragraph.
+    """
+    match = _LAST_BLANK_LINE_PATTERN.match(buffer, start, end)
+    if match:
+        paragraph = NO_PARAGRAPH
+        start = match.end()
+    if paragraph == NO_PARAGRAPH:
+        # Lines indented by 4 or more columns are code, until the first line
+        # that starts a paragraph
+        match = _UNINDENTED_LINE_START.match(buffer, start, end)
+        if match is None:
+            match = _UNINDENTED_LINE_PATTERN.search(buffer, start, end)
+        if match:
+            return PARAGRAPH, match.start()
+    return paragraph, paragraph_start
+
+
+class BufferState:
+    """
+    State of scan_buffer_region between two regions of a buffer: the scan
+    resumes at pos, with the paragraph state (NO_PARAGRAPH, PARAGRAPH or
+    CONTINUATION) of the line before it and, for an open paragraph, the offset
+    of its first line.
+    """
+
+    __slots__ = ("pos", "paragraph", "paragraph_start")
+
+    def __init__(self, pos, paragraph=NO_PARAGRAPH, paragraph_start=None):
+        self.pos = pos
+        self.paragraph = paragraph
+        self.paragraph_start = pos if paragraph_start is None else paragraph_start
+
+    def is_fresh(self, pos):
+        """
+        Returns True if a scan resuming at pos with no open paragraph finds
+        the same headings as one resuming from this state.
+        """
+        return self.pos == pos and self.paragraph == NO_PARAGRAPH
+
+
+def scan_markdown_buffer(buffer, encoding="utf-8", start=0):
+    """
+    Scans an encoded Markdown buffer and yields its headings.
+
+    Instead of classifying every line, the scanner uses regular expressions
+    and bytes.find to jump straight to candidate lines (lines whose first
+    non-blank character can start a block) and to the ends of code, HTML and
+    front matter blocks, and only decodes those. The lines in between can only
+    be paragraph text, indented lines and blank lines: their effect on the
+    paragraph state is only worked out, in bulk, when a candidate depends on
+    it (a setext underline, a list item or an HTML tag), and newlines are
+    counted in bulk up to each heading found to number its line. The headings
+    found are the same as with scan_markdown_lines.
+
+    Args:
+        buffer (bytes-like): The document, e.g. bytes or an mmap object.
+        encoding (str): Encoding of the document, which must be ASCII-compatible
+            (see src.charset). Only the candidate lines are decoded.
+        start (int): Offset of the first line, after a byte order mark.
+
+    Yields:
+        Heading: Each heading found, with its byte span in the buffer (the
+                 paragraph and underline of a setext heading) set in "offset"
+                 and "end".
+    """
+    size = len(buffer)
+    pos = front_matter_end(buffer, start) if size > start else start
+    if pos is None:
+        return
+    yield from scan_buffer_region(buffer, BufferState(pos), size, encoding=encoding)
+
+
+def scan_buffer_region(buffer, state, stop, line_num=1, counted=0, encoding="utf-8"):
+    """
+    Runs the scanner of scan_markdown_buffer from state.pos, and yields the
+    headings found on the lines starting before stop (a line start). Blocks
+    opened before stop are followed past it, to their end.
+
+    When the region is done, state is updated for the next region: the scan
+    resumes at stop, or after the block running past it (at the end of the
+    buffer for a block that is never closed).
+
+    Args:
+        buffer (bytes-like): The document.
+        state (BufferState): Where and how the scan resumes; updated in place.
+        stop (int): Offset of the end of the region.
+        line_num (int): Line number of the line starting at offset counted.
+        counted (int): A line start at or before state.pos.
+        encoding (str): See scan_markdown_buffer.
+
+    Yields:
+        Heading: As scan_markdown_buffer.
+    """
+    size = len(buffer)
+
+    def number(offset):
+        # Line number of the line starting at offset (offsets only increase,
+        # except for a paragraph started before counted)
+        nonlocal line_num, counted
+        if offset < counted:
+            return line_num - count_newlines(buffer, offset, counted)
+        line_num += count_newlines(buffer, counted, offset)
+        counted = offset
+        return line_num
+
+    # State after the line ending at pending; the lines from pending to the
+    # current candidate are plain lines, not accounted for yet
+    pos = pending = state.pos
+    paragraph = state.paragraph
+    paragraph_start = state.paragraph_start
+    # The first line of the document is the only one without a newline before it
+    top = pos if pos == 0 or buffer[pos - 1 : pos] != b"\n" else None
+
+    while pos < stop:
+        match = _FIRST_CANDIDATE_PATTERN.match(buffer, pos) if pos == top else None
+        if match is not None:
+            start = pos
+        else:
+            match = _CANDIDATE_PATTERN.search(buffer, pos - 1 if pos else 0, stop)
+            if match is None:
+                break
+            start = match.start() + 1
+        end = buffer.find(b"\n", start) + 1 or size
+        pos = end
+        first = match.group(1)
+
+        if first == b">":
+            # Block quotes need no decoding
+            paragraph = CONTINUATION
+            pending = end
+            continue
+
+        content = bytes(buffer[start:end]).decode(encoding).rstrip("\r\n")
+        if first in _STATELESS_BYTES:
+            kind, value = classify_line(content, NO_PARAGRAPH)
+            if kind == TEXT:
+                continue
+        else:
+            if pending != start:
+                paragraph, paragraph_start = _paragraph_after(
+                    buffer, paragraph, paragraph_start, pending, start
+                )
+                pending = start
+            line_state = paragraph
+            if (
+                line_state == PARAGRAPH
+                and first in b"=-"
+                and count_newlines(buffer, paragraph_start, start) > MAX_SETEXT_LINES
+            ):
+                line_state = CONTINUATION
+            kind, value = classify_line(content, line_state)
+            if kind == TEXT:
+                continue
+
+        pending = end
+        if kind == SETEXT:
+            held = bytes(buffer[paragraph_start:start]).decode(encoding)
+            text = " ".join(line.strip(" \t\r") for line in held.split("\n")[:-1])
+            yield Heading(
+                number(paragraph_start), value, text, offset=paragraph_start, end=end
+            )
+            paragraph = NO_PARAGRAPH
+            continue
+
+        # Any other line ends the paragraph
+        paragraph = NO_PARAGRAPH
+        if kind == ATX:
+            yield Heading(number(start), value[0], value[1], offset=start, end=end)
+        elif kind == CONTAINER:
+            paragraph = CONTINUATION
+        elif kind == FENCE or (kind == HTML and value is not None):
+            if kind == HTML and value != HTML_BLANK_END:
+                match = _block_end_search(kind, value).search(buffer, end)
+                # An unclosed block runs to the end of the buffer
+                pos = size if match is None else _line_end(buffer, match.start())
+            else:
+                match = _block_end_search(kind, value).search(buffer, end - 1)
+                if match is None:
+                    pos = size
+                else:
+                    # Resume after the closing fence, or at the blank line
+                    pos = match.start() + 1
+                    if kind == FENCE:
+                        pos = _line_end(buffer, pos)
+            pending = pos
+
+    # The state after the plain lines left is only needed by a next region
+    if pending < stop < size:
+        paragraph, paragraph_start = _paragraph_after(
+            buffer, paragraph, paragraph_start, pending, stop
+        )
+    state.pos = max(pos, stop)
+    state.paragraph = paragraph
+    state.paragraph_start = paragraph_start
+
+
+def parse_markdown_headers(file_path, engine="lines"):
+    """
+    Parses the specified Markdown file to extract heading information.
+
+    Headings are ATX headings ("## Title") and setext headings (a paragraph
+    underlined with '=' or '-'), found outside code blocks, HTML blocks and
+    front matter (see the module docstring for the rules).
+
+    Args:
+        file_path (str): Path to the Markdown (.md) file, in any encoding
+            src.charset recognizes.
+        engine (str): Scanning engine, one of ENGINES (default: "lines").
+
+    Returns:
+        list of Heading: One record per heading (see src.heading), with:
+            - line (int): 1-based line number of the heading in the file,
+            - header_level (int): heading level (1 to 6),
+            - header_text (str): the raw text of the heading (excluding the #)
+        Headings also support the old dict view, e.g. header["header_text"].
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}.")
+
+    return with_fallback(
+        functools.partial(_parse_file, file_path, engine), sniff_file(file_path)
+    )
+
+
+def _parse_file(file_path, engine, charset):
+    """
+    Runs parse_markdown_headers with the encoding charset (see src.charset).
+    UTF-16 and UTF-32 files are always read by the "lines" engine.
+    """
+    if engine == "parallel" and not charset.wide:
+        from src.parallel_scan import scan_file_parallel
+
+        return scan_file_parallel(
+            file_path, encoding=charset.encoding, start=len(charset.bom)
+        )
+
+    if engine == "mmap" and not charset.wide:
+        with open(file_path, "rb") as file:
+            # Empty files cannot be memory-mapped
+            if os.fstat(file.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return list(
+                    scan_markdown_buffer(buffer, charset.encoding, len(charset.bom))
+                )
+
+    with open(file_path, "r", encoding=charset.stream_encoding) as file:
+        if charset.mark:
+            file.read(len(charset.mark))
+        headers = [header for _, header in scan_markdown_lines(file) if header]
+    for header in headers:
+        header.header_text = charset.decode_line(header.header_text)
     return headers
+
+
+def parse_markdown_text(text):
+    """
+    Parses Markdown headings from an in-memory string.
+
+    Args:
+        text (str): Markdown document content.
+
+    Returns:
+        list of Heading: Same structure as parse_markdown_headers.
+    """
+    lines = io.StringIO(text)
+    return [header for _, header in scan_markdown_lines(lines) if header]
@@ -0,0 +1,215 @@
+"""
+profiling.py
+
+This module provides the profiling hooks of the indexer. A Profiler records,
+for each stage of a run (scanning, index building, writing, ...), its wall
+time, the bytes read and written, the lines scanned, the headings found and
+how much the stage raised the peak memory of the process. (The peak itself
+only ever grows, so every stage after the heaviest one would report the same
+value.)
+
+Records are plain dicts, so worker processes can send them back to be
+aggregated. Hooks are callables that get each record as soon as its stage
+ends. Indexing functions take an optional profiler and fall back to
+NULL_PROFILER, which records nothing and costs next to nothing.
+"""
+
+import contextlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Counters of a stage record, summed when records are aggregated
+COUNTERS = ("bytes_read", "bytes_written", "lines", "headings")
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident memory of this process in MB, or None where the
+    resource module is not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+def _rss_growth(start_mb):
+    # Growth of the peak resident memory since start_mb (from peak_rss_mb)
+    if start_mb is None:
+        return None
+    return peak_rss_mb() - start_mb
+
+
+class Profiler:
+    """
+    Records the stages of one or more indexing runs.
+
+    Args:
+        hooks (iterable of callable): Called with each stage record (a dict
+            with "path", "stage", "seconds", the COUNTERS and "rss_growth_mb",
+            the MB by which the stage raised the peak memory of the process).
+    """
+
+    enabled = True
+
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, path=None):
+        """
+        Times the body of a with block as stage name of the file at path.
+
+        Yields:
+            dict: The stage record, whose counters the block fills in.
+        """
+        record = {"path": path, "stage": name, "seconds": 0.0}
+        record.update(dict.fromkeys(COUNTERS, 0))
+        start_rss = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            record["rss_growth_mb"] = _rss_growth(start_rss)
+            self.add(record)
+
+    def add(self, record):
+        """
+        Adds a finished stage record (e.g. one sent back by a worker process)
+        and passes it to the hooks.
+        """
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def count_lines(self, lines, record):
+        """
+        Passes lines through, counting them in record["lines"].
+        """
+        for line in lines:
+            record["lines"] += 1
+            yield line
+
+
+class _NullProfiler:
+    """
+    Profiler stand-in used when profiling is off.
+    """
+
+    enabled = False
+    records = ()
+
+    @contextlib.contextmanager
+    def stage(self, name, path=None):
+        yield {}
+
+    def add(self, record):
+        pass
+
+    def count_lines(self, lines, record):
+        return lines
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def summarize(records):
+    """
+    Aggregates stage records across files.
+
+    Returns:
+        dict: Totals per stage, in order of first appearance: "files" (number
+              of distinct paths), "seconds", the COUNTERS, and the highest
+              "rss_growth_mb" of a single record.
+    """
+    totals = {}
+    paths = {}
+    for record in records:
+        total = totals.setdefault(
+            record["stage"],
+            {"files": 0, "seconds": 0.0, **dict.fromkeys(COUNTERS, 0)},
+        )
+        paths.setdefault(record["stage"], set()).add(record["path"])
+        total["seconds"] += record["seconds"]
+        for counter in COUNTERS:
+            total[counter] += record[counter]
+        rss = record.get("rss_growth_mb")
+        if rss is not None and rss >= total.get("rss_growth_mb", 0):
+            total["rss_growth_mb"] = rss
+
+    for stage, total in totals.items():
+        total["files"] = len(paths[stage])
+        total.setdefault("rss_growth_mb", None)
+    return totals
+
+
+def slowest_files(records, count=10):
+    """
+    Returns the count files that took the longest, summed over their stages.
+
+    Returns:
+        list of tuple: (path, seconds), slowest first.
+    """
+    seconds = {}
+    for record in records:
+        path = record["path"]
+        if path is not None:
+            seconds[path] = seconds.get(path, 0.0) + record["seconds"]
+    return sorted(seconds.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def format_table(records, top=10):
+    """
+    Formats the stage totals, and the slowest files if there are several,
+    as a human-readable table.
+
+    Returns:
+        list of str: The table lines.
+    """
+    lines = [
+        f"{'stage':<10} {'files':>6} {'seconds':>9} {'read MB':>9} "
+        f"{'written MB':>10} {'lines':>11} {'headings':>9} {'RSS+ MB':>8}"
+    ]
+    for stage, total in summarize(records).items():
+        rss = total["rss_growth_mb"]
+        lines.append(
+            f"{stage:<10} {total['files']:>6} {total['seconds']:>9.4f} "
+            f"{total['bytes_read'] / 2**20:>9.2f} "
+            f"{total['bytes_written'] / 2**20:>10.2f} {total['lines']:>11,} "
+            f"{total['headings']:>9,} {'-' if rss is None else f'{rss:.1f}':>8}"
+        )
+
+    slowest = slowest_files(records, top)
+    if len(slowest) > 1:
+        lines.append("")
+        lines.append(f"Slowest {len(slowest)} files:")
+        for path, seconds in slowest:
+            lines.append(f"{seconds:>9.4f} s  {path}")
+    return lines
+
+
+def format_json_lines(records, top=10):
+    """
+    Formats the profile as JSON lines: one "stage" object per record, one
+    "total" object per stage and one "slowest" object per slowest file.
+
+    Returns:
+        list of str: The JSON lines.
+    """
+    # Only --profile json needs it, so it is not imported up front
+    import json
+
+    lines = [json.dumps({"type": "stage", **record}) for record in records]
+    for stage, total in summarize(records).items():
+        lines.append(json.dumps({"type": "total", "stage": stage, **total}))
+    for path, seconds in slowest_files(records, top):
+        lines.append(json.dumps({"type": "slowest", "path": path, "seconds": seconds}))
+    return lines
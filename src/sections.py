@@ -0,0 +1,270 @@
+"""
+sections.py
+
+This module extracts sections of Markdown files, and splits files into one
+file per section, without parsing more than the heading lines.
+
+A section runs from a heading to the next heading of the same or a higher
+level (see section_ranges), and is found by the number its heading gets when
+the file is indexed in place with the same TocOptions ("3.2.1", with or
+without its final dot) or by its slug. The headings come from heading_records
+(the scanners of parse_markdown_headers, numbered by header_numarator), with
+their byte offsets: the sections are then copied as raw byte ranges, by
+seeking to their start, so their content is never decoded. When a heading
+store (see src.heading_store) is up to date for the file, the byte range
+comes from the store and the file is not scanned at all.
+
+split_file cuts a file at every heading of a given level or higher, so that
+the parts, in order, add up to the file: a part for what comes before the
+first such heading (e.g. the front matter), if anything, then one part per
+heading. Parts are named after the slug of their heading and numbered in
+order ('03-2-install.md', see part_name); split_files splits many files
+across worker processes. Parts that do not start the file get the byte order
+mark of the file, if it has one.
+"""
+
+import functools
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from src.charset import sniff_file
+from src.heading_table import heading_records, section_ranges
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Read size used when copying a byte range
+COPY_SIZE = 1024 * 1024
+
+# Name of the part holding what comes before the first heading, without the
+# number prefix
+PREAMBLE_NAME = "preamble"
+
+# Characters of a slug that are left out of part names (some slug styles
+# keep punctuation, which is not safe in file names)
+UNSAFE_NAME_CHARS = re.compile(r"[^\w-]+")
+
+
+def copy_range(source, start, end, output):
+    """
+    Copies the bytes from offset start to end of the binary file source to
+    output, in COPY_SIZE blocks.
+    """
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(remaining, COPY_SIZE))
+        if not chunk:
+            break
+        output.write(chunk)
+        remaining -= len(chunk)
+
+
+def find_section(records, heading):
+    """
+    Returns the first heading record whose number (ignoring a final dot) or
+    slug is heading, or None.
+    """
+    number = heading.rstrip(".")
+    for record in records:
+        if (record["slug"] and record["slug"] == heading) or (
+            record["number"] and record["number"].rstrip(".") == number
+        ):
+            return record
+    return None
+
+
+def section_record(
+    path, heading, engine="lines", slug_style="default", store=None, toc_options=None
+):
+    """
+    Finds the section of a heading in a Markdown file.
+
+    Args:
+        path (str): Path to the Markdown file.
+        heading (str): Number or slug of the heading (see find_section).
+        engine (str): Scanning engine passed to heading_records.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        store (HeadingStore, optional): Heading store to take the section
+            from, if it uses slug_style and toc_options and is up to date for
+            the file.
+        toc_options (TocOptions, optional): Headings numbered and slugged,
+            and how (see heading_records).
+
+    Returns:
+        dict or None: The heading record, whose "offset" and "end" give the
+                      byte range of the section; None if there is no such
+                      heading.
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    if (
+        store is not None
+        and store.slug_style == slug_style
+        and store.toc_options == toc_options
+        and store.is_current(path)
+    ):
+        return store.section(path, heading)
+    records = list(heading_records(path, engine, slug_style, toc_options))
+    section_ranges(records, os.path.getsize(path))
+    return find_section(records, heading)
+
+
+def extract_section(
+    path,
+    heading,
+    output,
+    engine="lines",
+    slug_style="default",
+    store=None,
+    toc_options=None,
+):
+    """
+    Writes the section of a heading in a Markdown file to output, by copying
+    its byte range.
+
+    Args:
+        path (str): Path to the Markdown file.
+        heading (str): Number or slug of the heading (see find_section).
+        output (file object): Writable binary file.
+        engine (str): See section_record.
+        slug_style (str): See section_record.
+        store (HeadingStore, optional): See section_record.
+        toc_options (TocOptions, optional): See section_record.
+
+    Returns:
+        dict or None: The heading record (see section_record), or None if
+                      there is no such heading and nothing was written.
+
+    Raises:
+        UnicodeDecodeError: If a heading cannot be decoded with the encoding
+            of the file (see src.charset).
+    """
+    record = section_record(path, heading, engine, slug_style, store, toc_options)
+    if record is None:
+        return None
+    with open(path, "rb") as source:
+        if record["offset"] > 0:
+            output.write(sniff_file(path).bom)
+        copy_range(source, record["offset"], record["end"], output)
+    return record
+
+
+def part_name(slug):
+    """
+    Returns the name of the part of a heading, without its number prefix:
+    its slug, without characters that are not safe in file names.
+    """
+    return UNSAFE_NAME_CHARS.sub("-", slug).strip("-") or "section"
+
+
+def split_dir(path):
+    """
+    Returns the default directory of the parts of path: '<base>-split'.
+    """
+    base, _ = os.path.splitext(path)
+    return f"{base}-split"
+
+
+def split_file(
+    path,
+    output_dir=None,
+    level=2,
+    engine="lines",
+    slug_style="default",
+    toc_options=None,
+):
+    """
+    Splits a Markdown file into one file per section of the given level or
+    higher (see the module docstring), reporting errors instead of raising.
+    This is the unit of work sent to the worker processes.
+
+    Args:
+        path (str): Path to the Markdown file.
+        output_dir (str, optional): Directory of the parts (created if
+            needed). Defaults to split_dir(path).
+        level (int): Deepest level of the headings the file is cut at.
+        engine (str): Scanning engine passed to heading_records.
+        slug_style (str): Anchor rules of the part names, one of
+            src.slugger.SLUG_STYLES.
+        toc_options (TocOptions, optional): Headings numbered and slugged,
+            and how (see heading_records). Parts of excluded headings are
+            named "section".
+
+    Returns:
+        dict: {
+            "input": (str) the input path,
+            "output": (str) the directory of the parts,
+            "parts": (list of str) paths of the parts written, in order,
+            "error": (str or None) error message if the file failed
+        }
+    """
+    output_dir = output_dir or split_dir(path)
+    result = {"input": path, "output": output_dir, "parts": [], "error": None}
+    try:
+        bom = sniff_file(path).bom
+        cuts = [
+            (record["offset"], part_name(record["slug"]))
+            for record in heading_records(path, engine, slug_style, toc_options)
+            if record["level"] <= level
+        ]
+        size = os.path.getsize(path)
+        first = 1
+        if not cuts or cuts[0][0] > len(bom):
+            cuts.insert(0, (0, PREAMBLE_NAME))
+            first = 0
+        width = max(2, len(str(len(cuts))))
+        ends = [offset for offset, _ in cuts[1:]] + [size]
+
+        os.makedirs(output_dir, exist_ok=True)
+        with open(path, "rb") as source:
+            for number, ((start, name), end) in enumerate(zip(cuts, ends), first):
+                part = os.path.join(output_dir, f"{number:0{width}d}-{name}.md")
+                with open(part, "wb") as output:
+                    if start > 0:
+                        output.write(bom)
+                    copy_range(source, start, end, output)
+                result["parts"].append(part)
+    except (OSError, UnicodeDecodeError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def split_files(
+    files,
+    output_dir=None,
+    level=2,
+    workers=None,
+    engine="lines",
+    slug_style="default",
+    toc_options=None,
+):
+    """
+    Splits many Markdown files, spreading them across worker processes.
+
+    Args:
+        files (list of str): Markdown file paths.
+        output_dir (str, optional): Directory of the parts, for a single file.
+            By default the parts of each file go to split_dir(file).
+        level (int): See split_file.
+        workers (int, optional): Number of worker processes. Defaults to the
+            number of CPUs; 1 processes the files in the current process.
+        engine (str): See split_file.
+        slug_style (str): See split_file.
+        toc_options (TocOptions, optional): See split_file.
+
+    Returns:
+        list of dict: One result per file (see split_file), in input order.
+    """
+    if output_dir is not None and len(files) > 1:
+        raise ValueError("An output directory can only be given for a single file.")
+    work = functools.partial(
+        split_file,
+        output_dir=output_dir,
+        level=level,
+        engine=engine,
+        slug_style=slug_style,
+        toc_options=toc_options,
+    )
+    if workers == 1 or len(files) <= 1:
+        return [work(path) for path in files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(work, files))
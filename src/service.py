@@ -0,0 +1,462 @@
+"""
+service.py
+
+This module provides the indexing service: a long-running asyncio front end to
+the indexing pipeline, for callers such as a docs preview server that would
+otherwise start a process for every document.
+
+Requests and responses are JSON lines, read from stdin and written to stdout,
+or exchanged over a local socket (a Unix socket, or a TCP port on localhost):
+
+    {"id": 1, "text": "# Title\\n## Usage\\n", "slug_style": "github"}
+    -> {"id": 1, "text": "# Title\\n\\n- [Title](#title)...", "headings": 2, ...}
+    {"id": 2, "text": 42}
+    -> {"id": 2, "error": "'text' must be a string", "ms": 0.01}
+    {"id": 3, "op": "stats"}
+    -> {"id": 3, "stats": {"queue_depth": {...}, "latency_ms": {...}, ...}}
+
+"slug_style" and "reindex" are optional, as in index_lines, and so are the
+TocOptions fields "min_depth", "max_depth", "start_level" and "numbering".
+Malformed JSON and stats requests are answered right away, without queueing.
+
+A request can also name a Markdown file instead of sending its text, which
+is how src.client hands a whole command-line run to a warm service:
+
+    {"id": 4, "path": "/home/me/README.md", "in_place": true}
+    -> {"id": 4, "output": "/home/me/README.md", "headings": 12,
+        "changed": true, "ms": 0.9}
+
+The file is indexed like a batch run (see src.batch_index.index_one);
+"in_place", "incremental", "slug_style" and the TocOptions fields are
+optional. Relative paths are relative to the working directory of the service.
+File requests read and rewrite files with the permissions of the service, so
+they are only accepted on stdin and on a Unix socket (which is made private
+to the user running the service), not on a TCP port, which any local user can
+connect to.
+
+Requests wait in two bounded queues. Small ones are decoded and indexed on the
+event loop itself, one at a time, while request lines (or requested files) of
+large_size bytes or more are sent as they are to a process pool, which also
+does the JSON decoding and encoding. A burst of large documents therefore
+never holds up small ones. When a queue is full, the service stops reading
+requests until there is room again instead of buffering without limit.
+Responses are sent as soon as they are ready, so they may come out of order:
+match them by id.
+
+The stats response reports the queue depths, the number of documents being
+indexed and the latency percentiles (from the time a request is read to the
+time its response is sent) over the last LATENCY_WINDOW documents.
+"""
+
+import asyncio
+import io
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.batch_index import index_one
+from src.index_markdown import index_lines
+from src.toc_options import TocOptions
+
+# Number of recent latencies the percentiles are computed over
+LATENCY_WINDOW = 10000
+
+# Longest request line accepted over a socket
+STREAM_LIMIT = 64 * 1024 * 1024
+
+# Requests of a connection read but not yet answered: reading stops at this
+# many, so a client that reads its responses slowly only holds this many
+CONNECTION_WINDOW = 256
+
+# Permissions of the Unix socket: only its owner may connect
+SOCKET_MODE = 0o600
+
+
+def request_toc_options(request):
+    """
+    Returns the TocOptions given by the fields of request, or None if it has
+    none of them.
+
+    Raises:
+        ValueError: If an option is out of range.
+    """
+    fields = {key: request[key] for key in TocOptions.__slots__ if key in request}
+    return TocOptions(**fields) if fields else None
+
+
+def process_request(request, allow_paths=True):
+    """
+    Runs one parsed request (other than "stats"). File requests are refused
+    unless allow_paths is True.
+
+    Returns:
+        tuple: (response, ok) where response is the response dict, without
+               its "ms" entry, and ok is False if the request failed.
+    """
+    if not isinstance(request, dict):
+        return {"id": None, "error": "request must be a JSON object"}, False
+    if "path" in request:
+        if not allow_paths:
+            error = "file requests are only accepted on stdin or a Unix socket"
+            return {"id": request.get("id"), "error": error}, False
+        return process_path_request(request)
+    if not isinstance(request.get("text"), str):
+        return {"id": request.get("id"), "error": "'text' must be a string"}, False
+
+    output = io.StringIO()
+    try:
+        headers = index_lines(
+            io.StringIO(request["text"]),
+            output,
+            bool(request.get("reindex", False)),
+            request.get("slug_style", "default"),
+            toc_options=request_toc_options(request),
+        )
+    # A bad request must not stop the service: report any error instead
+    except Exception as e:
+        return {"id": request.get("id"), "error": str(e)}, False
+    response = {"id": request.get("id"), "text": output.getvalue()}
+    response["headings"] = len(headers)
+    return response, True
+
+
+def process_path_request(request):
+    """
+    Runs one request for a file (see the module docstring).
+
+    Returns:
+        tuple: (response, ok), as process_request.
+    """
+    if not isinstance(request["path"], str):
+        return {"id": request.get("id"), "error": "'path' must be a string"}, False
+    try:
+        result = index_one(
+            request["path"],
+            in_place=bool(request.get("in_place", False)),
+            slug_style=request.get("slug_style", "default"),
+            incremental=bool(request.get("incremental", False)),
+            toc_options=request_toc_options(request),
+        )
+    except Exception as e:
+        return {"id": request.get("id"), "error": str(e)}, False
+    if result["error"]:
+        return {"id": request.get("id"), "error": result["error"]}, False
+    response = {"id": request.get("id"), "output": result["output"]}
+    response["headings"] = result["headers"]
+    response["changed"] = result["changed"]
+    return response, True
+
+
+def process_line(line, allow_paths=True):
+    """
+    Parses and runs one request line in a worker process, so that the event
+    loop neither decodes nor encodes the JSON of large documents. allow_paths
+    is passed to process_request.
+
+    Returns:
+        tuple: (payload, ok) where payload is the JSON-encoded response,
+               without its "ms" entry and trailing newline.
+    """
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response, ok = {"id": None, "error": f"invalid JSON: {e}"}, False
+    else:
+        response, ok = process_request(request, allow_paths)
+    return json.dumps(response).encode("utf-8"), ok
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """
+    Returns the nearest-rank percentiles of values, plus their maximum.
+
+    Returns:
+        dict: {"p50": ..., "p90": ..., "p99": ..., "max": ...}, all None if
+              values is empty.
+    """
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        rank = max(1, math.ceil(point / 100 * len(ordered)))
+        result[f"p{point}"] = ordered[rank - 1] if ordered else None
+    result["max"] = ordered[-1] if ordered else None
+    return result
+
+
+def encode(response, latency=None):
+    """
+    Encodes a response (a dict, or a payload from process_line) as a JSON
+    line, adding the latency in seconds as "ms" if given.
+    """
+    if isinstance(response, dict):
+        if latency is not None:
+            response = {**response, "ms": round(latency * 1000, 3)}
+        return (json.dumps(response) + "\n").encode("utf-8")
+    if latency is not None:
+        # Splice "ms" in before the closing brace of the encoded object
+        return response[:-1] + b', "ms": %.3f}\n' % (latency * 1000)
+    return response + b"\n"
+
+
+class IndexService:
+    """
+    Queues indexing requests and runs them with bounded concurrency.
+
+    Args:
+        workers (int, optional): Size of the process pool for large documents.
+            Defaults to the number of CPUs.
+        queue_size (int): Capacity of each of the two queues.
+        large_size (int): Request lines of at least this many bytes are
+            handled in the process pool.
+    """
+
+    def __init__(self, workers=None, queue_size=64, large_size=256 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.large_size = large_size
+
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+
+        self._small = None
+        self._large = None
+        self._executor = None
+        self._consumers = []
+
+    async def start(self):
+        """
+        Creates the queues, the process pool and the consumer tasks.
+        """
+        self._small = asyncio.Queue(self.queue_size)
+        self._large = asyncio.Queue(self.queue_size)
+        self._executor = ProcessPoolExecutor(self.workers)
+        self._consumers = [asyncio.ensure_future(self._consume(self._small, False))]
+        for _ in range(self.workers):
+            self._consumers.append(
+                asyncio.ensure_future(self._consume(self._large, True))
+            )
+
+    async def close(self):
+        """
+        Waits for the queued documents to be answered, then stops the
+        consumers and the process pool.
+        """
+        await self._small.join()
+        await self._large.join()
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._executor.shutdown()
+
+    def stats(self):
+        """
+        Returns the queue depths, counters and latency percentiles (in ms).
+        """
+        latency = percentiles(self.latencies)
+        return {
+            "queue_depth": {
+                "small": self._small.qsize(),
+                "large": self._large.qsize(),
+            },
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_ms": {
+                key: None if value is None else round(value * 1000, 3)
+                for key, value in latency.items()
+            },
+        }
+
+    async def handle_line(self, line, respond, allow_paths=True):
+        """
+        Handles one (non-blank) request line. respond is called exactly once
+        with the encoded response, possibly after this coroutine has returned.
+        Waits while the queue the request belongs to is full. File requests
+        are refused unless allow_paths is True (see the module docstring).
+
+        Lines of at least large_size bytes go to the process pool as they are,
+        to be decoded there; the others are decoded here, and go to the pool
+        too if they name a file of at least large_size bytes.
+        """
+        received = time.perf_counter()
+        if len(line) >= self.large_size:
+            await self._large.put((line, allow_paths, respond, received))
+            return
+
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.failed += 1
+            respond(encode({"id": None, "error": f"invalid JSON: {e}"}))
+            return
+        if isinstance(request, dict) and request.get("op") == "stats":
+            respond(encode({"id": request.get("id"), "stats": self.stats()}))
+            return
+        if (
+            allow_paths
+            and isinstance(request, dict)
+            and self._is_large_file(request.get("path"))
+        ):
+            await self._large.put((line, allow_paths, respond, received))
+            return
+        await self._small.put((request, allow_paths, respond, received))
+
+    def _is_large_file(self, path):
+        # Unreadable paths are left to process_path_request to report
+        try:
+            return isinstance(path, str) and os.path.getsize(path) >= self.large_size
+        except OSError:
+            return False
+
+    async def _consume(self, queue, pooled):
+        """
+        Runs the requests of queue: parsed requests here, raw request lines in
+        the process pool if pooled.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            request, allow_paths, respond, received = await queue.get()
+            self.in_flight += 1
+            if pooled:
+                try:
+                    response, ok = await loop.run_in_executor(
+                        self._executor, process_line, request, allow_paths
+                    )
+                except Exception as e:  # e.g. a worker process was killed
+                    response, ok = {"id": None, "error": str(e)}, False
+            else:
+                response, ok = process_request(request, allow_paths)
+            self.in_flight -= 1
+
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            latency = time.perf_counter() - received
+            self.latencies.append(latency)
+            respond(encode(response, latency))
+            queue.task_done()
+
+            if not pooled:
+                # Let the reader and the pooled consumers run between documents
+                await asyncio.sleep(0)
+
+
+async def serve_stdio(service, stdin=None, stdout=None):
+    """
+    Serves requests read from stdin until end of file, writing the responses
+    to stdout (binary streams, by default those of the process).
+    """
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    loop = asyncio.get_running_loop()
+
+    def respond(payload):
+        stdout.write(payload)
+        stdout.flush()
+
+    await service.start()
+    try:
+        while True:
+            # Reading in a thread works the same with pipes, files and terminals
+            line = await loop.run_in_executor(None, stdin.readline)
+            if not line:
+                break
+            if line.strip():
+                await service.handle_line(line, respond)
+    finally:
+        await service.close()
+
+
+async def serve_socket(service, path=None, port=None, ready=None):
+    """
+    Serves requests over a Unix socket at path, or over a TCP port on
+    localhost, until cancelled. Each connection gets the responses to its own
+    requests, and is closed once they are all sent after the client is done.
+    Reading waits while CONNECTION_WINDOW of its requests are not answered
+    yet, so a client that is slow to take its responses does not pile them up.
+    File requests are only accepted on the Unix socket, which is created with
+    the permissions SOCKET_MODE.
+
+    Args:
+        service (IndexService): The service to submit requests to.
+        path (str, optional): Path of the Unix socket.
+        port (int, optional): TCP port, used when path is None (0 picks one).
+        ready (callable, optional): Called with the server once it listens.
+    """
+
+    async def handle(reader, writer):
+        responses = asyncio.Queue()
+        # Taken for each request read, given back once its response is sent
+        window = asyncio.Semaphore(CONNECTION_WINDOW)
+
+        async def send():
+            while True:
+                payload = await responses.get()
+                try:
+                    if not writer.is_closing():
+                        writer.write(payload)
+                        await writer.drain()
+                except ConnectionError:
+                    pass
+                finally:
+                    window.release()
+
+        sender = asyncio.ensure_future(send())
+        try:
+            while True:
+                await window.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError as e:
+                    responses.put_nowait(
+                        encode({"id": None, "error": f"request too long: {e}"})
+                    )
+                    break
+                if not line.strip():
+                    window.release()
+                    if not line:
+                        break
+                    continue
+                await service.handle_line(
+                    line, responses.put_nowait, path is not None
+                )
+            # The window is whole again once every response is sent
+            for _ in range(CONNECTION_WINDOW):
+                await window.acquire()
+        except ConnectionError:
+            pass
+        finally:
+            sender.cancel()
+            writer.close()
+
+    await service.start()
+    try:
+        if path is not None:
+            # Created with SOCKET_MODE from the start, so no one else can
+            # connect before its permissions are set
+            umask = os.umask(0o777 & ~SOCKET_MODE)
+            try:
+                server = await asyncio.start_unix_server(
+                    handle, path, limit=STREAM_LIMIT
+                )
+            finally:
+                os.umask(umask)
+        else:
+            server = await asyncio.start_server(
+                handle, "127.0.0.1", port or 0, limit=STREAM_LIMIT
+            )
+        async with server:
+            if ready:
+                ready(server)
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
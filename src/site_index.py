@@ -0,0 +1,278 @@
+"""
+site_index.py
+
+This module builds a site index: a single table of contents spanning many
+Markdown files, whose entries link to 'file.md#anchor'.
+
+The files are scanned in parallel by worker processes. Each worker numbers the
+headings of its file and computes their anchors the same way the per-file
+index does, after removing existing heading numbers, so the links land on the
+headings of files indexed in place with the same TocOptions (see
+index_file_in_place), and headings they leave out of the per-file index are
+left out of the site index too. The results are merged in site order (sorted
+paths, or the order given by an order file) and written out as they arrive.
+Each file gets a number, which prefixes the numbers of its headings, all in
+the numbering style of the options ("3.", "3.1", "3.1.2", ...). Only a
+bounded window of files is in flight at any time, so memory use does not grow
+with the size of the site.
+
+The index is written as Markdown, and optionally as JSON:
+
+    - [3. Guide](docs/guide.md)
+      - [3.1 Install](docs/guide.md#1-install)
+        - [3.1.1 Linux](docs/guide.md#11-linux)
+
+    {"files": [
+    {"path": "docs/guide.md", "number": 3, "title": "Guide", "headings": [
+        {"line": 5, "level": 2, "number": "3.1", "text": "Install",
+         "anchor": "1-install"}, ...]},
+    ...
+    ]}
+
+Each file is titled by its first level 1 heading (or by its path if it has
+none), which is not listed again below it.
+"""
+
+import functools
+import itertools
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from src.header_numarator import format_number, parse_number
+from src.heading import Heading
+from src.heading_table import heading_records
+from src.toc_options import DEFAULT_TOC_OPTIONS
+
+# Files scanned ahead of the one being written, per worker process
+WINDOW_PER_WORKER = 4
+
+
+def site_order(files, order=()):
+    """
+    Sorts files in site order: the paths listed in order come first, in that
+    order, followed by the other files sorted by path. Listed paths that are
+    not in files are ignored.
+
+    Args:
+        files (iterable of str): Markdown file paths.
+        order (iterable of str): Paths in the order they should appear.
+
+    Returns:
+        list of str: The files in site order.
+    """
+    remaining = {os.path.normpath(path): path for path in files}
+    ordered = []
+    for path in order:
+        path = remaining.pop(os.path.normpath(path), None)
+        if path is not None:
+            ordered.append(path)
+    ordered.extend(sorted(remaining.values()))
+    return ordered
+
+
+def scan_site_file(path, engine="lines", slug_style="default", toc_options=None):
+    """
+    Numbers the headings of one file and computes their anchors (see
+    heading_records), reporting errors instead of raising. This is the unit of
+    work sent to the workers.
+
+    Returns:
+        dict: {
+            "path": (str) the file path,
+            "title": (str or None) text of the first level 1 heading,
+            "headings": (list of tuple) (line, level, number, text, anchor) of
+                the headings toc_options includes,
+            "error": (str or None) error message if the file failed
+        }
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    result = {"path": path, "title": None, "headings": [], "error": None}
+    try:
+        for record in heading_records(path, engine, slug_style, toc_options):
+            level, text = record["level"], record["text"]
+            if level == 1 and result["title"] is None:
+                result["title"] = text
+            if toc_options.includes(Heading(record["line"], level, text)):
+                result["headings"].append(
+                    (record["line"], level, record["number"], text, record["slug"])
+                )
+    except (OSError, UnicodeDecodeError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def scan_site(
+    files, workers=None, engine="lines", slug_style="default", toc_options=None
+):
+    """
+    Scans files across worker processes and yields their results (see
+    scan_site_file) in the order of files, keeping at most WINDOW_PER_WORKER
+    files per worker in flight.
+
+    Args:
+        files (iterable of str): Markdown file paths, in site order.
+        workers (int, optional): Number of worker processes. Defaults to the
+            number of CPUs; 1 scans the files in the current process.
+        engine (str): Scanning engine passed to parse_markdown_headers.
+        slug_style (str): Anchor rules, one of src.slugger.SLUG_STYLES.
+        toc_options (TocOptions, optional): Headings listed and how they are
+            numbered, by default DEFAULT_TOC_OPTIONS.
+
+    Yields:
+        dict: One result per file.
+    """
+    work = functools.partial(
+        scan_site_file, engine=engine, slug_style=slug_style, toc_options=toc_options
+    )
+    if workers == 1:
+        for path in files:
+            yield work(path)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    paths = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            executor.submit(work, path)
+            for path in itertools.islice(paths, workers * WINDOW_PER_WORKER)
+        )
+        while pending:
+            result = pending.popleft().result()
+            for path in itertools.islice(paths, 1):
+                pending.append(executor.submit(work, path))
+            yield result
+
+
+def link_path(path, base_dir):
+    """
+    Returns the link to path from a document in base_dir: a relative path with
+    '/' separators, percent-encoded where needed.
+    """
+    relative = os.path.relpath(path, base_dir).replace(os.sep, "/")
+    return quote(relative, safe="/")
+
+
+def site_entry(result, number, base_dir, numbering="default"):
+    """
+    Builds the site index entry of a scanned file.
+
+    Args:
+        result (dict): Result of scan_site_file.
+        number (int): Number of the file in the site.
+        base_dir (str): Directory the links are relative to.
+        numbering (str): Numbering style of the headings, one of
+            src.header_numarator.NUMBERING_STYLES.
+
+    Returns:
+        dict: {"path", "number", "title", "headings"} where each heading is a
+              dict with "line", "level", "number" (prefixed with the file
+              number, or "" if the heading has none), "text" and "anchor".
+    """
+    path = link_path(result["path"], base_dir)
+    headings = []
+    for line, level, header_number, text, anchor in result["headings"]:
+        # One format for every level: the file number is the first part
+        if header_number:
+            parts = [number] + parse_number(header_number, numbering)
+            header_number = format_number(parts, numbering)
+        headings.append(
+            {
+                "line": line,
+                "level": level,
+                "number": header_number,
+                "text": text,
+                "anchor": anchor,
+            }
+        )
+    title = result["title"] or path
+    return {"path": path, "number": number, "title": title, "headings": headings}
+
+
+def site_index_lines(entry, toc_options=None):
+    """
+    Formats a site index entry as Markdown list items.
+
+    Args:
+        entry (dict): Entry built by site_entry.
+        toc_options (TocOptions, optional): Options the entry was built with,
+            by default DEFAULT_TOC_OPTIONS.
+
+    Returns:
+        list of str: The file's item, then one nested item per heading.
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    path = entry["path"]
+    number = format_number([entry["number"]], toc_options.numbering)
+    title = f"{number} {entry['title']}".strip()
+    lines = [f"- [{title}]({path})"]
+    # Levels above the top one listed are nested under the file's item
+    top_level = max(toc_options.min_depth, 2)
+    title_skipped = False
+    for heading in entry["headings"]:
+        # The first level 1 heading is the file's title
+        if heading["level"] == 1 and not title_skipped:
+            title_skipped = True
+            if heading["text"] == entry["title"]:
+                continue
+        indent = "  " * (1 + max(heading["level"] - top_level, 0))
+        text = f"{heading['number']} {heading['text']}".strip()
+        lines.append(f"{indent}- [{text}]({path}#{heading['anchor']})")
+    return lines
+
+
+def write_site_index(
+    files,
+    output,
+    json_output=None,
+    base_dir=".",
+    workers=None,
+    engine="lines",
+    slug_style="default",
+    toc_options=None,
+):
+    """
+    Scans files in parallel and writes the site index as the results arrive.
+
+    Args:
+        files (list of str): Markdown file paths, in site order (see site_order).
+        output (file object): Writable text file for the Markdown index.
+        json_output (file object, optional): Writable text file for the JSON
+            index.
+        base_dir (str): Directory the links are relative to, usually that of
+            the Markdown index.
+        workers (int, optional): See scan_site.
+        engine (str): See scan_site.
+        slug_style (str): See scan_site.
+        toc_options (TocOptions, optional): See scan_site.
+
+    Returns:
+        dict: {"files": (int) files indexed, "headings": (int) headings listed,
+               "errors": (list of tuple) (path, error) for the files that failed}
+    """
+    toc_options = toc_options or DEFAULT_TOC_OPTIONS
+    summary = {"files": 0, "headings": 0, "errors": []}
+    if json_output:
+        json_output.write('{"files": [')
+
+    for result in scan_site(files, workers, engine, slug_style, toc_options):
+        if result["error"]:
+            summary["errors"].append((result["path"], result["error"]))
+            continue
+        summary["files"] += 1
+        summary["headings"] += len(result["headings"])
+        entry = site_entry(
+            result, summary["files"], base_dir, toc_options.numbering
+        )
+
+        for line in site_index_lines(entry, toc_options):
+            output.write(line + "\n")
+        if json_output:
+            json_output.write("\n" if summary["files"] == 1 else ",\n")
+            json_output.write(json.dumps(entry))
+
+    if json_output:
+        json_output.write("\n]}\n" if summary["files"] else "]}\n")
+    return summary
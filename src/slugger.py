@@ -0,0 +1,130 @@
+"""
+slugger.py
+
+This module provides the anchor slug generator used by create_index.
+
+Several rule sets are available:
+    - "default": the original rules of this project: lowercase, drop
+      characters other than word characters, whitespace and '-', turn spaces
+      into '-', collapse runs of '-'. An empty slug becomes "header".
+    - "github": GitHub's rules: lowercase, drop punctuation except '-' and '_',
+      turn each space into '-' (runs of '-' are kept).
+    - "gitlab": GitLab's rules: like "default", without the "header" fallback.
+    - "commonmark": the rules of common CommonMark renderers (markdown-it-anchor):
+      lowercase, turn whitespace runs into '-', percent-encode the rest.
+
+Whatever the rules, a Slugger deduplicates slugs within a document the way
+GitHub does: the second "Usage" heading gets "usage-1", the third "usage-2".
+
+Base slugs are memoized with an LRU cache, since generated documents repeat the
+same heading texts many times, and ASCII text is filtered with str.translate
+instead of a regular expression.
+"""
+
+import functools
+import re
+
+SLUG_STYLES = ("default", "github", "gitlab", "commonmark")
+
+# Number of distinct (text, style) pairs kept by the memoization layer
+SLUG_CACHE_SIZE = 65536
+
+# ASCII characters dropped by the "default"/"gitlab" rules (r"[^\w\s-]")
+_DEFAULT_DELETE = "".join(
+    char
+    for char in map(chr, range(128))
+    if not (char.isalnum() or char in "_-" or char.isspace())
+)
+_DEFAULT_TABLE = str.maketrans("", "", _DEFAULT_DELETE)
+_DEFAULT_PATTERN = re.compile(r"[^\w\s-]")
+
+# ASCII characters dropped by the "github" rules, and spaces turned into '-'
+_GITHUB_TABLE = str.maketrans(
+    " ",
+    "-",
+    "".join(
+        char
+        for char in map(chr, range(128))
+        if not (char.isalnum() or char in "_- ")
+    ),
+)
+_GITHUB_PATTERN = re.compile(r"[^\w\- ]")
+
+_HYPHENS_PATTERN = re.compile(r"-+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=SLUG_CACHE_SIZE)
+def slugify(text, style="default"):
+    """
+    Converts heading text to an anchor slug, without deduplication.
+
+    Args:
+        text (str): The heading text (including its numbering, if any).
+        style (str): One of SLUG_STYLES.
+
+    Returns:
+        str: The slug.
+    """
+    text = text.lower()
+
+    if style == "default" or style == "gitlab":
+        if text.isascii():
+            text = text.translate(_DEFAULT_TABLE)
+        else:
+            text = _DEFAULT_PATTERN.sub("", text)
+        text = text.strip().replace(" ", "-")
+        if "--" in text:
+            text = _HYPHENS_PATTERN.sub("-", text)
+        if not text and style == "default":
+            text = "header"
+        return text
+
+    if style == "github":
+        if text.isascii():
+            return text.translate(_GITHUB_TABLE)
+        return _GITHUB_PATTERN.sub("", text).replace(" ", "-")
+
+    if style == "commonmark":
+        # Imported here: urllib.parse (and ipaddress) would slow down start-up
+        from urllib.parse import quote
+
+        text = _WHITESPACE_PATTERN.sub("-", text.strip())
+        return quote(text, safe="-_.!~*'()")
+
+    raise ValueError(f"Unknown slug style '{style}', expected one of {SLUG_STYLES}.")
+
+
+class Slugger:
+    """
+    Generates unique anchor slugs for the headings of one document.
+
+    Args:
+        style (str): One of SLUG_STYLES.
+    """
+
+    def __init__(self, style="default"):
+        if style not in SLUG_STYLES:
+            raise ValueError(
+                f"Unknown slug style '{style}', expected one of {SLUG_STYLES}."
+            )
+        self.style = style
+        self.occurrences = {}
+
+    def slug(self, text):
+        """
+        Returns the slug for text, suffixed with "-1", "-2", ... if it was
+        already used in this document.
+        """
+        slug = original = slugify(text, self.style)
+        while slug in self.occurrences:
+            self.occurrences[original] += 1
+            slug = f"{original}-{self.occurrences[original]}"
+        self.occurrences[slug] = 0
+        return slug
+
+    def reset(self):
+        """
+        Forgets the slugs seen so far, to start a new document.
+        """
+        self.occurrences.clear()
@@ -3,12 +3,67 @@ from unittest.mock import patch, mock_open
 import subprocess
 import sys
 import os
+import asyncio
+import io
+import json
+import signal
+import socket
+import tempfile
+import time
 
 # Local modules
 import src.create_index
+import src.slugger
 import src.parse_markdown_headers
 import src.header_numarator
 import src.new_headers
+import src.heading
+import src.index_markdown
+import src.batch_index
+import src.index_cache
+import src.watch_index
+import src.profiling
+import src.indexer
+import src.cli
+import src.client
+import src.service
+import src.site_index
+import src.heading_table
+import src.heading_store
+import src.sections
+import src.incremental_index
+import src.toc_options
+import src.parallel_scan
+import src.charset
+
+
+class TestHeading(unittest.TestCase):
+    def test_dict_view(self):
+        heading = src.heading.Heading(3, 2, "Usage")
+        self.assertEqual(heading["header_text"], "Usage")
+        expected = {"line": 3, "header_level": 2, "header_text": "Usage"}
+        self.assertEqual(heading, expected)
+        self.assertNotIn("header_number", heading)
+        self.assertIsNone(heading.get("new_text"))
+        with self.assertRaises(KeyError):
+            heading["header_number"]
+
+        heading["header_number"] = "1."
+        self.assertEqual(heading.header_number, "1.")
+        self.assertEqual(heading.as_dict()["header_number"], "1.")
+
+    def test_no_instance_dict(self):
+        heading = src.heading.Heading(1, 1, "Title")
+        self.assertFalse(hasattr(heading, "__dict__"))
+        with self.assertRaises(KeyError):
+            heading["unknown"] = 1
+
+    def test_as_headings_converts_dicts(self):
+        headers = [{"line": 1, "header_level": 2, "header_text": "A"}]
+        result = src.heading.as_headings(headers)
+        self.assertIs(result, headers)
+        self.assertIsInstance(headers[0], src.heading.Heading)
+        self.assertEqual(headers[0].header_text, "A")
 
 
 class TestParseMarkdownHeaders(unittest.TestCase):
@@ -70,6 +125,228 @@ class TestParseMarkdownHeaders(unittest.TestCase):
         self.assertEqual(result[0]["header_text"], "Valid Heading")
         self.assertEqual(result[1]["header_text"], "Valid Heading 2")
 
+    def test_scan_lines_is_lazy(self):
+        # A generator is consumed one line at a time, yielding every line
+        lines = (line for line in ["# Title\n", "text\n", "## Sub\n"])
+        scan = src.parse_markdown_headers.scan_markdown_lines(lines)
+        line, header = next(scan)
+        self.assertEqual(line, "# Title\n")
+        self.assertEqual(header["line"], 1)
+        self.assertEqual(next(scan), ("text\n", None))
+        line, header = next(scan)
+        self.assertEqual(header["header_text"], "Sub")
+
+
+class TestMmapEngine(unittest.TestCase):
+    DOC = (
+        "# Title\r\n"
+        "text with ``` inline fence\n"
+        "# Hidden\n"
+        "closing ``` and ```\n"
+        "## Visible\n"
+        "#\n"
+        "####### Too deep\n"
+        "  # Indented\n"
+        "### Last without newline"
+    )
+
+    def parse(self, content, engine):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "wb") as f:
+                f.write(content.encode("utf-8"))
+            return src.parse_markdown_headers.parse_markdown_headers(path, engine)
+
+    def test_engines_agree(self):
+        def key(headers):
+            return [(h.line, h.header_level, h.header_text) for h in headers]
+
+        for content in [self.DOC, "", "no headings\n", "```\n# x\n```\n# y"]:
+            lines = self.parse(content, "lines")
+            self.assertEqual(key(self.parse(content, "mmap")), key(lines))
+
+    def test_byte_spans(self):
+        result = self.parse("# A\ntext\n## B\n", "mmap")
+        self.assertEqual([(h.offset, h.end) for h in result], [(0, 4), (9, 14)])
+
+    def test_line_numbers(self):
+        result = self.parse(self.DOC, "mmap")
+        self.assertEqual(
+            [(h.line, h.header_text) for h in result],
+            [
+                (1, "Title"),
+                (3, "Hidden"),
+                (5, "Visible"),
+                (6, ""),
+                (8, "Indented"),
+                (9, "Last without newline"),
+            ],
+        )
+
+    def test_scan_bytes(self):
+        result = list(src.parse_markdown_headers.scan_markdown_buffer(b"# A\n## B\n"))
+        self.assertEqual([h.header_level for h in result], [1, 2])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            src.parse_markdown_headers.parse_markdown_headers("dummy.md", "regex")
+
+
+class TestParallelScan(unittest.TestCase):
+    # Blocks and paragraphs running across chunk boundaries
+    DOC = (
+        "---\ntitle: x\n---\n# Title\n\n"
+        + "Some text\nmore text\n" * 5
+        + "Setext\n===\n\n```\n# not a heading\n\n# still code\n```\n"
+        + "## Part\n<div>\n# html\n</div>\n\n<!--\n# comment\n\n-->\n"
+        + "    # indented\n> # quoted\n- item\n---\n\n### Deep ###\n"
+        + "Long paragraph\n" * 70
+        + "---\n~~~\n## unclosed\n"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "doc.md")
+        with open(self.path, "wb") as f:
+            f.write(self.DOC.encode("utf-8"))
+        self.data = self.DOC.encode("utf-8")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def key(self, headings):
+        return [(h.line, h.header_text, h.offset, h.end) for h in headings]
+
+    def test_split_chunks(self):
+        chunks = src.parallel_scan.split_chunks(self.data, 19, 50)
+        self.assertEqual(chunks[0][0], 19)
+        self.assertEqual(chunks[-1][1], len(self.data))
+        for (_, stop), (start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(stop, start)
+            self.assertEqual(self.data[start - 1 : start], b"\n")
+
+    def test_reconcile_matches_mmap_scanner(self):
+        expected = self.key(src.parse_markdown_headers.scan_markdown_buffer(self.data))
+        self.assertEqual(len(expected), 4)
+        start = src.parse_markdown_headers.front_matter_end(self.data)
+        for chunk_size in (1, 7, 32, 100, len(self.data)):
+            chunks = src.parallel_scan.split_chunks(self.data, start, chunk_size)
+            results = [src.parallel_scan.scan_chunk(self.path, *c) for c in chunks]
+            headings = src.parallel_scan.reconcile(self.data, chunks, results)
+            self.assertEqual(self.key(headings), expected, chunk_size)
+
+    def test_worker_pool(self):
+        with patch.object(src.parallel_scan, "PARALLEL_MIN_SIZE", 0):
+            headings = src.parallel_scan.scan_buffer_parallel(
+                self.path, self.data, workers=2, chunk_size=64
+            )
+        expected = src.parse_markdown_headers.scan_markdown_buffer(self.data)
+        self.assertEqual(self.key(headings), self.key(expected))
+
+    def test_parallel_engine(self):
+        mmap_headings = src.parse_markdown_headers.parse_markdown_headers(
+            self.path, "mmap"
+        )
+        headings = src.parse_markdown_headers.parse_markdown_headers(
+            self.path, "parallel"
+        )
+        self.assertEqual(self.key(headings), self.key(mmap_headings))
+
+        cmd = [sys.executable, "markdown-indexer.py", "--parallel", self.path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for extra in (["-i"], [self.path, "test-md.md"]):
+            result = subprocess.run(cmd + extra, capture_output=True, text=True)
+            self.assertEqual(result.returncode, 2)
+
+
+class TestBlockScanner(unittest.TestCase):
+    def headings(self, text):
+        # Both engines must find the same headings
+        lines = src.parse_markdown_headers.parse_markdown_text(text)
+        buffer = src.parse_markdown_headers.scan_markdown_buffer(text.encode("utf-8"))
+        result = [(h.line, h.header_level, h.header_text) for h in lines]
+        self.assertEqual(
+            [(h.line, h.header_level, h.header_text) for h in buffer], result
+        )
+        return result
+
+    def test_fences(self):
+        # Tilde fences, longer closing fences, and fences that do not close
+        text = "~~~\n# a\n```\n# b\n~~~~\n# c\n````\n```\n# d\n````\n# e\n"
+        self.assertEqual(self.headings(text), [(6, 1, "c"), (11, 1, "e")])
+        self.assertEqual(self.headings("``` x ` y\n# a\n"), [(2, 1, "a")])
+        self.assertEqual(self.headings("```\n# a\n``` x\n# b\n"), [])
+        self.assertEqual(self.headings("    ```\n# a\n"), [(2, 1, "a")])
+
+    def test_atx_closing_sequence(self):
+        text = "# a #\n## b ##   \n### c#\n#### #\n# d \\#\n"
+        self.assertEqual(
+            self.headings(text),
+            [(1, 1, "a"), (2, 2, "b"), (3, 3, "c#"), (4, 4, ""), (5, 1, "d \\#")],
+        )
+
+    def test_setext(self):
+        text = "Title\n=====\n\nTwo\n  lines\n---\n\n---\n- item\n---\n> quote\n---\n"
+        self.assertEqual(self.headings(text), [(1, 1, "Title"), (4, 2, "Two lines")])
+        # Too long a paragraph never becomes a heading
+        limit = src.parse_markdown_headers.MAX_SETEXT_LINES
+        self.assertEqual(
+            self.headings("a\n" * limit + "==\n"), [(1, 1, " ".join("a" * limit))]
+        )
+        self.assertEqual(self.headings("a\n" * (limit + 1) + "==\n"), [])
+
+    def test_indented_code(self):
+        text = "    # code\n\t# code\ntext\n    # continuation\n\n  # heading\n"
+        self.assertEqual(self.headings(text), [(6, 1, "heading")])
+
+    def test_html_blocks(self):
+        text = (
+            "<div>\n# a\n\n# b\n<!-- comment\n# c\n-->\n# d\n"
+            "<pre>\n# e\n\n# f\n</pre>\n<span>\n# g\n\ntext\n<span>\n# h\n"
+        )
+        self.assertEqual(self.headings(text), [(4, 1, "b"), (8, 1, "d"), (19, 1, "h")])
+
+    def test_front_matter(self):
+        text = "---\ntitle: x\n# a\n---\n# b\n"
+        self.assertEqual(self.headings(text), [(5, 1, "b")])
+        self.assertEqual(self.headings("+++\n# a\n+++\n# b\n"), [(4, 1, "b")])
+        self.assertEqual(self.headings("---\n# a\n"), [])
+        self.assertEqual(
+            self.headings("text\n---\n# a\n---\n"), [(1, 2, "text"), (3, 1, "a")]
+        )
+
+    def test_random_documents(self):
+        # Random mixes of block starts: the engines must agree on all of them
+        import random
+
+        pieces = (
+            "# h|## h #|text|  text|    code|\tcode||   |```|````|~~~|``` a`|===|"
+            "---|- - -|***|- item|1. one|2) two|> quote|<div>|</div>|<!--|-->|"
+            "<pre>|</pre>|<span>|+++|...|-|*|#"
+        ).split("|")
+        rng = random.Random(14)
+        for _ in range(500):
+            lines = [rng.choice(pieces) for _ in range(rng.randint(1, 30))]
+            for newline in ("\n", "\r\n"):
+                self.headings(newline.join(lines) + rng.choice(["", newline]))
+
+    def test_index_setext_and_front_matter(self):
+        text = "---\ntitle: x\n---\nTitle\n=====\nSub\n---\nbody\n"
+        expected = (
+            "---\ntitle: x\n---\n# Title\n\n- [Title](#title)\n"
+            "  - [1. Sub](#1-sub)\n## 1. Sub\nbody\n"
+        )
+        self.assertEqual(src.index_markdown.index_text(text), expected)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            out = os.path.join(tmp, "out.md")
+            src.index_markdown.index_file(path, out, engine="mmap")
+            with open(out, "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), expected)
+
 
 class TestHeaderNumarator(unittest.TestCase):
     def setUp(self):
@@ -111,6 +388,64 @@ class TestHeaderNumarator(unittest.TestCase):
         # H4 => "2.1.1"
         self.assertEqual(output[5]["header_number"], "2.1.1")
 
+    def test_shared_level_counts(self):
+        # Numbering continues across calls when the state is passed in
+        level_counts = [0, 0, 0, 0, 0, 0]
+        first = self.func([{"header_level": 2, "line": 1}], level_counts)
+        second = self.func([{"header_level": 3, "line": 2}], level_counts)
+        third = self.func([{"header_level": 2, "line": 3}], level_counts)
+        self.assertEqual(first[0]["header_number"], "1.")
+        self.assertEqual(second[0]["header_number"], "1.1")
+        self.assertEqual(third[0]["header_number"], "2.")
+
+    def test_strip_header_number(self):
+        strip = src.header_numarator.strip_header_number
+        self.assertEqual(strip("1. Getting Started", 2), "Getting Started")
+        self.assertEqual(strip("2.1.3 Deep", 4), "Deep")
+        # Only the numbering format of the heading's own level is removed
+        self.assertEqual(strip("2024 Roadmap", 2), "2024 Roadmap")
+        self.assertEqual(strip("1.2 Mismatch", 4), "1.2 Mismatch")
+        self.assertEqual(strip("1. Title", 1), "1. Title")
+
+    def test_numbering_styles(self):
+        levels = [2, 3, 4, 3, 2, 3]
+        expected = {
+            "default": ["1.", "1.1", "1.1.1", "1.2", "2.", "2.1"],
+            "dotted": ["1.", "1.1.", "1.1.1.", "1.2.", "2.", "2.1."],
+            "roman": ["I.", "I.A", "I.A.1", "I.B", "II.", "II.A"],
+            "none": ["", "", "", "", "", ""],
+        }
+        for style, numbers in expected.items():
+            headers = [{"header_level": level, "line": 1} for level in levels]
+            self.func(headers, style=style)
+            self.assertEqual([h["header_number"] for h in headers], numbers)
+            strip = src.header_numarator.strip_header_number
+            parse_number = src.header_numarator.parse_number
+            for header in headers:
+                number, level = header["header_number"], header["header_level"]
+                text = f"{number} Text".strip()
+                self.assertEqual(strip(text, level, style), "Text")
+                parts = parse_number(number, style)
+                self.assertEqual(len(parts), 0 if style == "none" else level - 1)
+
+    def test_start_level(self):
+        headers = [{"header_level": level, "line": 1} for level in (1, 2, 3, 4, 3)]
+        self.func(headers, start_level=3)
+        numbers = [h["header_number"] for h in headers]
+        self.assertEqual(numbers, ["", "", "1.", "1.1", "2."])
+        strip = src.header_numarator.strip_header_number
+        self.assertEqual(strip("1.1 Deep", 4, start_level=3), "Deep")
+        self.assertEqual(strip("1. Part", 2, start_level=3), "1. Part")
+
+    def test_roman_numbers(self):
+        format_number = src.header_numarator.format_number
+        self.assertEqual(format_number([1994], "roman"), "MCMXCIV.")
+        self.assertEqual(format_number([4, 28, 3, 2, 9], "roman"), "IV.AB.3.b.ix")
+        self.assertEqual(format_number([0, 1], "roman"), "0.A")
+        parse_number = src.header_numarator.parse_number
+        self.assertEqual(parse_number("MCMXCIV.", "roman"), [1994])
+        self.assertEqual(parse_number("IV.AB.3.b.ix", "roman"), [4, 28, 3, 2, 9])
+
 
 class TestNewHeaders(unittest.TestCase):
     def setUp(self):
@@ -244,6 +579,1893 @@ class TestCreateIndex(unittest.TestCase):
         self.assertIn("(#header)", result[0])
 
 
+class TestIndexMarkdown(unittest.TestCase):
+    def test_matches_reference_output(self):
+        with open("test-md.md", "r", encoding="utf-8") as f:
+            output = io.StringIO()
+            src.index_markdown.index_lines(f, output)
+        with open("test-md-indexed.md", "r", encoding="utf-8") as f:
+            self.assertEqual(output.getvalue(), f.read())
+
+    def test_empty_document(self):
+        output = io.StringIO()
+        headers = src.index_markdown.index_lines([], output)
+        self.assertEqual(headers, [])
+        self.assertEqual(output.getvalue(), "")
+
+    def test_first_line_heading_is_rewritten(self):
+        output = io.StringIO()
+        src.index_markdown.index_lines(["## Intro\n", "text\n"], output)
+        self.assertEqual(
+            output.getvalue(), "## 1. Intro\n\n  - [1. Intro](#1-intro)\ntext\n"
+        )
+
+    def test_output_may_overwrite_input(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# Doc\n## Part\nbody\n")
+            src.index_markdown.index_file(path, path)
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+        self.assertIn("- [1. Part](#1-part)", content)
+        self.assertTrue(content.endswith("## 1. Part\nbody\n"))
+
+    def test_mmap_engine_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            for engine in src.index_markdown.ENGINES:
+                out = os.path.join(tmp, f"{engine}.md")
+                src.index_markdown.index_file("test-md.md", out, engine=engine)
+                with open(out, "rb") as f:
+                    with open("test-md-indexed.md", "rb") as expected:
+                        self.assertEqual(f.read(), expected.read())
+
+            # CRLF line endings are kept, and the output may replace the input
+            with open(path, "wb") as f:
+                f.write(b"Intro\r\n## Part\r\nbody\r\n")
+            src.index_markdown.index_file(path, path, engine="mmap")
+            with open(path, "rb") as f:
+                self.assertEqual(
+                    f.read(),
+                    b"Intro\r\n\r\n  - [1. Part](#1-part)\r\n## 1. Part\r\nbody\r\n",
+                )
+
+    def test_index_text(self):
+        result = src.index_markdown.index_text("# Doc\n## Part\nbody")
+        self.assertEqual(
+            result, "# Doc\n\n- [Doc](#doc)\n  - [1. Part](#1-part)\n## 1. Part\nbody"
+        )
+
+
+class TestReindex(unittest.TestCase):
+    def test_reindex_is_idempotent(self):
+        with open("test-md.md", "r", encoding="utf-8") as f:
+            text = f.read()
+        once = src.index_markdown.index_text(text, reindex=True)
+        self.assertIn("<!-- toc -->\n- [Project Title]", once)
+        self.assertIn("  - [4. License](#4-license)\n<!-- /toc -->\n", once)
+        self.assertEqual(src.index_markdown.index_text(once, reindex=True), once)
+
+    def test_empty_heading_is_idempotent(self):
+        once = src.index_markdown.index_text("# T\n## \n## B\n", reindex=True)
+        self.assertIn("\n## 1. \n## 2. B\n", once)
+        self.assertEqual(src.index_markdown.index_text(once, reindex=True), once)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# T\n## \n## B\n")
+            src.incremental_index.index_file_incremental(path)
+            _, changed = src.incremental_index.index_file_incremental(path)
+            self.assertFalse(changed)
+            with open(path, "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), once)
+
+    def test_unterminated_first_line_is_idempotent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            for text in ("---\na: b\n---", "Title", "# Title"):
+                once = src.index_markdown.index_text(text, reindex=True)
+                self.assertIn("\n\n<!-- toc -->\n", once)
+                again = src.index_markdown.index_text(once, reindex=True)
+                self.assertEqual(again, once)
+                for index in (
+                    src.index_markdown.index_file_in_place,
+                    src.incremental_index.index_file_incremental,
+                ):
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    index(path)
+                    _, changed = index(path)
+                    self.assertFalse(changed)
+                    with open(path, "r", encoding="utf-8") as f:
+                        self.assertEqual(f.read(), once)
+
+                # The buffer engines give the same output as the lines engine
+                expected = src.index_markdown.index_text(text)
+                for engine in src.index_markdown.ENGINES:
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    src.index_markdown.index_file(path, path, engine=engine)
+                    with open(path, "r", encoding="utf-8") as f:
+                        self.assertEqual(f.read(), expected)
+
+    def test_strip_toc(self):
+        lines = ["Title\n", "\n", "<!-- toc -->\n", "- [a](#a)\n", "<!-- /toc -->\n"]
+        lines += ["\n", "body\n"]
+        result = list(src.index_markdown.strip_toc(lines))
+        self.assertEqual(result, ["Title\n", "\n", "body\n"])
+
+    def test_in_place_skips_identical_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# Doc\n## 1. Part\n## Other\n")
+
+            headers, changed = src.index_markdown.index_file_in_place(path)
+            self.assertTrue(changed)
+            self.assertEqual([h.header_number for h in headers], ["", "1.", "2."])
+            with open(path, "r", encoding="utf-8") as f:
+                self.assertIn("## 2. Other\n", f.read())
+
+            os.utime(path, ns=(0, 0))
+            _, changed = src.index_markdown.index_file_in_place(path)
+            self.assertFalse(changed)
+            self.assertEqual(os.stat(path).st_mtime_ns, 0)
+            self.assertEqual(os.listdir(tmp), ["doc.md"])
+
+
+class TestBatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "sub"))
+        for name in ["a.md", "sub/b.md", "sub/b-indexed.md", "notes.txt"]:
+            with open(os.path.join(self.root, name), "w", encoding="utf-8") as f:
+                f.write("# Title\n## Part\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_collect_directory(self):
+        files = src.batch_index.collect_markdown_files([self.root])
+        names = [os.path.relpath(path, self.root) for path in files]
+        self.assertEqual(names, ["a.md", os.path.join("sub", "b.md")])
+
+    def test_collect_glob_and_duplicates(self):
+        pattern = os.path.join(self.root, "*.md")
+        path = os.path.join(self.root, "a.md")
+        files = src.batch_index.collect_markdown_files([pattern, path])
+        self.assertEqual(files, [path])
+
+    def test_batch_reports_failures(self):
+        files = [
+            os.path.join(self.root, "a.md"),
+            os.path.join(self.root, "missing.md"),
+        ]
+        results = src.batch_index.batch_index(files, workers=2)
+        self.assertEqual([result["input"] for result in results], files)
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(results[0]["headers"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "a-indexed.md")))
+        self.assertIsNotNone(results[1]["error"])
+
+    def test_batch_in_place(self):
+        path = os.path.join(self.root, "a.md")
+        first = src.batch_index.batch_index([path], in_place=True)[0]
+        second = src.batch_index.batch_index([path], in_place=True)[0]
+        self.assertEqual(first["output"], path)
+        self.assertTrue(first["changed"])
+        self.assertFalse(second["changed"])
+
+    def test_cli_batch_from_stdin(self):
+        cmd = [sys.executable, "markdown-indexer.py", "--files-from", "-", "-j", "1"]
+        paths = "\n".join(
+            [os.path.join(self.root, "a.md"), os.path.join(self.root, "sub", "b.md")]
+        )
+        result = subprocess.run(cmd, input=paths, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Indexed 2 of 2 files, 0 failed.", result.stdout)
+
+
+class TestCheckMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.path = os.path.join(self.root, "a.md")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# Title\n## Part\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_index_bytes_matches_index_file(self):
+        documents = [
+            b"",
+            b"# Title\r\n## One\r\ntext\r\n## Two",
+            "\ufeff# Titre\n## \u00c9t\u00e9\n".encode("utf-8"),
+            "# Caf\u00e9\n## Cr\u00e8me\n".encode("latin-1"),
+            "# Title\n## Part\n".encode("utf-16"),
+        ]
+        output = os.path.join(self.root, "out.md")
+        for data in documents:
+            with open(self.path, "wb") as f:
+                f.write(data)
+            for engine, reindex in [("lines", False), ("lines", True), ("mmap", False)]:
+                with self.subTest(data=data, engine=engine, reindex=reindex):
+                    src.index_markdown.index_file(self.path, output, engine, reindex)
+                    indexed, _ = src.index_markdown.index_bytes(data, engine, reindex)
+                    self.assertEqual(indexed, self.read(output))
+
+    def test_check_file_in_place(self):
+        headers, stale = src.index_markdown.check_file(
+            self.path, self.path, reindex=True
+        )
+        self.assertTrue(stale)
+        self.assertEqual(len(headers), 2)
+        self.assertEqual(self.read(self.path), b"# Title\n## Part\n")
+
+        src.index_markdown.index_file_in_place(self.path)
+        _, stale = src.index_markdown.check_file(self.path, self.path, reindex=True)
+        self.assertFalse(stale)
+
+    def test_batch_check_writes_nothing(self):
+        output = os.path.join(self.root, "a-indexed.md")
+        result = src.batch_index.batch_index([self.path], check=True)[0]
+        self.assertTrue(result["changed"])
+        self.assertIsNone(result["error"])
+        self.assertFalse(os.path.exists(output))
+
+        src.batch_index.batch_index([self.path])
+        result = src.batch_index.batch_index([self.path], check=True)[0]
+        self.assertFalse(result["changed"])
+
+    def test_changed_markdown_files(self):
+        os.makedirs(os.path.join(self.root, "sub"))
+        other = os.path.join(self.root, "sub", "b.md")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write("# B\n")
+        names = [
+            self.path,
+            other,
+            os.path.join(self.root, "deleted.md"),
+            os.path.join(self.root, "notes.txt"),
+            self.path,
+        ]
+        self.assertEqual(
+            src.batch_index.changed_markdown_files(names), [self.path, other]
+        )
+        self.assertEqual(
+            src.batch_index.changed_markdown_files(
+                names, [os.path.join(self.root, "sub")]
+            ),
+            [other],
+        )
+
+    def test_git_changed_files(self):
+        def git(*args):
+            subprocess.run(
+                ["git", "-c", "user.name=a", "-c", "user.email=a@example.com"]
+                + list(args),
+                cwd=self.root,
+                check=True,
+                capture_output=True,
+            )
+
+        try:
+            git("init", "-q")
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git is not available")
+        with open(os.path.join(self.root, "b.md"), "w", encoding="utf-8") as f:
+            f.write("# B\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "Initial")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("## New\n")
+        os.remove(os.path.join(self.root, "b.md"))
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            self.assertEqual(src.batch_index.git_changed_files(), ["a.md"])
+            with self.assertRaises(OSError):
+                src.batch_index.git_changed_files("no-such-revision")
+        finally:
+            os.chdir(cwd)
+
+    def test_cli_check_exit_status(self):
+        cmd = [sys.executable, "markdown-indexer.py", "--check", "-i", self.path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Out of date: ", result.stdout)
+        self.assertEqual(self.read(self.path), b"# Title\n## Part\n")
+
+        src.index_markdown.index_file_in_place(self.path)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Checked 1 of 1 files, 0 out of date, 0 failed.", result.stdout)
+
+    def test_cli_changed_from_stdin(self):
+        cmd = [sys.executable, "markdown-indexer.py", "--check", "--changed", "-"]
+        names = os.path.join(self.root, "notes.txt")
+        result = subprocess.run(cmd, input=names, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("No changed Markdown files.", result.stdout)
+
+        result = subprocess.run(cmd, input=self.path, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 1)
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "sub"))
+        documents = {
+            "guide.md": "# Guide\n## 1. Install\n### Linux\n## Usage\n",
+            "api.md": "# API\n## Call\n",
+            "sub/no title.md": "text\n## Part\n",
+        }
+        for name, content in documents.items():
+            with open(os.path.join(self.root, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        self.files = src.batch_index.collect_markdown_files([self.root])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, order=(), workers=1):
+        files = src.site_index.site_order(self.files, order)
+        output = io.StringIO()
+        json_output = io.StringIO()
+        summary = src.site_index.write_site_index(
+            files, output, json_output, base_dir=self.root, workers=workers
+        )
+        return summary, output.getvalue(), json.loads(json_output.getvalue())
+
+    def test_site_order(self):
+        order = [os.path.join(self.root, "guide.md"), "missing.md"]
+        files = src.site_index.site_order(self.files, order)
+        names = [os.path.relpath(path, self.root) for path in files]
+        expected = ["guide.md", "api.md", os.path.join("sub", "no title.md")]
+        self.assertEqual(names, expected)
+
+    def test_markdown_index(self):
+        summary, markdown, _ = self.build()
+        self.assertEqual(summary, {"files": 3, "headings": 7, "errors": []})
+        self.assertEqual(
+            markdown,
+            "- [1. API](api.md)\n"
+            "  - [1.1 Call](api.md#1-call)\n"
+            "- [2. Guide](guide.md)\n"
+            "  - [2.1 Install](guide.md#1-install)\n"
+            "    - [2.1.1 Linux](guide.md#11-linux)\n"
+            "  - [2.2 Usage](guide.md#2-usage)\n"
+            "- [3. sub/no%20title.md](sub/no%20title.md)\n"
+            "  - [3.1 Part](sub/no%20title.md#1-part)\n",
+        )
+
+    def test_toc_options(self):
+        with open(os.path.join(self.root, "guide.md"), "w", encoding="utf-8") as f:
+            f.write(
+                "# Guide\n## Skip me <!-- omit from toc -->\n## Install\n"
+                "### Linux\n# Appendix\n## Notes\n"
+            )
+        files = [os.path.join(self.root, "guide.md")]
+        output = io.StringIO()
+        options = src.toc_options.TocOptions(max_depth=2, numbering="dotted")
+        summary = src.site_index.write_site_index(
+            files, output, base_dir=self.root, workers=1, toc_options=options
+        )
+        self.assertEqual(summary["headings"], 4)
+        # The second H1 is listed without a number, as in the file's own index
+        self.assertEqual(
+            output.getvalue(),
+            "- [1. Guide](guide.md)\n"
+            "  - [1.1. Install](guide.md#1-install)\n"
+            "  - [Appendix](guide.md#appendix)\n"
+            "  - [1.2. Notes](guide.md#2-notes)\n",
+        )
+
+    def test_json_matches_and_workers_agree(self):
+        summary, markdown, data = self.build(workers=2)
+        self.assertEqual((summary, markdown), self.build()[:2])
+        titles = [entry["title"] for entry in data["files"]]
+        self.assertEqual(titles, ["API", "Guide", "sub/no%20title.md"])
+        heading = data["files"][1]["headings"][2]
+        expected = {"line": 3, "level": 3, "number": "2.1.1", "text": "Linux"}
+        self.assertEqual(data["files"][1]["headings"][1]["number"], "2.1")
+        self.assertEqual(heading, {**expected, "anchor": "11-linux"})
+
+    def test_errors_are_reported(self):
+        self.files.append(os.path.join(self.root, "missing.md"))
+        summary, _, data = self.build()
+        self.assertEqual(summary["files"], 3)
+        self.assertEqual(summary["errors"][0][0], self.files[-1])
+        self.assertEqual(len(data["files"]), 3)
+
+    def test_cli_site(self):
+        output = os.path.join(self.root, "index.md")
+        cmd = [sys.executable, "markdown-indexer.py", "site", self.root, "-o", output]
+        for _ in range(2):
+            # The index itself is not picked up by the next run
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("(3 files, 7 headings, 0 failed)", result.stdout)
+        with open(output, "r", encoding="utf-8") as f:
+            self.assertTrue(f.read().startswith("- [1. API](api.md)\n"))
+
+
+class TestHeadingTable(unittest.TestCase):
+    DOC = (
+        "---\r\ntitle: x\r\n---\r\n"
+        "# Café\r\n"
+        "## 2. Install\r\n"
+        "Setext ünder\r\n"
+        "text\r\n"
+        "---\r\n"
+        "```\n## hidden\n```\n"
+        "### Linux"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "doc.md")
+        with open(self.path, "wb") as f:
+            f.write(self.DOC.encode("utf-8"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def records(self, engine):
+        return list(src.heading_table.heading_records(self.path, engine))
+
+    def test_records(self):
+        records = self.records("lines")
+        self.assertEqual(records, self.records("mmap"))
+        fields = ("line", "level", "number", "text", "slug")
+        self.assertEqual(
+            [tuple(record[field] for field in fields) for record in records],
+            [
+                (4, 1, "", "Café", "café"),
+                (5, 2, "1.", "Install", "1-install"),
+                (6, 2, "2.", "Setext ünder text", "2-setext-ünder-text"),
+                (12, 3, "2.1", "Linux", "21-linux"),
+            ],
+        )
+        self.assertEqual(records[0]["path"], self.path)
+
+    def test_offsets_point_at_heading_lines(self):
+        data = self.DOC.encode("utf-8")
+        for record in self.records("lines"):
+            line = data[record["offset"] :].split(b"\n", 1)[0].decode("utf-8")
+            self.assertIn(record["text"].split()[0], line)
+        offsets = [r["offset"] for r in self.records("lines")]
+        self.assertEqual(offsets[1], data.index(b"## 2."))
+
+    def test_records_follow_toc_options(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# Doc\n## Skip me <!-- omit from toc -->\n## Real\n### Child\n")
+        fields = ("level", "number", "text", "slug")
+        for options, expected in [
+            (
+                None,
+                [
+                    (1, "", "Doc", "doc"),
+                    (2, "", "Skip me <!-- omit from toc -->", ""),
+                    (2, "1.", "Real", "1-real"),
+                    (3, "1.1", "Child", "11-child"),
+                ],
+            ),
+            (
+                src.toc_options.TocOptions(max_depth=2, numbering="dotted"),
+                [
+                    (1, "", "Doc", "doc"),
+                    (2, "", "Skip me <!-- omit from toc -->", ""),
+                    (2, "1.", "Real", "1-real"),
+                    (3, "", "Child", ""),
+                ],
+            ),
+        ]:
+            records = src.heading_table.heading_records(
+                self.path, toc_options=options
+            )
+            self.assertEqual(
+                [tuple(record[field] for field in fields) for record in records],
+                expected,
+            )
+
+        # The same numbers and anchors as the file indexed in place
+        options = src.toc_options.TocOptions(numbering="roman")
+        records = list(
+            src.heading_table.heading_records(self.path, toc_options=options)
+        )
+        src.index_markdown.index_file_in_place(self.path, toc_options=options)
+        with open(self.path, "r", encoding="utf-8") as f:
+            indexed = f.read()
+        self.assertIn("## I. Real\n", indexed)
+        self.assertIn("(#i-real)", indexed)
+        self.assertEqual((records[2]["number"], records[2]["slug"]), ("I.", "i-real"))
+        reindexed = src.heading_table.heading_records(self.path, toc_options=options)
+        self.assertEqual(
+            [tuple(record[field] for field in fields) for record in reindexed],
+            [tuple(record[field] for field in fields) for record in records],
+        )
+
+    def test_formats_and_errors(self):
+        missing = os.path.join(self.tmp.name, "missing.md")
+        outputs = {}
+        for format in src.heading_table.FORMATS:
+            output = io.StringIO()
+            summary = src.heading_table.write_heading_table(
+                [self.path, missing], output, format
+            )
+            self.assertEqual(summary["files"], 1)
+            self.assertEqual(summary["headings"], 4)
+            self.assertEqual(summary["errors"][0][0], missing)
+            outputs[format] = output.getvalue()
+        ndjson = [json.loads(line) for line in outputs["ndjson"].splitlines()]
+        self.assertEqual(json.loads(outputs["json"]), ndjson)
+        self.assertEqual(ndjson, self.records("lines"))
+
+        output = io.StringIO()
+        src.heading_table.write_heading_table([], output, "json")
+        self.assertEqual(json.loads(output.getvalue()), [])
+
+    def test_cli_headings(self):
+        cmd = [sys.executable, "markdown-indexer.py", "headings", self.path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[1])["slug"], "1-install")
+
+        # Paths from stdin, with the TocOptions flags shared by the subcommands
+        cmd = [sys.executable, "markdown-indexer.py", "headings", "--files-from", "-"]
+        result = subprocess.run(
+            cmd + ["--numbering", "dotted"],
+            input=self.path,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[3])["number"], "2.1.")
+        result = subprocess.run(
+            cmd + ["--min-depth", "3", "--max-depth", "2"],
+            input=self.path,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("Invalid depth range", result.stderr)
+        result = subprocess.run(cmd[:3], capture_output=True, text=True)
+        self.assertIn("required: paths", result.stderr)
+
+
+
+class TestHeadingStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.guide = os.path.join(self.tmp.name, "guide.md")
+        self.other = os.path.join(self.tmp.name, "other.md")
+        with open(self.guide, "w", encoding="utf-8") as f:
+            f.write("# Guide\n## Install\ntext\n### 100% Linux\n## Usage\nend")
+        with open(self.other, "w", encoding="utf-8") as f:
+            f.write("# Other\n## Install notes\n")
+        self.store = src.heading_store.HeadingStore(
+            os.path.join(self.tmp.name, "store.sqlite3")
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_update_is_incremental(self):
+        summary = self.store.update([self.guide, self.other], workers=1)
+        self.assertEqual((summary["scanned"], summary["headings"]), (2, 6))
+        summary = self.store.update([self.guide, self.other], workers=1)
+        self.assertEqual(summary["scanned"], 0)
+
+        with open(self.other, "a", encoding="utf-8") as f:
+            f.write("## More\n")
+        summary = self.store.update([self.guide, self.other], workers=1)
+        self.assertEqual((summary["scanned"], summary["headings"]), (1, 3))
+
+        os.remove(self.other)
+        self.assertEqual(self.store.remove_missing(), 1)
+        self.assertEqual(self.store.find_files(), [os.path.relpath(self.guide)])
+
+    def test_other_toc_options_rescan(self):
+        self.store.update([self.guide], workers=1)
+        self.store.close()
+        options = src.toc_options.TocOptions(max_depth=2, numbering="roman")
+        self.store = src.heading_store.HeadingStore(
+            os.path.join(self.tmp.name, "store.sqlite3"), toc_options=options
+        )
+        self.assertFalse(self.store.is_current(self.guide))
+        summary = self.store.update([self.guide], workers=1)
+        self.assertEqual(summary["scanned"], 1)
+        numbers = [(r["number"], r["slug"]) for r in self.store.find(path=self.guide)]
+        self.assertEqual(
+            numbers, [("", "guide"), ("I.", "i-install"), ("", ""), ("II.", "ii-usage")]
+        )
+
+    def test_section_ranges(self):
+        self.store.update([self.guide], workers=1)
+        with open(self.guide, "rb") as f:
+            data = f.read()
+        install = self.store.section(self.guide, "1")
+        self.assertEqual((install["line"], install["end_line"]), (2, 4))
+        self.assertEqual(
+            data[install["offset"] : install["end"]],
+            b"## Install\ntext\n### 100% Linux\n",
+        )
+        usage = self.store.section(self.guide, "2-usage")
+        self.assertEqual((usage["line"], usage["end_line"]), (5, 6))
+        self.assertEqual(usage["end"], len(data))
+        title = self.store.find(level=1)[0]
+        self.assertEqual((title["end_line"], title["end"]), (6, len(data)))
+        self.assertIsNone(self.store.section(self.guide, "9"))
+
+    def test_find(self):
+        self.store.update([self.guide, self.other], workers=1)
+        texts = [record["text"] for record in self.store.find(text="install*")]
+        self.assertEqual(texts, ["Install", "Install notes"])
+        self.assertEqual(self.store.find(text="INSTALL")[0]["text"], "Install")
+        self.assertEqual(self.store.find(text="100% *")[0]["number"], "1.1")
+        self.assertEqual(self.store.find(text="1000*"), [])
+        self.assertEqual(
+            self.store.find_files(slug="1-install-notes"), [os.path.relpath(self.other)]
+        )
+        self.assertEqual(len(self.store.find(path=self.guide, limit=2)), 2)
+
+    def test_cli_store_and_query(self):
+        database = os.path.join(self.tmp.name, "cli.sqlite3")
+        cmd = [sys.executable, "markdown-indexer.py"]
+        result = subprocess.run(
+            cmd + ["store", self.tmp.name, "--store", database, "-j", "1"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("(2 files, 2 scanned, 0 removed, 0 failed)", result.stdout)
+
+        query = cmd + ["query", "--store", database]
+        result = subprocess.run(
+            query + ["--path", self.guide, "--section", "1.1"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(json.loads(result.stdout)["text"], "100% Linux")
+        result = subprocess.run(query + ["nothing"], capture_output=True, text=True)
+        self.assertEqual((result.returncode, result.stdout), (1, ""))
+
+
+class TestSections(unittest.TestCase):
+    TEXT = (
+        "---\ntitle: Guide\n---\n# Guide\n## Install\ntext\n### Linux *\n"
+        "```\n## Not a heading\n```\n## Usage\nend"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "guide.md")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(self.TEXT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def extract(self, heading, store=None):
+        output = io.BytesIO()
+        record = src.sections.extract_section(self.path, heading, output, store=store)
+        return record, output.getvalue()
+
+    def test_extract_by_number_and_slug(self):
+        record, data = self.extract("1")
+        self.assertEqual(
+            data, b"## Install\ntext\n### Linux *\n```\n## Not a heading\n```\n"
+        )
+        self.assertEqual(record["text"], "Install")
+        self.assertEqual(self.extract("1.1.")[1], self.extract("11-linux")[1])
+        self.assertTrue(self.extract("1.1")[1].startswith(b"### Linux *\n"))
+        self.assertEqual(self.extract("2-usage")[1], b"## Usage\nend")
+        self.assertEqual(self.extract("9"), (None, b""))
+
+    def test_extract_from_store(self):
+        with src.heading_store.HeadingStore(
+            os.path.join(self.tmp.name, "store.sqlite3")
+        ) as store:
+            store.update([self.path], workers=1)
+            with patch("src.sections.heading_records") as scan:
+                record, data = self.extract("2", store)
+            scan.assert_not_called()
+        self.assertEqual((record["line"], data), (11, b"## Usage\nend"))
+
+    def test_extract_follows_toc_options(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# Doc\n## Skip me <!-- omit from toc -->\n## Real\n### Child\n")
+        record, data = self.extract("1.")
+        self.assertEqual(data, b"## Real\n### Child\n")
+        self.assertEqual(self.extract("1-real")[1], data)
+        self.assertIsNone(self.extract("2.")[0])
+
+        # A store built with other options is not used
+        options = src.toc_options.TocOptions(numbering="roman")
+        with src.heading_store.HeadingStore(
+            os.path.join(self.tmp.name, "store.sqlite3")
+        ) as store:
+            store.update([self.path], workers=1)
+            output = io.BytesIO()
+            record = src.sections.extract_section(
+                self.path, "ia-child", output, store=store, toc_options=options
+            )
+        self.assertEqual((record["number"], output.getvalue()), ("I.A", b"### Child\n"))
+
+    def test_cli_toc_options(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# Doc\n## Skip me <!-- omit from toc -->\n## Real\n### Child\n")
+        cmd = [sys.executable, "markdown-indexer.py"]
+        result = subprocess.run(
+            cmd + ["extract", self.path, "I", "--numbering", "roman"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "## Real\n### Child\n")
+        result = subprocess.run(
+            cmd + ["extract", self.path, "1.1", "--max-depth", "2"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 1)
+
+        result = subprocess.run(
+            cmd + ["split", self.path, "--numbering", "dotted", "--level", "3"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        names = sorted(os.listdir(os.path.join(self.tmp.name, "guide-split")))
+        self.assertEqual(
+            names, ["01-doc.md", "02-section.md", "03-1-real.md", "04-11-child.md"]
+        )
+
+    def test_extract_keeps_bom(self):
+        with open(self.path, "w", encoding="utf-16") as f:
+            f.write(self.TEXT)
+        self.assertEqual(self.extract("2")[1], "## Usage\nend".encode("utf-16"))
+
+    def test_split_parts_add_up_to_file(self):
+        result = src.sections.split_file(self.path)
+        self.assertIsNone(result["error"])
+        self.assertEqual(result["output"], os.path.join(self.tmp.name, "guide-split"))
+        names = [os.path.basename(part) for part in result["parts"]]
+        self.assertEqual(
+            names, ["00-preamble.md", "01-guide.md", "02-1-install.md", "03-2-usage.md"]
+        )
+        data = b""
+        for part in result["parts"]:
+            with open(part, "rb") as f:
+                data += f.read()
+        self.assertEqual(data, self.TEXT.encode("utf-8"))
+
+        parts = src.sections.split_file(self.path, level=1)["parts"]
+        self.assertEqual(len(parts), 2)
+
+    def test_part_name(self):
+        self.assertEqual(src.sections.part_name("1.1-linux-*"), "1-1-linux")
+        self.assertEqual(src.sections.part_name("../.."), "section")
+
+    def test_cli(self):
+        cmd = [sys.executable, "markdown-indexer.py"]
+        result = subprocess.run(
+            cmd + ["extract", self.path, "2", "3"], capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, "## Usage\nend")
+        self.assertIn("No heading '3'", result.stderr)
+
+        missing = os.path.join(self.tmp.name, "missing.md")
+        result = subprocess.run(
+            cmd + ["split", self.path, missing, "-j", "1"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("(4 parts)", result.stdout)
+        self.assertIn("Split 1 of 2 files, 1 failed.", result.stdout)
+        self.assertIn(f"Failed: {missing}", result.stderr)
+
+
+class TestTocOptions(unittest.TestCase):
+    TEXT = (
+        "# Title\n## Contents <!-- omit from toc -->\n## Intro\n### Setup\n"
+        "#### Detail\n## Usage\n### Run\n"
+    )
+
+    def test_depth_range(self):
+        options = src.toc_options.TocOptions(min_depth=2, max_depth=3)
+        output = io.StringIO()
+        headers = src.index_markdown.index_lines(
+            io.StringIO(self.TEXT), output, toc_options=options
+        )
+        # Excluded headings are never collected, and are left as they are
+        texts = [h.header_text for h in headers]
+        self.assertEqual(texts, ["Intro", "Setup", "Usage", "Run"])
+        result = output.getvalue()
+        self.assertIn("\n- [1. Intro](#1-intro)\n  - [1.1 Setup](#11-setup)\n", result)
+        self.assertIn("\n# Title\n", "\n" + result)
+        self.assertIn("\n## Contents <!-- omit from toc -->\n", result)
+        self.assertIn("\n#### Detail\n", result)
+        self.assertNotIn("[Title]", result)
+        self.assertNotIn("Contents]", result)
+
+    def test_numbering_and_start_level(self):
+        options = src.toc_options.TocOptions(start_level=3, numbering="roman")
+        result = src.index_markdown.index_text(self.TEXT, toc_options=options)
+        self.assertIn("\n  - [Intro](#intro)\n    - [I. Setup](#i-setup)\n", result)
+        self.assertIn("\n#### I.A Detail\n", result)
+        self.assertIn("\n### II. Run\n", result)
+
+    def test_reindex_with_options(self):
+        for numbering in src.header_numarator.NUMBERING_STYLES:
+            options = src.toc_options.TocOptions(1, 4, 1, numbering)
+            once = src.index_markdown.index_text(
+                self.TEXT, reindex=True, toc_options=options
+            )
+            twice = src.index_markdown.index_text(
+                once, reindex=True, toc_options=options
+            )
+            self.assertEqual(twice, once)
+
+    def test_engines_agree(self):
+        options = src.toc_options.TocOptions(2, 3, numbering="dotted")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.TEXT)
+            outputs = []
+            for engine in src.parse_markdown_headers.ENGINES:
+                output = os.path.join(tmp, f"{engine}.md")
+                src.index_markdown.index_file(
+                    path, output, engine, toc_options=options
+                )
+                with open(output, "r", encoding="utf-8") as f:
+                    outputs.append(f.read())
+            self.assertEqual(outputs.count(outputs[0]), len(outputs))
+
+    def test_excluded_setext_title(self):
+        # The index goes after the underline of a title left out of it
+        cases = [
+            ("Title\n=====\n\nBody\n## A\n", src.toc_options.TocOptions(2)),
+            ("Title <!-- omit from toc -->\n=====\n\nBody\n## A\n", None),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            for text, options in cases:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                title = text[: text.index("\n\n") + 1]
+                expected = title + "\n  - [1. A](#1-a)\n\nBody\n## 1. A\n"
+                if options:
+                    expected = expected.replace("  - [", "- [")
+                for engine in src.parse_markdown_headers.ENGINES:
+                    output = os.path.join(tmp, f"{engine}.md")
+                    src.index_markdown.index_file(
+                        path, output, engine, toc_options=options
+                    )
+                    with open(output, "r", encoding="utf-8") as f:
+                        self.assertEqual(f.read(), expected, engine)
+                    data, _ = src.index_markdown.index_bytes(
+                        text.encode("utf-8"), engine, toc_options=options
+                    )
+                    self.assertEqual(data.decode("utf-8"), expected, engine)
+
+    def test_invalid_options(self):
+        for args in ((3, 2), (0, 6), (1, 7), (1, 6, 0), (1, 6, 2, "greek")):
+            with self.assertRaises(ValueError):
+                src.toc_options.TocOptions(*args)
+        self.assertEqual(
+            src.toc_options.TocOptions(), src.toc_options.DEFAULT_TOC_OPTIONS
+        )
+
+    def test_cli_options(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.TEXT)
+            cmd = [sys.executable, "markdown-indexer.py", "-i", path]
+            options = ["--max-depth", "2", "--numbering", "none"]
+            result = subprocess.run(cmd + options, capture_output=True, text=True)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            self.assertIn("\n- [Title](#title)\n  - [Intro](#intro)\n", text)
+            self.assertIn("\n### Setup\n", text)
+
+            result = subprocess.run(
+                cmd + ["--min-depth", "3", "--max-depth", "2"],
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(result.returncode, 2)
+            self.assertIn("Invalid depth range", result.stderr)
+
+
+class TestCharset(unittest.TestCase):
+    TEXT = "# Título\nIntro é\n## Café\n```\n# Não\n```\nSetext ñ\n---\n"
+    INDEXED = (
+        "# Título\n\n- [Título](#título)\n  - [1. Café](#1-café)\n"
+        "  - [2. Setext ñ](#2-setext-ñ)\nIntro é\n## 1. Café\n```\n# Não\n```\n"
+        "## 2. Setext ñ\n"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_sniff_charset(self):
+        sniff = src.charset.sniff_charset
+        self.assertEqual(sniff(b"# T\xc3\xadtulo\n"), src.charset.Charset(guessed=True))
+        self.assertEqual(sniff(b"\xef\xbb\xbf# T\n").encoding, "utf-8")
+        self.assertEqual(sniff(b"\xef\xbb\xbf# T\n").bom, b"\xef\xbb\xbf")
+        self.assertEqual(sniff(b"\xff\xfe#\x00").encoding, "utf-16-le")
+        self.assertEqual(sniff(b"\xff\xfe\x00\x00#\x00\x00\x00").encoding, "utf-32-le")
+        self.assertEqual(sniff(self.TEXT.encode("utf-16-be")).encoding, "utf-16-be")
+        self.assertEqual(sniff(self.TEXT.encode("utf-16-le")).encoding, "utf-16-le")
+        self.assertFalse(sniff(self.TEXT.encode("utf-16-le")).guessed)
+
+    def test_encodings(self):
+        cases = {
+            "latin-1": self.TEXT.encode("latin-1"),
+            "utf-8-sig": self.TEXT.encode("utf-8-sig"),
+            "utf-16": self.TEXT.encode("utf-16"),
+            "utf-16-be": self.TEXT.encode("utf-16-be"),
+        }
+        for encoding, data in cases.items():
+            path = self.write("doc.md", data)
+            for engine in src.parse_markdown_headers.ENGINES:
+                headings = src.parse_markdown_headers.parse_markdown_headers(
+                    path, engine
+                )
+                self.assertEqual(
+                    [h.header_text for h in headings], ["Título", "Café", "Setext ñ"]
+                )
+                output = os.path.join(self.tmp.name, "out.md")
+                src.index_markdown.index_file(path, output, engine)
+                with open(output, "rb") as f:
+                    # The byte order mark is kept, and the encoding too
+                    self.assertEqual(f.read(), self.INDEXED.encode(encoding))
+
+    def test_first_line_after_byte_order_mark(self):
+        path = self.write("doc.md", "Setext\n---\n---\n# T\n".encode("utf-8-sig"))
+        for engine in src.parse_markdown_headers.ENGINES:
+            headings = src.parse_markdown_headers.parse_markdown_headers(path, engine)
+            self.assertEqual([h.header_text for h in headings], ["Setext", "T"])
+
+    def test_only_headings_are_decoded(self):
+        # Valid UTF-8 headings over a Latin-1 body: the body is copied as is
+        data = "# Título\n## Café\n".encode("utf-8") + b"caf\xe9 \xff\n"
+        path = self.write("doc.md", data)
+        expected = (
+            "# Título\n\n- [Título](#título)\n  - [1. Café](#1-café)\n"
+            "## 1. Café\n".encode("utf-8") + b"caf\xe9 \xff\n"
+        )
+        for engine in src.parse_markdown_headers.ENGINES:
+            output = os.path.join(self.tmp.name, f"{engine}.md")
+            src.index_markdown.index_file(path, output, engine)
+            with open(output, "rb") as f:
+                self.assertEqual(f.read(), expected)
+        destination = io.BytesIO()
+        src.index_stream(io.BytesIO(data), destination)
+        self.assertEqual(destination.getvalue(), expected)
+
+    def test_fallback_after_utf8_headings(self):
+        # The first heading is valid UTF-8, the second is not: Latin-1 for all
+        data = "# Título\n".encode("utf-8") + b"## Caf\xe9\n"
+        path = self.write("doc.md", data)
+        outputs = []
+        for engine in src.parse_markdown_headers.ENGINES:
+            output = os.path.join(self.tmp.name, f"{engine}.md")
+            headers = src.index_markdown.index_file(path, output, engine)
+            self.assertEqual(headers[0].header_text, "TÃ\xadtulo")
+            with open(output, "rb") as f:
+                outputs.append(f.read())
+        destination = io.BytesIO()
+        src.index_stream(io.BytesIO(data), destination)
+        outputs.append(destination.getvalue())
+        self.assertEqual(outputs.count(outputs[0]), len(outputs))
+        self.assertEqual(
+            outputs[0].decode("latin-1"),
+            src.index_text(data.decode("latin-1")),
+        )
+
+    def test_in_place_and_incremental(self):
+        data = self.TEXT.encode("latin-1")
+        path = self.write("doc.md", data)
+        self.assertTrue(src.index_markdown.index_file_in_place(path)[1])
+        with open(path, "rb") as f:
+            expected = f.read()
+        self.assertFalse(src.index_markdown.index_file_in_place(path)[1])
+
+        path = self.write("other.md", data)
+        incremental = src.incremental_index.index_file_incremental
+        self.assertTrue(incremental(path)[1])
+        self.assertFalse(incremental(path)[1])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), expected)
+        self.assertFalse(os.path.exists(src.incremental_index.sidecar_path(path)))
+
+    def test_heading_table_offsets(self):
+        data = self.TEXT.encode("utf-8-sig")
+        path = self.write("doc.md", data)
+        for engine in src.parse_markdown_headers.ENGINES:
+            records = list(src.heading_table.heading_records(path, engine))
+            self.assertEqual([r["offset"] for r in records], [3, 22, 46])
+            self.assertTrue(data[records[1]["offset"] :].startswith(b"## Caf"))
+
+    def test_decode_errors_are_reported(self):
+        bad = self.write("bad.md", b"\xef\xbb\xbf# Title\n## \xff\n")
+        good = self.write("good.md", self.TEXT.encode("latin-1"))
+        results = src.batch_index.batch_index([bad, good], workers=1)
+        self.assertIn("codec can't decode", results[0]["error"])
+        self.assertIsNone(results[1]["error"])
+        self.assertEqual(results[1]["headers"], 3)
+
+        result = subprocess.run(
+            [sys.executable, "markdown-indexer.py", bad],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Cannot decode", result.stderr)
+
+
+class TestIncrementalIndex(unittest.TestCase):
+    SECTION = "## Part\n\nSome text.\n\n```\n# not a heading\n```\n\n### Detail\n\n"
+    EDITS = (
+        ("Some text.", "Edited text."),
+        ("Some text.", "Setext\n---"),
+        ("```\n#", "```\n```\n#"),
+        ("Detail\n", "Detail\n\n## Inserted\n"),
+        ("## ", ""),
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.full = os.path.join(self.tmp.name, "full.md")
+        self.path = os.path.join(self.tmp.name, "doc.md")
+        text = "---\ntitle: x\n---\n# Title\n" + self.SECTION * 40
+        for path in (self.full, self.path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        # Small blocks, so that edits leave unchanged blocks around them
+        patcher = patch.object(src.incremental_index, "BLOCK_SIZE", 64)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def edit(self, old, new, position=0.5):
+        for path in (self.full, self.path):
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            start = text.index(old, int(len(text) * position))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text[:start] + new + text[start + len(old) :])
+
+    def test_matches_full_reindex(self):
+        src.index_markdown.index_file_in_place(self.full)
+        src.incremental_index.index_file_incremental(self.path)
+        self.assertEqual(self.read(self.path), self.read(self.full))
+        for position in (0.1, 0.5, 0.9):
+            for old, new in self.EDITS:
+                self.edit(old, new, position)
+                full_headers, _ = src.index_markdown.index_file_in_place(self.full)
+                headers, _ = src.incremental_index.index_file_incremental(self.path)
+                self.assertEqual(self.read(self.path), self.read(self.full))
+                self.assertEqual(
+                    [h.header_number for h in headers],
+                    [h.header_number for h in full_headers],
+                )
+
+    def test_rescans_only_the_change(self):
+        src.index_markdown.index_file_in_place(self.full)
+        src.incremental_index.index_file_incremental(self.path)
+        before = self.read(self.path)
+        self.edit("Some text.", "Edited text.")
+        profiler = src.profiling.Profiler()
+        _, changed = src.incremental_index.index_file_incremental(
+            self.path, profiler=profiler
+        )
+        self.assertFalse(changed)
+        self.assertLess(profiler.records[0]["lines"], 20)
+        self.assertEqual(len(self.read(self.path)), len(before) + 2)
+
+        # A new heading renumbers the following ones, and only rewrites them
+        self.edit("Detail\n", "Detail\n\n## Inserted\n", 0.9)
+        _, changed = src.incremental_index.index_file_incremental(self.path)
+        self.assertTrue(changed)
+        src.index_markdown.index_file_in_place(self.full)
+        self.assertEqual(self.read(self.path), self.read(self.full))
+
+    def test_unusable_sidecar(self):
+        sidecar = src.incremental_index.sidecar_path(self.path)
+        self.assertEqual(os.path.basename(sidecar), ".doc.md.toc.json")
+        src.index_markdown.index_file_in_place(self.full)
+        for content in ("not json", "[]", '{"key": null}'):
+            with open(sidecar, "w", encoding="utf-8") as f:
+                f.write(content)
+            src.incremental_index.index_file_incremental(self.path)
+            self.assertEqual(self.read(self.path), self.read(self.full))
+        # A sidecar written with another slug style is ignored
+        src.incremental_index.index_file_incremental(self.path, "github")
+        self.assertIsNone(src.incremental_index.load_sidecar(self.path, "default"))
+        self.assertIsNotNone(src.incremental_index.load_sidecar(self.path, "github"))
+
+    def test_toc_options(self):
+        options = src.toc_options.TocOptions(1, 2, 2, "roman")
+        src.index_markdown.index_file_in_place(self.full, toc_options=options)
+        src.incremental_index.index_file_incremental(self.path, toc_options=options)
+        self.assertEqual(self.read(self.path), self.read(self.full))
+        self.assertIsNone(src.incremental_index.load_sidecar(self.path))
+        for old, new in self.EDITS:
+            self.edit(old, new, 0.3)
+            src.index_markdown.index_file_in_place(self.full, toc_options=options)
+            src.incremental_index.index_file_incremental(
+                self.path, toc_options=options
+            )
+            self.assertEqual(self.read(self.path), self.read(self.full))
+
+    def test_cli_incremental(self):
+        cmd = [sys.executable, "markdown-indexer.py", "--incremental", self.path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("--incremental requires --in-place", result.stderr)
+
+        result = subprocess.run(cmd + ["-i"], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Updated", result.stdout)
+        self.assertTrue(os.path.exists(src.incremental_index.sidecar_path(self.path)))
+        result = subprocess.run(cmd + ["-i"], capture_output=True, text=True)
+        self.assertIn("Up to date", result.stdout)
+
+class TestIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.doc = os.path.join(self.tmp.name, "doc.md")
+        self.out = os.path.join(self.tmp.name, "doc-indexed.md")
+        self.write_doc("# Doc\n## Part\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_doc(self, content):
+        with open(self.doc, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def run_batch(self, options=None):
+        with src.index_cache.IndexCache(self.cache_dir, options) as cache:
+            results = src.batch_index.batch_index([self.doc], cache=cache)
+            cache.evict_missing()
+        return results[0], cache.stats
+
+    def test_warm_run_is_a_hit(self):
+        first, stats = self.run_batch()
+        self.assertFalse(first["cached"])
+        self.assertEqual(stats["misses"], 1)
+        second, stats = self.run_batch()
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["headers"], 2)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_touched_but_unchanged_is_a_hit(self):
+        self.run_batch()
+        stat = os.stat(self.doc)
+        os.utime(self.doc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        result, _ = self.run_batch()
+        self.assertTrue(result["cached"])
+
+    def test_changes_invalidate(self):
+        self.run_batch()
+        self.write_doc("# Doc\n## Part\n## More\n")
+        result, _ = self.run_batch()
+        self.assertFalse(result["cached"])
+        self.assertEqual(result["headers"], 3)
+
+        # Options and deleted outputs also force a re-index
+        result, _ = self.run_batch(options={"other": True})
+        self.assertFalse(result["cached"])
+        os.remove(self.out)
+        result, _ = self.run_batch(options={"other": True})
+        self.assertFalse(result["cached"])
+
+    def test_evicts_deleted_inputs(self):
+        self.run_batch()
+        os.remove(self.doc)
+        with src.index_cache.IndexCache(self.cache_dir) as cache:
+            self.assertEqual(cache.evict_missing(), 1)
+            self.assertEqual(cache.stats["evictions"], 1)
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.doc = os.path.join(self.tmp.name, "doc.md")
+        self.write("# Doc\n## Part\n", mtime=1)
+        self.now = 0.0
+        self.indexed = []
+
+        def index(path):
+            self.indexed.append(path)
+            return src.batch_index.index_one(path, in_place=True)
+
+        self.watcher = src.watch_index.Watcher(
+            [self.tmp.name], index, debounce=0.5, clock=lambda: self.now
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, content, mtime):
+        with open(self.doc, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.utime(self.doc, ns=(mtime, mtime))
+
+    def test_indexes_on_start_after_debounce(self):
+        self.assertEqual(self.watcher.poll(), [])
+        self.now = 0.5
+        results = self.watcher.poll()
+        self.assertEqual(self.indexed, [self.doc])
+        self.assertTrue(results[0]["changed"])
+        self.assertIn("seconds", results[0])
+
+        # The in-place write is not picked up as a new change
+        self.now = 2.0
+        self.assertEqual(self.watcher.poll(), [])
+        self.assertEqual(len(self.indexed), 1)
+
+    def test_debounces_bursts(self):
+        self.watcher.poll()
+        self.now = 0.5
+        self.watcher.poll()
+
+        for step, mtime in enumerate([10, 20, 30], start=1):
+            self.write(f"# Doc\n## Part {step}\n", mtime)
+            self.now = 0.5 + step * 0.3
+            self.assertEqual(self.watcher.poll(), [])
+
+        self.now += 0.5
+        results = self.watcher.poll()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(self.indexed), 2)
+        with open(self.doc, "r", encoding="utf-8") as f:
+            self.assertIn("## 1. Part 3", f.read())
+
+    def test_save_during_indexing_is_picked_up(self):
+        for in_place in (True, False):
+            saves = ["# Doc\n## Saved\n"]
+
+            def index(path):
+                result = src.batch_index.index_one(path, in_place=in_place)
+                if saves:
+                    # A save lands while the file is being indexed
+                    self.write(saves.pop(), mtime=50)
+                self.indexed.append(path)
+                return result
+
+            self.write("# Doc\n## Part\n", mtime=1)
+            self.indexed = []
+            self.now = 0.0
+            watcher = src.watch_index.Watcher(
+                [self.tmp.name], index, debounce=0.5, clock=lambda: self.now
+            )
+            watcher.poll()
+            self.now = 0.5
+            watcher.poll()
+            self.now = 1.0
+            self.assertEqual(watcher.poll(), [])
+            self.now = 1.5
+            self.assertEqual(len(watcher.poll()), 1)
+            self.assertEqual(len(self.indexed), 2)
+            self.now = 3.0
+            self.assertEqual(watcher.poll(), [])
+
+
+class TestSlugger(unittest.TestCase):
+    def test_styles(self):
+        slugify = src.slugger.slugify
+        text = "1.2 Foo -- Bar_baz (v2)!"
+        self.assertEqual(slugify(text, "default"), "12-foo-bar_baz-v2")
+        self.assertEqual(slugify(text, "github"), "12-foo----bar_baz-v2")
+        self.assertEqual(slugify(text, "gitlab"), "12-foo-bar_baz-v2")
+        self.assertEqual(slugify(text, "commonmark"), "1.2-foo----bar_baz-(v2)!")
+        self.assertEqual(slugify("***", "default"), "header")
+        self.assertEqual(slugify("***", "gitlab"), "")
+
+    def test_non_ascii_matches_regex_rules(self):
+        slugify = src.slugger.slugify
+        self.assertEqual(slugify("Über – Größe!", "default"), "über-größe")
+        self.assertEqual(slugify("Über – Größe!", "github"), "über--größe")
+        self.assertEqual(
+            slugify("Çağatay's Notes", "commonmark"), "%C3%A7a%C4%9Fatay's-notes"
+        )
+
+    def test_deduplication(self):
+        slugger = src.slugger.Slugger("github")
+        texts = ["Usage", "Usage", "Usage-1", "Usage"]
+        slugs = [slugger.slug(text) for text in texts]
+        self.assertEqual(slugs, ["usage", "usage-1", "usage-1-1", "usage-2"])
+        slugger.reset()
+        self.assertEqual(slugger.slug("Usage"), "usage")
+
+    def test_unknown_style(self):
+        with self.assertRaises(ValueError):
+            src.slugger.Slugger("bitbucket")
+
+    def test_index_deduplicates_anchors(self):
+        headers = [
+            {"header_level": 1, "header_number": "", "header_text": "Usage"},
+            {"header_level": 1, "header_number": "", "header_text": "Usage"},
+        ]
+        result = src.create_index.create_index(headers, "github")
+        self.assertEqual(result, ["- [Usage](#usage)", "- [Usage](#usage-1)"])
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.files = []
+        for name, text in [("a.md", "# Title\n## One\n## Two\n"), ("b.md", "x\n")]:
+            path = os.path.join(self.root, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_index_file_stages(self):
+        seen = []
+        profiler = src.profiling.Profiler(hooks=[seen.append])
+        output = os.path.join(self.root, "out.md")
+        src.index_markdown.index_file(self.files[0], output, profiler=profiler)
+        self.assertEqual(seen, profiler.records)
+        stages = {record["stage"]: record for record in profiler.records}
+        self.assertEqual(list(stages), ["scan", "index", "write"])
+        self.assertEqual(stages["scan"]["lines"], 3)
+        self.assertEqual(stages["scan"]["headings"], 3)
+        self.assertEqual(stages["scan"]["bytes_read"], os.path.getsize(self.files[0]))
+        self.assertEqual(stages["write"]["bytes_written"], os.path.getsize(output))
+
+    def test_stage_memory_growth(self):
+        profiler = src.profiling.Profiler()
+        # The process peak only grows: a later, lighter stage reports no growth
+        peaks = [100.0, 150.0, 150.0, 150.0]
+        with patch.object(src.profiling, "peak_rss_mb", side_effect=peaks):
+            with profiler.stage("scan"):
+                pass
+            with profiler.stage("write"):
+                pass
+        growth = [record["rss_growth_mb"] for record in profiler.records]
+        self.assertEqual(growth, [50.0, 0.0])
+        totals = src.profiling.summarize(profiler.records)
+        self.assertEqual(totals["scan"]["rss_growth_mb"], 50.0)
+
+    def test_mmap_stages(self):
+        profiler = src.profiling.Profiler()
+        output = os.path.join(self.root, "out.md")
+        src.index_markdown.index_file(
+            self.files[0], output, engine="mmap", profiler=profiler
+        )
+        stages = [record["stage"] for record in profiler.records]
+        self.assertEqual(stages, ["scan", "number", "rewrite", "index", "write"])
+        self.assertEqual(profiler.records[0]["lines"], 3)
+
+    def test_batch_aggregates_workers(self):
+        profiler = src.profiling.Profiler()
+        results = src.batch_index.batch_index(self.files, workers=2, profiler=profiler)
+        self.assertNotIn("profile", results[0])
+        totals = src.profiling.summarize(profiler.records)
+        self.assertEqual(totals["scan"]["files"], 2)
+        self.assertEqual(totals["scan"]["lines"], 4)
+        self.assertEqual(totals["index"]["headings"], 3)
+        slowest = src.profiling.slowest_files(profiler.records, 1)
+        self.assertEqual(len(slowest), 1)
+        self.assertIn(slowest[0][0], self.files)
+
+    def test_cli_profile_json(self):
+        cmd = [sys.executable, "markdown-indexer.py", self.root, "--profile", "json"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        lines = [json.loads(line) for line in result.stderr.splitlines()]
+        totals = [line for line in lines if line["type"] == "total"]
+        self.assertEqual([line["stage"] for line in totals], ["scan", "index", "write"])
+        self.assertEqual(sum(line["type"] == "slowest" for line in lines), 2)
+
+
+class TestLibraryAPI(unittest.TestCase):
+    def test_package_exports(self):
+        self.assertIs(src.index_text, src.index_markdown.index_text)
+        self.assertIs(src.Indexer, src.indexer.Indexer)
+        with self.assertRaises(AttributeError):
+            src.no_such_name
+
+    def test_import_is_lazy(self):
+        code = (
+            "import sys, src, src.cli; "
+            "print(any(name in sys.modules for name in "
+            "('src.index_markdown', 'src.batch_index', 'concurrent.futures')))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_cli_constants_match(self):
+        self.assertEqual(src.cli.SLUG_STYLES, src.slugger.SLUG_STYLES)
+        self.assertEqual(src.cli.GLOB_CHARS, src.batch_index.GLOB_CHARS)
+        self.assertEqual(
+            src.cli.NUMBERING_STYLES, src.header_numarator.NUMBERING_STYLES
+        )
+
+    def test_index_stream_binary(self):
+        source = io.BytesIO("# Title\n## Café\n".encode("utf-8"))
+        destination = io.BytesIO()
+        headers = src.index_stream(source, destination)
+        self.assertEqual(len(headers), 2)
+        self.assertFalse(source.closed)
+        self.assertFalse(destination.closed)
+        self.assertEqual(
+            destination.getvalue().decode("utf-8"),
+            src.index_text("# Title\n## Café\n"),
+        )
+
+    def test_index_stream_text(self):
+        destination = io.StringIO()
+        src.index_stream(io.StringIO("# Title\n## Part\n"), destination)
+        self.assertIn("## 1. Part", destination.getvalue())
+
+    def test_indexer(self):
+        indexer = src.Indexer(slug_style="github", reindex=True)
+        once = indexer.index_text("# Title\n## A & B\n")
+        self.assertIn("(#1-a--b)", once)
+        self.assertEqual(indexer.index_text(once), once)
+        self.assertEqual(len(indexer.headings(once)), 2)
+
+    def test_indexer_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "doc.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# Title\n## Part\n")
+            headers = src.Indexer(engine="mmap").index_file(path)
+            self.assertEqual(len(headers), 2)
+            self.assertTrue(os.path.exists(os.path.join(tmp, "doc-indexed.md")))
+
+    def test_indexer_rejects_bad_options(self):
+        with self.assertRaises(ValueError):
+            src.Indexer(slug_style="nope")
+        with self.assertRaises(ValueError):
+            src.Indexer(engine="nope")
+        with self.assertRaises(ValueError):
+            src.Indexer(engine="mmap", reindex=True)
+        with self.assertRaises(ValueError):
+            src.Indexer(max_depth=0)
+
+
+class TestService(unittest.TestCase):
+    def serve(self, requests, **options):
+        stdin = io.BytesIO(b"".join(json.dumps(r).encode() + b"\n" for r in requests))
+        stdout = io.BytesIO()
+        service = src.service.IndexService(**options)
+        asyncio.run(src.service.serve_stdio(service, stdin, stdout))
+        lines = stdout.getvalue().decode().splitlines()
+        return {response["id"]: response for response in map(json.loads, lines)}
+
+    def test_percentiles(self):
+        stats = src.service.percentiles(range(1, 101))
+        self.assertEqual(stats, {"p50": 50, "p90": 90, "p99": 99, "max": 100})
+        self.assertIsNone(src.service.percentiles([])["p50"])
+
+    def test_small_and_large_documents(self):
+        small = {"id": "small", "text": "# Title\n## Part\n"}
+        large = {"id": "large", "text": "# Title\n" + "## Part\ntext\n" * 100}
+        responses = self.serve([small, large], workers=1, large_size=1000)
+        self.assertEqual(responses["small"]["text"], src.index_text(small["text"]))
+        self.assertEqual(responses["large"]["text"], src.index_text(large["text"]))
+        self.assertEqual(responses["large"]["headings"], 101)
+        self.assertIn("ms", responses["large"])
+
+    def test_errors_and_stats(self):
+        requests = [
+            {"id": 1, "text": 5},
+            {"id": 2, "text": "# T\n", "slug_style": "nope"},
+            {"id": 3, "text": "# T\n## A\n"},
+        ]
+        responses = self.serve(requests, workers=1)
+        self.assertIn("error", responses[1])
+        self.assertIn("nope", responses[2]["error"])
+        self.assertEqual(responses[3]["headings"], 2)
+
+        service = src.service.IndexService(workers=1)
+        stdin = io.BytesIO(b'not json\n{"id": "s", "op": "stats"}\n')
+        stdout = io.BytesIO()
+        asyncio.run(src.service.serve_stdio(service, stdin, stdout))
+        error, stats = map(json.loads, stdout.getvalue().splitlines())
+        self.assertIn("invalid JSON", error["error"])
+        self.assertEqual(stats["stats"]["failed"], 1)
+        self.assertEqual(stats["stats"]["queue_depth"], {"small": 0, "large": 0})
+
+    def serve_socket(self, requests, path=None):
+        async def client(server):
+            if path is None:
+                host, port = server.sockets[0].getsockname()[:2]
+                reader, writer = await asyncio.open_connection(host, port)
+            else:
+                reader, writer = await asyncio.open_unix_connection(path)
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b"\n")
+            writer.write_eof()
+            responses = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            return {response["id"]: response for response in responses}
+
+        async def run():
+            service = src.service.IndexService(workers=1, large_size=1000)
+            listening = asyncio.get_running_loop().create_future()
+            serving = asyncio.ensure_future(
+                src.service.serve_socket(
+                    service, path, port=0, ready=listening.set_result
+                )
+            )
+            responses = await client(await listening)
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+            return responses
+
+        return asyncio.run(run())
+
+    def test_socket(self):
+        response = self.serve_socket([{"id": 7, "text": "# T\n## A\n"}])[7]
+        self.assertEqual(response["headings"], 2)
+
+    def test_socket_slow_reader(self):
+        # Pipelined requests whose responses outgrow the socket buffers
+        text = "# T\n## Part\n" + "text " * 50000 + "\n"
+        requests = [{"id": i, "text": text} for i in range(40)]
+
+        async def run(path):
+            service = src.service.IndexService(workers=1, large_size=2**30)
+            listening = asyncio.get_running_loop().create_future()
+            serving = asyncio.ensure_future(
+                src.service.serve_socket(service, path, ready=listening.set_result)
+            )
+            await listening
+            reader, writer = await asyncio.open_unix_connection(path, limit=2**19)
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b"\n")
+            writer.write_eof()
+            await asyncio.sleep(0.5)
+            # Reading stopped until the client takes the responses
+            answered = service.completed
+            responses = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+            return answered, responses
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.object(src.service, "CONNECTION_WINDOW", 2):
+                answered, responses = asyncio.run(
+                    run(os.path.join(tmp, "service.sock"))
+                )
+        self.assertLess(answered, len(requests))
+        self.assertEqual(sorted(r["id"] for r in responses), list(range(40)))
+        self.assertEqual(responses[0]["text"], src.index_text(text))
+
+    def test_tcp_refuses_path_requests(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            doc = os.path.join(tmp, "doc.md")
+            with open(doc, "w", encoding="utf-8") as f:
+                f.write("# T\n## A\n")
+            requests = [
+                {"id": 1, "path": doc, "in_place": True},
+                # Large request lines are decoded in the process pool
+                {"id": 2, "path": doc, "in_place": True, "pad": "x" * 1000},
+            ]
+            responses = self.serve_socket(requests)
+            for response in responses.values():
+                self.assertIn("only accepted on stdin", response["error"])
+            with open(doc, "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), "# T\n## A\n")
+
+            # The Unix socket accepts them, and only its owner may connect
+            socket_path = os.path.join(tmp, "service.sock")
+            responses = self.serve_socket(requests[:1], socket_path)
+            self.assertTrue(responses[1]["changed"])
+
+    def test_socket_permissions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            socket_path = os.path.join(tmp, "service.sock")
+            modes = []
+            umask = os.umask(0o022)
+
+            async def run():
+                service = src.service.IndexService(workers=1)
+                serving = asyncio.ensure_future(
+                    src.service.serve_socket(
+                        service,
+                        socket_path,
+                        ready=lambda server: modes.append(os.stat(socket_path)),
+                    )
+                )
+                while not modes:
+                    await asyncio.sleep(0.01)
+                serving.cancel()
+                await asyncio.gather(serving, return_exceptions=True)
+
+            try:
+                asyncio.run(run())
+                # The socket is bound under a restrictive umask, then the
+                # process umask is restored
+                self.assertEqual(os.umask(0o022), 0o022)
+            finally:
+                os.umask(umask)
+            self.assertEqual(modes[0].st_mode & 0o777, src.service.SOCKET_MODE)
+
+    def test_path_requests(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            small = os.path.join(tmp, "small.md")
+            large = os.path.join(tmp, "large.md")
+            with open(small, "w", encoding="utf-8") as f:
+                f.write("# T\n## A\n")
+            with open(large, "w", encoding="utf-8") as f:
+                f.write("# T\n" + "## A\ntext\n" * 200)
+            requests = [
+                {"id": 1, "path": small, "in_place": True},
+                {"id": 2, "path": small, "in_place": True},
+                {"id": 3, "path": large, "slug_style": "github"},
+                {"id": 4, "path": os.path.join(tmp, "missing.md")},
+                {"id": 5, "path": 5},
+            ]
+            responses = self.serve(requests, workers=1, large_size=1000)
+            self.assertEqual(responses[1]["output"], small)
+            self.assertEqual(responses[1]["headings"], 2)
+            self.assertTrue(responses[1]["changed"])
+            self.assertFalse(responses[2]["changed"])
+            large_output = os.path.join(tmp, "large-indexed.md")
+            self.assertEqual(responses[3]["output"], large_output)
+            self.assertEqual(responses[3]["headings"], 201)
+            self.assertIn("error", responses[4])
+            self.assertIn("error", responses[5])
+
+    def test_cli_serve(self):
+        cmd = [sys.executable, "markdown-indexer.py", "serve", "-j", "1"]
+        request = json.dumps({"id": 1, "text": "# T\n## A\n"}) + "\n"
+        result = subprocess.run(cmd, input=request, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(json.loads(result.stdout)["headings"], 2)
+        self.assertIn("Served 1 documents", result.stderr)
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "doc.md")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("# T\n## A\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_simple_args(self):
+        args = src.cli.parse_simple_args(
+            ["-i", "--incremental", "--slug-style=github", self.path]
+        )
+        self.assertEqual(args.markdown_file, [self.path])
+        self.assertTrue(args.in_place and args.incremental)
+        self.assertEqual(args.slug_style, "github")
+        args = src.cli.parse_simple_args(["--slug-style", "gitlab", self.path])
+        self.assertEqual(args.slug_style, "gitlab")
+        self.assertFalse(args.in_place)
+
+        # Anything else is left to argparse
+        missing = os.path.join(self.tmp.name, "missing.md")
+        for argv in (
+            [self.path, "-o", "out.md"],
+            [self.path, self.path],
+            ["--incremental", self.path],
+            ["--slug-style", "nope", self.path],
+            ["--slug-style"],
+            [missing],
+            [self.tmp.name],
+            [os.path.join(self.tmp.name, "*.md")],
+        ):
+            self.assertIsNone(src.cli.parse_simple_args(argv), argv)
+
+    def test_fast_path_skips_argparse(self):
+        code = (
+            "import sys, src.cli; src.cli.main(['-i', sys.argv[1]]); "
+            "print('argparse' in sys.modules)"
+        )
+        cmd = [sys.executable, "-c", code, self.path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertEqual(lines, [f"Updated: {self.path}", "False"])
+
+    def test_client_args(self):
+        with patch.dict(os.environ, {src.client.SOCKET_ENV: "/tmp/env.sock"}):
+            parsed = src.client.parse_args(["-i", "--slug-style", "github", "a.md"])
+        socket_path, files, options, cli_argv = parsed
+        self.assertEqual(socket_path, "/tmp/env.sock")
+        self.assertEqual(files, ["a.md"])
+        self.assertEqual(options, {"in_place": True, "slug_style": "github"})
+        self.assertEqual(cli_argv, ["-i", "--slug-style", "github", "a.md"])
+        parsed = src.client.parse_args(["--socket=/tmp/s.sock", "a.md", "b.md"])
+        self.assertEqual(parsed[0], "/tmp/s.sock")
+        self.assertEqual(parsed[3], ["a.md", "b.md"])
+        for argv in ([], ["-o", "x.md", "a.md"], ["a.md", "--socket"]):
+            with self.assertRaises(ValueError):
+                src.client.parse_args(argv)
+
+    def test_client_falls_back_to_cli(self):
+        missing = os.path.join(self.tmp.name, "missing.sock")
+        output = io.StringIO()
+        with patch("sys.stdout", output):
+            src.client.main(["--socket", missing, "-i", self.path])
+        self.assertEqual(output.getvalue(), f"Updated: {self.path}\n")
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+    def test_client_with_service(self):
+        socket_path = os.path.join(self.tmp.name, "indexer.sock")
+        cmd = [
+            sys.executable,
+            "markdown-indexer.py",
+            "serve",
+            "--socket",
+            socket_path,
+            "-j",
+            "1",
+        ]
+        server = subprocess.Popen(cmd, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 10
+            while not os.path.exists(socket_path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            output = io.StringIO()
+            with patch("sys.stdout", output):
+                src.client.main(["--socket", socket_path, "-i", self.path])
+                src.client.main(["--socket", socket_path, "-i", self.path])
+            self.assertEqual(
+                output.getvalue().splitlines(),
+                [
+                    f"Updated: {self.path} (2 headings)",
+                    f"Up to date: {self.path} (2 headings)",
+                ],
+            )
+            missing = os.path.join(self.tmp.name, "missing.md")
+            with patch("sys.stderr", io.StringIO()) as errors:
+                with self.assertRaises(SystemExit) as exit:
+                    src.client.main(["--socket", socket_path, missing])
+            self.assertEqual(exit.exception.code, 1)
+            self.assertIn(f"Failed: {missing}", errors.getvalue())
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_corpus_is_deterministic(self):
+        from benchmarks.corpus import generate_corpus
+
+        with tempfile.TemporaryDirectory() as tmp:
+            contents = []
+            for run in ("a", "b"):
+                paths = generate_corpus("fences", os.path.join(tmp, run), 0.05)
+                with open(paths[0], "rb") as f:
+                    contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+        self.assertGreater(len(contents[0]), 50_000)
+
+    def test_compare_flags_regressions(self):
+        from benchmarks.compare import compare
+
+        baseline = {
+            "results": {"a/parse": {"seconds": 1.0}, "a/cli": {"seconds": 0.001}}
+        }
+        current = {
+            "results": {"a/parse": {"seconds": 1.2}, "a/cli": {"seconds": 0.01}}
+        }
+        rows = {row[0]: row for row in compare(baseline, current, 0.1, 0.005)}
+        self.assertTrue(rows["a/parse"][4])
+        self.assertFalse(rows["a/cli"][4])
+        rows = {row[0]: row for row in compare(baseline, current, 0.25)}
+        self.assertFalse(rows["a/parse"][4])
+
+        # A stage recorded at 0 seconds is noise, whatever min_seconds is
+        baseline["results"]["a/cli"]["seconds"] = 0.0
+        rows = {row[0]: row for row in compare(baseline, current, 0.1, 0)}
+        self.assertEqual(rows["a/cli"][3:], (0.0, False))
+
+
+class TestFilterMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "doc.md")
+        self.data = "\ufeff# Titre\r\n## \u00c9t\u00e9\r\ntext\r\n".encode("utf-8")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *args, data=b""):
+        cmd = [sys.executable, "markdown-indexer.py"] + list(args)
+        return subprocess.run(cmd, input=data, capture_output=True)
+
+    def test_stdin_to_stdout_matches_file_mode(self):
+        output = os.path.join(self.tmp.name, "out.md")
+        src.index_markdown.index_file(self.path, output)
+        result = self.run_cli("-", data=self.data)
+        self.assertEqual(result.returncode, 0)
+        with open(output, "rb") as f:
+            self.assertEqual(result.stdout, f.read())
+        self.assertTrue(result.stdout.startswith(b"\xef\xbb\xbf# Titre\n"))
+
+    def test_file_to_stdout(self):
+        output = os.path.join(self.tmp.name, "out.md")
+        src.index_markdown.index_file(self.path, output)
+        result = self.run_cli(self.path, "-o", "-")
+        self.assertEqual(result.returncode, 0)
+        with open(output, "rb") as f:
+            self.assertEqual(result.stdout, f.read())
+
+    def test_stdin_to_file(self):
+        output = os.path.join(self.tmp.name, "out.md")
+        result = self.run_cli("-", "-o", output, data=b"# A\n## B\n")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn(b"Indexed file created: ", result.stdout)
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), b"# A\n\n- [A](#a)\n  - [1. B](#1-b)\n## 1. B\n")
+
+    def test_stdin_errors(self):
+        result = self.run_cli("-", "-i", data=b"# A\n")
+        self.assertEqual(result.returncode, 2)
+        self.assertIn(b"--in-place cannot be used with '-'", result.stderr)
+        result = self.run_cli("-", data=b"\xef\xbb\xbf# A\n## \xff\n")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(b"Cannot decode stdin", result.stderr)
+
+    def test_index_stream_spooled_to_disk(self):
+        source = io.BytesIO(self.data)
+        output = io.BytesIO()
+        src.index_markdown.index_stream(source, output, spool_size=0)
+        source.seek(0)
+        expected = io.BytesIO()
+        src.index_markdown.index_stream(source, expected)
+        self.assertEqual(output.getvalue(), expected.getvalue())
+
+
 class TestMarkdownIndexerMain(unittest.TestCase):
     # Subprocess-based smoke tests for the main script
     # No changes except ensuring your error messages match
@@ -0,0 +1,93 @@
+"""
+toc_options.py
+
+This module provides TocOptions, the settings that decide which headings are
+numbered and listed in the index, and how they are numbered:
+
+    - min_depth and max_depth: the heading levels that are indexed (1 to 6).
+    - start_level: the first numbered level. Indexed headings above it (H1 by
+      default) are listed without a number.
+    - numbering: the numbering style, one of NUMBERING_STYLES (see
+      src.header_numarator.format_number).
+
+A heading can also opt out on its own, with one of OPT_OUT_MARKERS at the end
+of its text:
+
+    ## Contents <!-- omit from toc -->
+
+Headings outside the depth range and opted-out headings are left as they are:
+they are neither numbered nor listed. The pipelines drop them as soon as they
+are scanned, so they are never numbered, rewritten or kept in memory, and the
+work done on a large reference indexed to depth 2 is proportional to its H1
+and H2 headings.
+"""
+
+from src.header_numarator import NUMBERING_STYLES
+
+# Comments that exclude a heading from the index, as in common editor plugins
+OPT_OUT_MARKERS = ("<!-- omit from toc -->", "<!-- omit in toc -->")
+
+
+class TocOptions:
+    """
+    Which headings are indexed, and how they are numbered.
+
+    Args:
+        min_depth (int): Highest heading level indexed (1 to 6).
+        max_depth (int): Lowest heading level indexed (min_depth to 6).
+        start_level (int): First numbered level (1 to 6).
+        numbering (str): Numbering style, one of NUMBERING_STYLES.
+
+    Raises:
+        ValueError: If an option is out of range.
+    """
+
+    __slots__ = ("min_depth", "max_depth", "start_level", "numbering")
+
+    def __init__(self, min_depth=1, max_depth=6, start_level=2, numbering="default"):
+        if not 1 <= min_depth <= max_depth <= 6:
+            raise ValueError(
+                f"Invalid depth range {min_depth}-{max_depth}, expected "
+                "1 <= min_depth <= max_depth <= 6."
+            )
+        if not 1 <= start_level <= 6:
+            raise ValueError(f"Invalid start level {start_level}, expected 1 to 6.")
+        if numbering not in NUMBERING_STYLES:
+            raise ValueError(
+                f"Unknown numbering style '{numbering}', "
+                f"expected one of {NUMBERING_STYLES}."
+            )
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.start_level = start_level
+        self.numbering = numbering
+
+    def includes(self, header):
+        """
+        Returns True if header (a Heading) is numbered and listed.
+        """
+        return (
+            self.min_depth <= header.header_level <= self.max_depth
+            and not header.header_text.endswith(OPT_OUT_MARKERS)
+        )
+
+    def as_dict(self):
+        """
+        Returns the options as a dict (e.g. for cache keys).
+        """
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __eq__(self, other):
+        if isinstance(other, TocOptions):
+            return self.as_dict() == other.as_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        options = ", ".join(f"{key}={value!r}" for key, value in self.as_dict().items())
+        return f"TocOptions({options})"
+
+
+# The options used when none are given
+DEFAULT_TOC_OPTIONS = TocOptions()
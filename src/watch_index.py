@@ -0,0 +1,126 @@
+"""
+watch_index.py
+
+This module provides watch mode: it polls the watched files with os.stat (so it
+works anywhere, without extra dependencies) and re-indexes a file once its
+changes have settled.
+
+Bursts of saves are debounced: a file is only re-indexed after it has stayed
+unchanged for the debounce delay. Changes are compared with the version of a
+file that was last indexed, so a save landing while the file is being indexed
+is picked up by the next cycle. Everything stays warm between cycles: the
+modules are imported and their patterns compiled once, and the watcher keeps
+each file's last stat signature so a cycle only touches files that changed.
+"""
+
+import os
+import time
+
+from src.batch_index import collect_markdown_files
+
+
+def file_signature(path):
+    """
+    Returns (mtime_ns, size) for path, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """
+    Polls a set of paths and re-indexes the Markdown files that changed.
+
+    Args:
+        paths (list of str): Files, directories or glob patterns to watch.
+        index (callable): Called with a file path, returns a result dict such as
+            the one returned by batch_index.index_one. Its "written" entry, if
+            any, is the signature of the file as rewritten in place.
+        debounce (float): Seconds a file must stay unchanged before it is indexed.
+        rescan (float): Seconds between re-expanding directories and globs,
+            to pick up new files.
+        clock (callable): Monotonic clock, in seconds.
+    """
+
+    def __init__(self, paths, index, debounce=0.2, rescan=2.0, clock=time.monotonic):
+        self.paths = paths
+        self.index = index
+        self.debounce = debounce
+        self.rescan = rescan
+        self.clock = clock
+
+        self.files = []
+        self.signatures = {}
+        # Files that changed, mapped to the time of their latest change
+        self.pending = {}
+        self._last_rescan = None
+
+    def poll(self):
+        """
+        Runs one polling cycle.
+
+        Every file present on the first cycle counts as changed, so all watched
+        files are indexed once at start-up.
+
+        Returns:
+            list of dict: The results of the files indexed during this cycle,
+                          each with an added "seconds" entry (indexing latency).
+        """
+        now = self.clock()
+        if self._last_rescan is None or now - self._last_rescan >= self.rescan:
+            self.files = collect_markdown_files(self.paths)
+            self._last_rescan = now
+
+        for path in self.files:
+            signature = file_signature(path)
+            if signature != self.signatures.get(path):
+                self.signatures[path] = signature
+                if signature is None:
+                    self.pending.pop(path, None)
+                else:
+                    # Each new change restarts the debounce delay
+                    self.pending[path] = now
+
+        ready = [
+            path
+            for path, changed_at in self.pending.items()
+            if now - changed_at >= self.debounce
+        ]
+
+        results = []
+        for path in ready:
+            del self.pending[path]
+            # Signature of the version about to be indexed
+            indexed = file_signature(path)
+            start = self.clock()
+            result = self.index(path)
+            result["seconds"] = self.clock() - start
+            # An in-place run rewrites the watched file itself: its own write
+            # is not a change, but a save that landed during the run (or after
+            # the write) is, so only the signature of the write is taken
+            written = result.get("written")
+            if written is not None and file_signature(path) == written:
+                self.signatures[path] = written
+            else:
+                self.signatures[path] = indexed
+            results.append(result)
+
+        return results
+
+
+def watch(watcher, report, interval=0.1):
+    """
+    Polls forever (until interrupted), passing each indexed result to report.
+
+    Args:
+        watcher (Watcher): The watcher to poll.
+        report (callable): Called with each result dict.
+        interval (float): Seconds to sleep between polling cycles.
+    """
+    while True:
+        for result in watcher.poll():
+            report(result)
+        time.sleep(interval)